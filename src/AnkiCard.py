@@ -1,29 +1,14 @@
-import json
-import requests
-import urllib.request
+from AnkiConnect import AnkiConnectClient
+
 
 class AnkiCommunicator:
 
-    def __get_request(self, action, params):
-        return {'action': action, 'params': params, 'version': 6}
-    
+    def __init__(self, client:AnkiConnectClient=None):
+        self.client = client or AnkiConnectClient()
 
-    def __invoke(self, action, params):
-        requestJson = json.dumps(self.__get_request(action, params)).encode('utf-8')
-        response = json.load(urllib.request.urlopen(urllib.request.Request('http://localhost:8765', requestJson)))
-        if 'error' not in response or response['error'] is not None:
-            raise Exception('Failed to fetch card info: {}'.format(response.get('error')))
-        return response['result']
-    
 
     def __get_cards_id_in_n_days(self, n:int, deck_name:str):
-        param = dict()
-        param['query'] = f'prop:due<{n} deck:"{deck_name}"'
-        
-        data = self.__get_request('findNotes', param)
-        response = requests.post('http://localhost:8765', json=data)
-        notes = response.json().get('result', [])
-        return notes
+        return self.client.find_cards(f'prop:due<{n} deck:"{deck_name}"')
     
 
     def get_words_in_n_days(self, n:int, deck_name:str, item:str):
@@ -32,7 +17,7 @@ class AnkiCommunicator:
         For `item`, possible options are `Front`, `Back`.
         '''
         card_ids = self.__get_cards_id_in_n_days(n=n, deck_name=deck_name)
-        result = self.__invoke('cardsInfo', {'cards': card_ids})
+        result = self.client.cards_info(card_ids)
         info_list = []
         for elem in result:
             info = elem['fields'][item]['value']
@@ -0,0 +1,188 @@
+'''
+A client for the AnkiConnect add-on. It keeps one pooled HTTP session, groups independent calls into AnkiConnect's `multi`
+action and splits requests with long lists of ids (`cardsInfo`, `notesInfo`, ...) into chunks, so that large collections
+need few round trips and no request carries an unbounded payload.
+'''
+import re
+import requests
+
+default_url = 'http://localhost:8765'
+
+
+def search_term(key:str, value:str) -> str:
+    '''
+    A search term such as `"Front:<b>Haus</b>"` that matches `value` exactly: the quotes, backslashes and the wildcards
+    `*` and `_` in the value are escaped.
+    '''
+    return '"' + key + ':' + re.sub(r'([\\"*_])', r'\\\1', value) + '"'
+
+
+class AnkiConnectError(Exception):
+    pass
+
+
+class AnkiConnectClient:
+    '''
+    Args:
+    - url (str): The address of AnkiConnect.
+    - chunk_size (int): The maximal number of ids sent in one request.
+    - max_actions (int): The maximal number of actions grouped into one `multi` request.
+    - timeout (float): The timeout of one request, in seconds.
+    '''
+    version = 6
+
+    def __init__(self, url:str=default_url, chunk_size:int=1000, max_actions:int=50, timeout:float=60) -> None:
+        self.url = url
+        self.chunk_size = chunk_size
+        self.max_actions = max_actions
+        self.timeout = timeout
+        self.session = requests.Session()
+        self.requests = 0
+
+
+    def invoke(self, action:str, **params):
+        '''
+        Send one action and return its result.
+        '''
+        return self.__post({'action': action, 'params': params, 'version': self.version})
+
+
+    def multi(self, actions:list) -> list:
+        '''
+        Send a list of `(action, params)` pairs in as few `multi` requests as possible and return their results in order.
+        '''
+        results = []
+        for start in range(0, len(actions), self.max_actions):
+            batch = actions[start:start + self.max_actions]
+            if len(batch) == 1:
+                results.append(self.invoke(batch[0][0], **batch[0][1]))
+                continue
+            batch_requests = [{'action': action, 'params': params, 'version': self.version} for action, params in batch]
+            for (action, _), answer in zip(batch, self.__post({'action': 'multi', 'params': {'actions': batch_requests}, 'version': self.version})):
+                # With version 6, every answer of `multi` has its own result and error.
+                if isinstance(answer, dict) and set(answer) == {'result', 'error'}:
+                    if answer['error'] is not None:
+                        raise AnkiConnectError(f'{action} failed: {answer["error"]}')
+                    answer = answer['result']
+                results.append(answer)
+        return results
+
+
+    def find_cards(self, query:str) -> list:
+        return self.invoke('findCards', query=query)
+
+
+    def find_notes(self, query:str) -> list:
+        return self.invoke('findNotes', query=query)
+
+
+    def cards_info(self, card_ids:list) -> list:
+        return self.__chunked('cardsInfo', 'cards', card_ids)
+
+
+    def notes_info(self, note_ids:list) -> list:
+        return self.__chunked('notesInfo', 'notes', note_ids)
+
+
+    def cards_mod_time(self, card_ids:list) -> list:
+        return self.__chunked('cardsModTime', 'cards', card_ids)
+
+
+    def notes_mod_time(self, note_ids:list) -> list:
+        return self.__chunked('notesModTime', 'notes', note_ids)
+
+
+    def can_add_notes(self, notes:list) -> list:
+        return self.__chunked('canAddNotes', 'notes', notes)
+
+
+    def find_notes_with_fields(self, notes:list) -> list:
+        '''
+        Return, for each note, the ids of the notes in its deck whose fields are exactly the ones of the note (which may be
+        only some of the fields, e.g. `Front`), with one `findNotes` search per note grouped into `multi` requests.
+        '''
+        return self.multi([('findNotes', {'query': ' '.join([search_term('deck', note['deckName']),
+                                                             *(search_term(name, value) for name, value in note['fields'].items())])})
+                           for note in notes])
+
+
+    def update_note_fields(self, notes:list) -> list:
+        '''
+        Update the fields of existing notes, given as `{'id': note id, 'fields': {...}}`, with `updateNoteFields` actions
+        grouped into `multi` requests, and return whether each update succeeded.
+        '''
+        succeeded = []
+        for start in range(0, len(notes), self.max_actions):
+            batch_requests = [{'action': 'updateNoteFields', 'params': {'note': note}, 'version': self.version}
+                              for note in notes[start:start + self.max_actions]]
+            answers = self.__post({'action': 'multi', 'params': {'actions': batch_requests}, 'version': self.version})
+            succeeded += [isinstance(answer, dict) and answer.get('error') is None for answer in answers]
+        return succeeded
+
+
+    def add_notes(self, notes:list) -> list:
+        '''
+        Add notes in chunks, skipping the notes that `canAddNotes` rejects (duplicates or empty notes), and return the
+        outcome of each note: `added`, `skipped` or `failed`.
+
+        Depending on its version, AnkiConnect answers a chunk with a failing note either with `None` for that note or with
+        an error for the whole chunk, after adding the other notes or not. After such an error, the notes that can no longer
+        be added count as added, and the others are sent again as separate `addNote` actions of one `multi` request.
+        '''
+        outcomes = []
+        for start in range(0, len(notes), self.chunk_size):
+            chunk = notes[start:start + self.chunk_size]
+            can_add = self.invoke('canAddNotes', notes=chunk)
+            addable = [note for note, can in zip(chunk, can_add) if can]
+            try:
+                added = iter([note_id is not None for note_id in self.invoke('addNotes', notes=addable)] if addable else [])
+            except AnkiConnectError:
+                still_addable = self.invoke('canAddNotes', notes=addable)
+                retried = iter(self.__try_each([('addNote', {'note': note}) for note, can in zip(addable, still_addable) if can]))
+                added = iter([next(retried) is not None if can else True for can in still_addable])
+            outcomes += [('added' if next(added) else 'failed') if can else 'skipped' for can in can_add]
+        return outcomes
+
+
+    def __try_each(self, actions:list) -> list:
+        batch_requests = [{'action': action, 'params': params, 'version': self.version} for action, params in actions]
+        answers = self.__post({'action': 'multi', 'params': {'actions': batch_requests}, 'version': self.version})
+        return [answer.get('result') if isinstance(answer, dict) and answer.get('error') is None else None for answer in answers]
+
+
+    def reviews_of_cards(self, card_ids:list) -> dict:
+        reviews = dict()
+        for chunk in range(0, len(card_ids), self.chunk_size):
+            reviews.update(self.invoke('getReviewsOfCards', cards=[str(card_id) for card_id in card_ids[chunk:chunk + self.chunk_size]]))
+        return reviews
+
+
+    def close(self) -> None:
+        self.session.close()
+
+
+    def __chunked(self, action:str, key:str, ids:list) -> list:
+        results = []
+        for start in range(0, len(ids), self.chunk_size):
+            results += self.invoke(action, **{key: list(ids[start:start + self.chunk_size])})
+        return results
+
+
+    def __post(self, data:dict):
+        self.requests += 1
+        try:
+            response = self.session.post(self.url, json=data, timeout=self.timeout)
+        except requests.ConnectionError as error:
+            raise AnkiConnectError(f'Cannot reach AnkiConnect at {self.url}. Is Anki running?') from error
+        except requests.Timeout as error:
+            raise AnkiConnectError(f'AnkiConnect at {self.url} did not answer {data["action"]} within {self.timeout} s.') from error
+        try:
+            answer = response.json()
+        except ValueError as error:
+            raise AnkiConnectError(f'AnkiConnect at {self.url} answered {data["action"]} with status {response.status_code} '
+                                   f'and no json: {response.text[:200]!r}') from error
+        if isinstance(answer, dict) and set(answer) == {'result', 'error'}:
+            if answer['error'] is not None:
+                raise AnkiConnectError(f'{data["action"]} failed: {answer["error"]}')
+            return answer['result']
+        return answer
@@ -0,0 +1,368 @@
+'''
+A local stand-in for the AnkiConnect add-on over a synthetic collection, so that the Anki tooling can be run, tested and
+benchmarked without the Anki desktop app.
+
+    with AnkiStandIn(synthetic_collection(50000)) as anki:
+        communicator = AnkiCommunicator(AnkiConnectClient(anki.url))
+        communicator.get_words_in_n_days(1, 'Vokabelbox')
+        print(anki.stats())
+
+It implements the actions this project uses: `findCards`, `findNotes`, `cardsInfo`, `notesInfo`, `cardsModTime`,
+`notesModTime`, `getReviewsOfCards`, `canAddNotes`, `addNote`, `addNotes`, `updateNoteFields` and `multi`; `touch_cards` and `update_note` imitate reviews and edits.
+Searches understand `deck:`, `prop:due`, `nid:`, `cid:`, `is:new`, `is:review`, field searches with the `*` and `_` wildcards,
+quotes, backslash escapes and negation with `-`.
+'''
+import json
+import random
+import re
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+def synthetic_collection(n_cards:int, deck_names:tuple=('Vokabelbox', 'Alltagsdeutsch'), new_fraction:float=0.2, seed:int=0) -> dict:
+    '''
+    Create a collection of Basic notes with one card each, with fields in the layout written by `AnkiCardWriter`.
+    Review cards are due between 30 days ago and 90 days ahead.
+
+    Returns:
+    - dict: `notes` (note id to note) and `cards` (card id to card).
+    '''
+    rng = random.Random(seed)
+    notes, cards = dict(), dict()
+    for i in range(n_cards):
+        note_id, card_id = 1_500_000_000_000 + i, 1_600_000_000_000 + i
+        word = f'Wort{i}'
+        is_new = rng.random() < new_fraction
+        notes[note_id] = {'noteId': note_id,
+                          'modelName': 'Basic',
+                          'tags': [],
+                          'fields': {'Front': f'<b>{word}</b><br><br><i>Das ist ein Beispielsatz mit {word}.</i><br>',
+                                     'Back': f'Substantiv<br><br>Die Bedeutung von {word}.'},
+                          'cards': [card_id],
+                          'mod': 1_700_000_000}
+        cards[card_id] = {'cardId': card_id,
+                          'note': note_id,
+                          'deckName': deck_names[i % len(deck_names)],
+                          'type': 0 if is_new else 2,
+                          'due': None if is_new else rng.randint(-30, 90),
+                          'interval': 0 if is_new else rng.randint(1, 365),
+                          'reviews': [] if is_new else [{'id': (1_700_000_000 + 86400 * k) * 1000, 'ease': rng.choice([1, 3, 3, 4])}
+                                                        for k in range(rng.randint(1, 5))],
+                          'mod': 1_700_000_000}
+    return {'notes': notes, 'cards': cards}
+
+
+class AnkiStandIn:
+    '''
+    Args:
+    - collection (dict): A collection as created by `synthetic_collection`. Defaults to an empty one.
+    - latency (float): Seconds to wait before answering each request, to imitate a busy Anki.
+
+    Members:
+    - requests (int): The number of requests received.
+    - bytes_received, bytes_sent (int): The total size of the request and response bodies.
+    - largest_response (int): The size of the largest response body.
+    '''
+    def __init__(self, collection:dict=None, latency:float=0.0) -> None:
+        collection = collection or {'notes': dict(), 'cards': dict()}
+        self.notes = collection['notes']
+        self.cards = collection['cards']
+        self.latency = latency
+        self.__first_fields = {(card['deckName'], self.__first_field(self.notes[card['note']])) for card in self.cards.values()}
+        self.__next_id = max([*self.notes, *self.cards, 1_700_000_000_000]) + 1
+        self.reset_stats()
+        self.__lock = threading.Lock()
+        self.__server = ThreadingHTTPServer(('127.0.0.1', 0), self.__handler())
+        self.__server.daemon_threads = True
+        self.__thread = None
+
+
+    @property
+    def url(self) -> str:
+        host, port = self.__server.server_address[:2]
+        return f'http://{host}:{port}'
+
+
+    def start(self) -> 'AnkiStandIn':
+        self.__thread = threading.Thread(target=self.__server.serve_forever, daemon=True)
+        self.__thread.start()
+        return self
+
+
+    def stop(self) -> None:
+        self.__server.shutdown()
+        self.__server.server_close()
+
+
+    def __enter__(self):
+        return self.start()
+
+
+    def __exit__(self, *exc_info):
+        self.stop()
+
+
+    def reset_stats(self) -> None:
+        self.requests = 0
+        self.actions = 0
+        self.bytes_received = 0
+        self.bytes_sent = 0
+        self.largest_response = 0
+
+
+    def stats(self) -> dict:
+        return {'requests': self.requests, 'actions': self.actions, 'bytes received': self.bytes_received,
+                'bytes sent': self.bytes_sent, 'largest response': self.largest_response}
+
+
+    def touch_cards(self, card_ids:list) -> None:
+        '''
+        Mark cards as modified, as a review does.
+        '''
+        with self.__lock:
+            for card_id in card_ids:
+                self.cards[card_id]['mod'] += 1
+
+
+    def update_note(self, note_id:int, fields:dict) -> None:
+        '''
+        Change fields of a note, as an edit in the browser does.
+        '''
+        with self.__lock:
+            self.notes[note_id]['fields'].update(fields)
+            self.notes[note_id]['mod'] += 1
+            self.__first_fields |= {(self.cards[card_id]['deckName'], self.__first_field(self.notes[note_id]))
+                                    for card_id in self.notes[note_id]['cards']}
+
+
+    def _respond(self, body:bytes) -> bytes:
+        time.sleep(self.latency)
+        with self.__lock:
+            request = json.loads(body)
+            answer = self.__answer(request)
+            data = json.dumps(answer, ensure_ascii=False).encode('utf-8')
+            self.requests += 1
+            self.bytes_received += len(body)
+            self.bytes_sent += len(data)
+            self.largest_response = max(self.largest_response, len(data))
+        return data
+
+
+    def __answer(self, request:dict) -> dict:
+        self.actions += 1
+        action, params = request.get('action'), request.get('params', dict())
+        try:
+            if action == 'multi':
+                result = [self.__answer(sub_request) for sub_request in params['actions']]
+            elif hasattr(self, f'_action_{action}'):
+                result = getattr(self, f'_action_{action}')(**params)
+            else:
+                raise ValueError('unsupported action')
+        except Exception as error:
+            return {'result': None, 'error': str(error)}
+        return {'result': result, 'error': None}
+
+
+    def _action_findCards(self, query:str) -> list:
+        matches = self.__parse_query(query)
+        return [card_id for card_id, card in self.cards.items() if matches(card)]
+
+
+    def _action_findNotes(self, query:str) -> list:
+        matches = self.__parse_query(query)
+        return list(dict.fromkeys(card['note'] for card in self.cards.values() if matches(card)))
+
+
+    def _action_cardsInfo(self, cards:list) -> list:
+        return [self.__card_info(int(card_id)) if int(card_id) in self.cards else dict() for card_id in cards]
+
+
+    def _action_notesInfo(self, notes:list) -> list:
+        return [self.__note_info(int(note_id)) if int(note_id) in self.notes else dict() for note_id in notes]
+
+
+    def _action_cardsModTime(self, cards:list) -> list:
+        return [{'cardId': int(card_id), 'mod': self.cards[int(card_id)]['mod']} for card_id in cards if int(card_id) in self.cards]
+
+
+    def _action_notesModTime(self, notes:list) -> list:
+        return [{'noteId': int(note_id), 'mod': self.notes[int(note_id)]['mod']} for note_id in notes if int(note_id) in self.notes]
+
+
+    def _action_getReviewsOfCards(self, cards:list) -> dict:
+        return {str(card_id): self.cards[int(card_id)]['reviews'] for card_id in cards if int(card_id) in self.cards}
+
+
+    def _action_canAddNotes(self, notes:list) -> list:
+        return [self.__can_add(note) for note in notes]
+
+
+    def _action_addNote(self, note:dict) -> int:
+        note_id = self.__add_note(note)
+        if note_id is None:
+            raise ValueError('cannot create note because it is a duplicate')
+        return note_id
+
+
+    def _action_addNotes(self, notes:list) -> list:
+        return [self.__add_note(note) for note in notes]
+
+
+    def _action_updateNoteFields(self, note:dict) -> None:
+        note_id = int(note['id'])
+        if note_id not in self.notes:
+            raise ValueError('note was not found')
+        self.notes[note_id]['fields'].update(note['fields'])
+        self.notes[note_id]['mod'] = int(time.time())
+        self.__first_fields |= {(self.cards[card_id]['deckName'], self.__first_field(self.notes[note_id]))
+                                for card_id in self.notes[note_id]['cards']}
+
+
+    def __can_add(self, note:dict) -> bool:
+        # Like Anki, a note is a duplicate if a note in the deck has the same first field.
+        # The index of first fields keeps the values before edits too, which is good enough for a stand-in.
+        first_field = self.__first_field(note)
+        if not first_field.strip():
+            return False
+        if note.get('options', dict()).get('allowDuplicate', False):
+            return True
+        return (note['deckName'], first_field) not in self.__first_fields
+
+
+    @staticmethod
+    def __first_field(note:dict) -> str:
+        return next(iter(note['fields'].values()), '')
+
+
+    def __add_note(self, note:dict):
+        if not self.__can_add(note):
+            return None
+        fields = note['fields']
+        note_id, card_id = self.__next_id, self.__next_id + 1
+        self.__next_id += 2
+        self.__first_fields.add((note['deckName'], self.__first_field(note)))
+        now = int(time.time())
+        self.notes[note_id] = {'noteId': note_id, 'modelName': note.get('modelName', 'Basic'), 'tags': note.get('tags', []),
+                               'fields': dict(fields), 'cards': [card_id], 'mod': now}
+        self.cards[card_id] = {'cardId': card_id, 'note': note_id, 'deckName': note['deckName'], 'type': 0, 'due': None,
+                               'interval': 0, 'reviews': [], 'mod': now}
+        return note_id
+
+
+    def __fields(self, note:dict) -> dict:
+        return {name: {'value': value, 'order': order} for order, (name, value) in enumerate(note['fields'].items())}
+
+
+    def __card_info(self, card_id:int) -> dict:
+        card = self.cards[card_id]
+        note = self.notes[card['note']]
+        return {'cardId': card_id, 'note': card['note'], 'deckName': card['deckName'], 'modelName': note['modelName'],
+                'fields': self.__fields(note), 'question': note['fields'].get('Front', ''), 'answer': note['fields'].get('Back', ''),
+                'type': card['type'], 'queue': card['type'], 'due': card['due'], 'interval': card['interval'], 'mod': card['mod']}
+
+
+    def __note_info(self, note_id:int) -> dict:
+        note = self.notes[note_id]
+        return {'noteId': note_id, 'modelName': note['modelName'], 'tags': note['tags'], 'fields': self.__fields(note),
+                'cards': note['cards'], 'mod': note['mod']}
+
+
+    def __parse_query(self, query:str):
+        '''
+        Turn a search into a predicate on cards. All the terms must match.
+        '''
+        predicates = []
+        for term in self.__split_query(query):
+            negate = term.startswith('-')
+            predicate = self.__parse_term(term[1:] if negate else term)
+            predicates.append((lambda predicate: lambda card: not predicate(card))(predicate) if negate else predicate)
+        return lambda card: all(predicate(card) for predicate in predicates)
+
+
+    def __parse_term(self, term:str):
+        key, _, value = term.partition(':')
+        key = key.lower()
+        if key == 'deck':
+            if value == '*':
+                return lambda card: True
+            # A deck also matches its subdecks.
+            deck_pattern, subdeck_pattern = self.__pattern(value), self.__pattern(value + '::*')
+            return lambda card: bool(deck_pattern.fullmatch(card['deckName']) or subdeck_pattern.fullmatch(card['deckName']))
+        if key == 'prop':
+            match = re.fullmatch(r'due(<=|>=|<|>|=)(-?\d+)', value)
+            if not match:
+                raise ValueError(f'unsupported search: {term}')
+            operator, days = match.group(1), int(match.group(2))
+            compare = {'<=': int.__le__, '>=': int.__ge__, '<': int.__lt__, '>': int.__gt__, '=': int.__eq__}[operator]
+            return lambda card: card['due'] is not None and compare(card['due'], days)
+        if key in ('nid', 'cid'):
+            ids = {int(i) for i in value.split(',')}
+            return lambda card: (card['note'] if key == 'nid' else card['cardId']) in ids
+        if key == 'is' and value in ('new', 'review'):
+            return lambda card: (card['type'] == 0) == (value == 'new')
+        if value and not key.startswith('prop'):
+            # A field search such as `Front:<b>Wort</b>*`
+            field, pattern = term.partition(':')[0], self.__pattern(value)
+            return lambda card: bool(pattern.fullmatch(self.notes[card['note']]['fields'].get(field, '')))
+        raise ValueError(f'unsupported search: {term}')
+
+
+    @staticmethod
+    def __split_query(query:str) -> list:
+        '''
+        Split a search into terms at the spaces outside double quotes. The quotes are dropped, and the backslash escapes
+        are kept for `__pattern`, as Anki does.
+        '''
+        terms, term, quoted, escaped = [], '', False, False
+        for char in query:
+            if escaped:
+                term += char
+                escaped = False
+            elif char == '\\':
+                term += char
+                escaped = True
+            elif char == '"':
+                quoted = not quoted
+            elif char.isspace() and not quoted:
+                if term:
+                    terms.append(term)
+                term = ''
+            else:
+                term += char
+        return terms + [term] if term else terms
+
+
+    @staticmethod
+    def __pattern(value:str) -> re.Pattern:
+        # Anki's wildcards: `*` matches any text and `_` one character, and a backslash escapes the next character.
+        parts, chars = [], iter(value)
+        for char in chars:
+            if char == '\\':
+                parts.append(re.escape(next(chars, '\\')))
+            elif char == '*':
+                parts.append('.*')
+            elif char == '_':
+                parts.append('.')
+            else:
+                parts.append(re.escape(char))
+        return re.compile(''.join(parts), re.IGNORECASE | re.DOTALL)
+
+
+    def __handler(self):
+        stand_in = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_POST(self):
+                length = int(self.headers.get('Content-Length', 0))
+                data = stand_in._respond(self.rfile.read(length))
+                self.send_response(200)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+            def log_message(self, format, *args):
+                pass
+
+        return Handler
@@ -0,0 +1,185 @@
+'''
+A writer of Anki packages (`.apkg`) that needs neither Anki nor AnkiConnect: a zip file with the collection `collection.anki2`
+(an SQLite database in the legacy schema that every Anki version imports) and the media manifest `media`.
+
+Notes get GUIDs derived from their headword and definition, and the note type and the deck get ids derived from their
+names, so importing a newer package of the same words updates the notes in place instead of adding duplicates.
+'''
+import hashlib
+import html
+import json
+import re
+import sqlite3
+import tempfile
+import time
+import zipfile
+from pathlib import Path
+
+_base91 = 'abcdefghijklmnopqrstuvwxyzABCDEFGHIJKLMNOPQRSTUVWXYZ0123456789!#$%&()*+,-./:;<=>?@[]^_`{|}~'
+
+
+def _hash_int(*values:str) -> int:
+    data = '\x1f'.join(values).encode('utf-8')
+    return int.from_bytes(hashlib.blake2b(data, digest_size=8).digest(), 'big')
+
+
+def _stable_id(*values:str) -> int:
+    # Ids look like the millisecond timestamps Anki uses, and stay below 2^53 for JavaScript.
+    return 1_000_000_000_000 + _hash_int(*values) % 1_000_000_000_000
+
+
+def guid_for(*values:str) -> str:
+    '''
+    A GUID in Anki's base91 alphabet that depends only on the values, e.g. the headword and the definition.
+    '''
+    number = _hash_int(*values)
+    guid = ''
+    while number:
+        number, digit = divmod(number, len(_base91))
+        guid = _base91[digit] + guid
+    return guid or _base91[0]
+
+
+def _strip_html(text:str) -> str:
+    return html.unescape(re.sub(r'<[^>]*>', '', text)).strip()
+
+
+class ApkgWriter:
+    '''
+    Args:
+    - apkg_path (str): The package to write.
+    - deck_name (str): The deck of the cards.
+    - model_name (str): The name of the note type, with the fields `Front` and `Back` like the Basic note type.
+    '''
+    schema = '''
+    CREATE TABLE col (id integer primary key, crt integer not null, mod integer not null, scm integer not null,
+                      ver integer not null, dty integer not null, usn integer not null, ls integer not null,
+                      conf text not null, models text not null, decks text not null, dconf text not null, tags text not null);
+    CREATE TABLE notes (id integer primary key, guid text not null, mid integer not null, mod integer not null,
+                        usn integer not null, tags text not null, flds text not null, sfld integer not null,
+                        csum integer not null, flags integer not null, data text not null);
+    CREATE TABLE cards (id integer primary key, nid integer not null, did integer not null, ord integer not null,
+                        mod integer not null, usn integer not null, type integer not null, queue integer not null,
+                        due integer not null, ivl integer not null, factor integer not null, reps integer not null,
+                        lapses integer not null, left integer not null, odue integer not null, odid integer not null,
+                        flags integer not null, data text not null);
+    CREATE TABLE revlog (id integer primary key, cid integer not null, usn integer not null, ivl integer not null,
+                         lastIvl integer not null, factor integer not null, time integer not null, type integer not null);
+    CREATE TABLE graves (usn integer not null, oid integer not null, type integer not null);
+    '''
+    # The indexes are created after the notes are inserted, which is faster than updating them on every insert.
+    indexes = '''
+    CREATE INDEX ix_notes_usn on notes (usn);
+    CREATE INDEX ix_cards_usn on cards (usn);
+    CREATE INDEX ix_revlog_usn on revlog (usn);
+    CREATE INDEX ix_cards_nid on cards (nid);
+    CREATE INDEX ix_cards_sched on cards (did, queue, due);
+    CREATE INDEX ix_revlog_cid on revlog (cid);
+    CREATE INDEX ix_notes_csum on notes (csum);
+    '''
+    default_model_name = 'Basic (German Vocab Builder)'
+    css = '.card {\n font-family: arial;\n font-size: 20px;\n text-align: center;\n color: black;\n background-color: white;\n}\n'
+
+    def __init__(self, apkg_path:str, deck_name:str, model_name:str=default_model_name) -> None:
+        self.apkg_path = Path(apkg_path)
+        self.deck_name = deck_name
+        self.model_name = model_name
+        self.deck_id = _stable_id('deck', deck_name)
+        self.model_id = _stable_id('model', model_name)
+
+
+    def write(self, notes) -> int:
+        '''
+        Write the package.
+
+        Args:
+        - notes (iterable): `(guid, front, back)` tuples, e.g. with GUIDs from `guid_for`. Notes with a GUID that was
+        already written are left out.
+
+        Returns:
+        - int: The number of notes written.
+        '''
+        with tempfile.TemporaryDirectory() as folder:
+            collection_path = Path(folder) / 'collection.anki2'
+            connection = sqlite3.connect(collection_path)
+            try:
+                # The collection is a temporary file until it is zipped, so it needs no journal.
+                connection.executescript('PRAGMA journal_mode = OFF; PRAGMA synchronous = OFF;' + self.schema)
+                now = int(time.time())
+                with connection:
+                    connection.execute('INSERT INTO col VALUES (1, ?, ?, ?, 11, 0, 0, 0, ?, ?, ?, ?, ?)',
+                                       (now, now * 1000, now * 1000, json.dumps(self.__conf()), json.dumps(self.__models(now)),
+                                        json.dumps(self.__decks(now)), json.dumps(self.__dconf()), json.dumps(dict())))
+                    n_notes = self.__insert_notes(connection, notes, now)
+                connection.executescript(self.indexes)
+            finally:
+                connection.close()
+            with zipfile.ZipFile(self.apkg_path, 'w', zipfile.ZIP_DEFLATED) as package:
+                package.write(collection_path, 'collection.anki2')
+                package.writestr('media', json.dumps(dict()))
+        return n_notes
+
+
+    def __insert_notes(self, connection:sqlite3.Connection, notes, now:int) -> int:
+        guids = set()
+        note_rows, card_rows = [], []
+        for guid, front, back in notes:
+            if guid in guids:
+                continue
+            guids.add(guid)
+            note_id, card_id = _stable_id('note', guid), _stable_id('card', guid)
+            sort_field = _strip_html(front)
+            checksum = int(hashlib.sha1(sort_field.encode('utf-8')).hexdigest()[:8], 16)
+            note_rows.append((note_id, guid, self.model_id, now, -1, '', front + '\x1f' + back, sort_field, checksum, 0, ''))
+            # A new card; `due` is its position among the new cards.
+            card_rows.append((card_id, note_id, self.deck_id, 0, now, -1, 0, 0, len(guids), 0, 0, 0, 0, 0, 0, 0, 0, ''))
+            if len(note_rows) == 10000:
+                self.__flush(connection, note_rows, card_rows)
+        self.__flush(connection, note_rows, card_rows)
+        return len(guids)
+
+
+    @staticmethod
+    def __flush(connection:sqlite3.Connection, note_rows:list, card_rows:list) -> None:
+        connection.executemany('INSERT INTO notes VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)', note_rows)
+        connection.executemany('INSERT INTO cards VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)', card_rows)
+        note_rows.clear()
+        card_rows.clear()
+
+
+    def __conf(self) -> dict:
+        return {'activeDecks': [1], 'curDeck': 1, 'newSpread': 0, 'collapseTime': 1200, 'timeLim': 0, 'estTimes': True,
+                'dueCounts': True, 'curModel': str(self.model_id), 'nextPos': 1, 'sortType': 'noteFld',
+                'sortBackwards': False, 'addToCur': True}
+
+
+    def __models(self, now:int) -> dict:
+        fields = [{'name': name, 'ord': order, 'sticky': False, 'rtl': False, 'font': 'Arial', 'size': 20, 'media': []}
+                  for order, name in enumerate(['Front', 'Back'])]
+        template = {'name': 'Card 1', 'ord': 0, 'qfmt': '{{Front}}', 'afmt': '{{FrontSide}}\n\n<hr id=answer>\n\n{{Back}}',
+                    'did': None, 'bqfmt': '', 'bafmt': ''}
+        model = {'id': self.model_id, 'name': self.model_name, 'type': 0, 'mod': now, 'usn': -1, 'sortf': 0,
+                 'did': self.deck_id, 'tmpls': [template], 'flds': fields, 'css': self.css,
+                 'latexPre': '\\documentclass[12pt]{article}\n\\special{papersize=3in,5in}\n\\usepackage[utf8]{inputenc}\n'
+                             '\\usepackage{amssymb,amsmath}\n\\pagestyle{empty}\n\\setlength{\\parindent}{0in}\n\\begin{document}\n',
+                 'latexPost': '\\end{document}', 'tags': [], 'vers': [], 'req': [[0, 'any', [0]]]}
+        return {str(self.model_id): model}
+
+
+    def __decks(self, now:int) -> dict:
+        def deck(deck_id, name):
+            return {'id': deck_id, 'name': name, 'mod': now, 'usn': -1, 'lrnToday': [0, 0], 'revToday': [0, 0],
+                    'newToday': [0, 0], 'timeToday': [0, 0], 'collapsed': False, 'browserCollapsed': False, 'desc': '',
+                    'dyn': 0, 'conf': 1, 'extendNew': 0, 'extendRev': 0}
+        return {'1': deck(1, 'Default'), str(self.deck_id): deck(self.deck_id, self.deck_name)}
+
+
+    @staticmethod
+    def __dconf() -> dict:
+        return {'1': {'id': 1, 'name': 'Default', 'mod': 0, 'usn': 0, 'maxTaken': 60, 'autoplay': True, 'timer': 0,
+                      'replayq': True, 'dyn': False,
+                      'new': {'delays': [1, 10], 'ints': [1, 4, 7], 'initialFactor': 2500, 'order': 1, 'perDay': 20,
+                              'bury': True, 'separate': True},
+                      'rev': {'perDay': 200, 'ease4': 1.3, 'fuzz': 0.05, 'maxIvl': 36500, 'ivlFct': 1, 'bury': True,
+                              'minSpace': 1},
+                      'lapse': {'delays': [10], 'mult': 0, 'minInt': 1, 'leechFails': 8, 'leechAction': 0}}}
@@ -0,0 +1,267 @@
+'''
+A compact binary snapshot format for json data (dictionaries and config files).
+
+Layout (all numbers little-endian):
+
+    magic  b'VBSN'
+    u16    format version
+    u16    reserved
+    u32 n, u32 x n     string lengths (in characters)
+    u32 n, utf-8       all strings, concatenated; each distinct string is stored once
+    u32 n, i64 x n     integers
+    u32 n, f64 x n     floats
+    u32 n, u32 x n     object shapes: for each distinct sequence of object keys, the number of keys and their string indices
+    u32 n, u32 x n     value codes
+
+The value codes describe the json tree in pre-order. Each code holds a tag in its low three bits and an argument in the
+remaining bits: the index of a string, integer or float, the number of items of an array, or the shape of an object. An object
+code is followed by one value per key of its shape. Key order is kept, so `snapshot_to_json(json_to_snapshot(...))` round-trips
+exactly.
+'''
+import gc
+import json
+import struct
+import sys
+from array import array
+from itertools import chain, islice
+from pathlib import Path
+
+magic = b'VBSN'
+version = 1
+suffix = '.vbs'
+
+_NULL, _FALSE, _TRUE, _INT, _FLOAT, _STRING, _ARRAY, _OBJECT = range(8)
+_max_argument = 2**29 - 1
+
+
+def _to_little_endian(values:array) -> bytes:
+    if sys.byteorder == 'big':
+        values = array(values.typecode, values)
+        values.byteswap()
+    return values.tobytes()
+
+
+def _path_of(data, target:int, path:str='') -> str:
+    # The path of the first occurrence of an integer in json data, e.g. `["Haus"][0]["count"]`, or None.
+    if isinstance(data, dict):
+        items = ((f'[{json.dumps(key, ensure_ascii=False)}]', item) for key, item in data.items())
+    elif isinstance(data, (list, tuple)):
+        items = ((f'[{i}]', item) for i, item in enumerate(data))
+    else:
+        return (path or 'the top level') if type(data) is int and data == target else None
+    for step, item in items:
+        found = _path_of(item, target, path + step)
+        if found is not None:
+            return found
+    return None
+
+
+def dumps(data) -> bytes:
+    '''
+    Encode json data as a binary snapshot.
+    '''
+    string_ids = dict()
+    strings = []
+    ints = array('q')
+    floats = array('d')
+    shape_ids = dict()
+    shapes = array('I')
+    codes = array('I')
+
+    def string_id(text:str) -> int:
+        index = string_ids.get(text)
+        if index is None:
+            index = len(strings)
+            string_ids[text] = index
+            strings.append(text)
+        return index
+
+    def code(tag:int, argument:int=0) -> None:
+        if argument > _max_argument:
+            raise ValueError('The data is too large for the snapshot format.')
+        codes.append(argument << 3 | tag)
+
+    def encode(value) -> None:
+        if value is None:
+            code(_NULL)
+        elif value is True:
+            code(_TRUE)
+        elif value is False:
+            code(_FALSE)
+        elif isinstance(value, str):
+            code(_STRING, string_id(value))
+        elif isinstance(value, int):
+            code(_INT, len(ints))
+            try:
+                ints.append(value)
+            except OverflowError:
+                raise ValueError(f'The integer {value} at {_path_of(data, value)} is outside the 64-bit range of the '
+                                 'snapshot format.') from None
+        elif isinstance(value, float):
+            code(_FLOAT, len(floats))
+            floats.append(value)
+        elif isinstance(value, dict):
+            keys = tuple(value)
+            shape = shape_ids.get(keys)
+            if shape is None:
+                if not all(isinstance(key, str) for key in keys):
+                    raise TypeError('Object keys must be strings.')
+                shape = len(shape_ids)
+                shape_ids[keys] = shape
+                shapes.append(len(keys))
+                shapes.extend(string_id(key) for key in keys)
+            code(_OBJECT, shape)
+            for item in value.values():
+                encode(item)
+        elif isinstance(value, (list, tuple)):
+            code(_ARRAY, len(value))
+            for item in value:
+                encode(item)
+        else:
+            raise TypeError(f'Object of type {type(value).__name__} cannot be stored in a snapshot.')
+
+    encode(data)
+    lengths = array('I', map(len, strings))
+    blob = ''.join(strings).encode('utf-8')
+    return b''.join([magic, struct.pack('<HH', version, 0),
+                     struct.pack('<I', len(lengths)), _to_little_endian(lengths),
+                     struct.pack('<I', len(blob)), blob,
+                     struct.pack('<I', len(ints)), _to_little_endian(ints),
+                     struct.pack('<I', len(floats)), _to_little_endian(floats),
+                     struct.pack('<I', len(shapes)), _to_little_endian(shapes),
+                     struct.pack('<I', len(codes)), _to_little_endian(codes)])
+
+
+def loads(data:bytes, dict_type=dict, list_type=list):
+    '''
+    Decode a binary snapshot.
+
+    Args:
+    - data (bytes): The snapshot.
+    - dict_type, list_type: The types built for objects and arrays. They are called with an iterable of items.
+    '''
+    # The decoder creates millions of containers and none of them can be part of a reference cycle.
+    gc_enabled = gc.isenabled()
+    gc.disable()
+    try:
+        return _loads(data, dict_type, list_type)
+    finally:
+        if gc_enabled:
+            gc.enable()
+
+
+def _loads(data:bytes, dict_type, list_type):
+    if len(data) < 8 or data[:4] != magic:
+        raise ValueError('The data is not a snapshot.')
+    file_version, _ = struct.unpack_from('<HH', data, 4)
+    if file_version != version:
+        raise ValueError(f'Unsupported snapshot version {file_version}.')
+    offset = 8
+
+    def section(typecode:str, item_size:int):
+        nonlocal offset
+        if offset + 4 > len(data):
+            raise ValueError('The snapshot is truncated.')
+        (count,) = struct.unpack_from('<I', data, offset)
+        offset += 4
+        if offset + count * item_size > len(data):
+            raise ValueError('The snapshot is truncated.')
+        values = array(typecode)
+        values.frombytes(data[offset:offset + count * item_size])
+        if sys.byteorder == 'big':
+            values.byteswap()
+        offset += count * item_size
+        return values
+
+    lengths = section('I', 4)
+    blob = section('B', 1).tobytes().decode('utf-8')
+    if sum(lengths) != len(blob):
+        raise ValueError('The snapshot is corrupt.')
+    strings = []
+    position = 0
+    for length in lengths:
+        strings.append(blob[position:position + length])
+        position += length
+    ints = section('q', 8)
+    floats = section('d', 8)
+    shape_data = section('I', 4)
+    shapes = []
+    position = 0
+    try:
+        while position < len(shape_data):
+            count = shape_data[position]
+            shapes.append([strings[index] for index in shape_data[position + 1:position + 1 + count]])
+            position += 1 + count
+    except IndexError:
+        raise ValueError('The snapshot is corrupt.') from None
+    code_values = section('I', 4)
+    if offset != len(data):
+        raise ValueError('The snapshot has trailing data.')
+    # The codes end with a sentinel whose string index is out of range, so that running out of codes raises an `IndexError`
+    # instead of silently shortening the last containers.
+    sentinel = _max_argument << 3 | _STRING
+    codes = chain(code_values, [sentinel])
+
+    constants = {_NULL: None, _FALSE: False, _TRUE: True}
+
+    def decode(value):
+        # Strings are by far the most common values, so they are decoded without a further call. `islice` pulls the codes
+        # lazily, so the codes of nested values are consumed by `decode` before the next item is read.
+        tag = value & 7
+        argument = value >> 3
+        if tag == _OBJECT:
+            keys = shapes[argument]
+            return dict_type(zip(keys, [strings[item >> 3] if item & 7 == _STRING else decode(item)
+                                        for item in islice(codes, len(keys))]))
+        if tag == _ARRAY:
+            return list_type([strings[item >> 3] if item & 7 == _STRING else decode(item)
+                              for item in islice(codes, argument)])
+        if tag == _STRING:
+            return strings[argument]
+        if tag == _INT:
+            return ints[argument]
+        if tag == _FLOAT:
+            return floats[argument]
+        return constants[tag]
+
+    try:
+        decoded = decode(next(codes))
+    except (IndexError, KeyError, RecursionError):
+        raise ValueError('The snapshot is corrupt.') from None
+    if next(codes) != sentinel:
+        raise ValueError('The snapshot is corrupt.')
+    return decoded
+
+
+def dump(data, snapshot_path:str) -> None:
+    with open(snapshot_path, 'wb') as file:
+        file.write(dumps(data))
+
+
+def load(snapshot_path:str, dict_type=dict, list_type=list):
+    with open(snapshot_path, 'rb') as file:
+        return loads(file.read(), dict_type=dict_type, list_type=list_type)
+
+
+def is_snapshot(path:str) -> bool:
+    return Path(path).suffix == suffix
+
+
+def json_to_snapshot(json_path:str, snapshot_path:str=None) -> Path:
+    '''
+    Convert a json file to a snapshot, by default next to it with the suffix `.vbs`.
+    '''
+    snapshot_path = Path(snapshot_path) if snapshot_path else Path(json_path).with_suffix(suffix)
+    with open(json_path) as file:
+        dump(json.load(file), snapshot_path)
+    return snapshot_path
+
+
+def snapshot_to_json(snapshot_path:str, json_path:str=None) -> Path:
+    '''
+    Convert a snapshot back to a json file in the format used throughout the project (`indent=4`).
+    '''
+    json_path = Path(json_path) if json_path else Path(snapshot_path).with_suffix('.json')
+    with open(json_path, 'w') as file:
+        json.dump(load(snapshot_path), file, indent=4, ensure_ascii=False)
+    return json_path
@@ -0,0 +1,89 @@
+import json
+import sqlite3
+from pathlib import Path
+from SQLiteBatches import batched
+
+
+class CardCache:
+    '''
+    A persistent cache of parsed Anki cards keyed by card id, so that only the cards that changed since the last run are
+    downloaded and parsed again.
+
+    Every card is stored with the modification times of the card and of its note. `sync` asks AnkiConnect for the current
+    modification times (`cardsModTime`, `notesModTime`), which are a few bytes per card, and fetches `cardsInfo` only for
+    new cards and cards whose card or note has been modified.
+
+    Members:
+    - fetched (int): The number of cards fetched by the last `sync`.
+    - reused (int): The number of cards taken from the cache by the last `sync`.
+    '''
+    def __init__(self, cache_path:str) -> None:
+        self.cache_path = Path(cache_path)
+        self.fetched = 0
+        self.reused = 0
+        self.connection = sqlite3.connect(self.cache_path)
+        with self.connection:
+            self.connection.execute('''CREATE TABLE IF NOT EXISTS cards (
+                                        card_id INTEGER PRIMARY KEY,
+                                        note_id INTEGER NOT NULL,
+                                        card_mod INTEGER NOT NULL,
+                                        note_mod INTEGER NOT NULL,
+                                        value TEXT NOT NULL)''')
+
+
+    def get_many(self, card_ids:list) -> dict:
+        '''
+        Return a dictionary from the cached card ids to `(note id, card mod, note mod, value)`.
+        '''
+        found = dict()
+        for batch in batched(card_ids):
+            placeholders = ', '.join('?' * len(batch))
+            for card_id, note_id, card_mod, note_mod, value in self.connection.execute(
+                    f'SELECT card_id, note_id, card_mod, note_mod, value FROM cards WHERE card_id IN ({placeholders})', batch):
+                found[card_id] = (note_id, card_mod, note_mod, json.loads(value))
+        return found
+
+
+    def put_many(self, rows:list) -> None:
+        '''
+        Store `(card id, note id, card mod, note mod, value)` rows, where the value is any json value.
+        '''
+        with self.connection:
+            self.connection.executemany('INSERT OR REPLACE INTO cards VALUES (?, ?, ?, ?, ?)',
+                                        [(*row[:4], json.dumps(row[4], ensure_ascii=False)) for row in rows])
+
+
+    def sync(self, client, card_ids:list, parse) -> dict:
+        '''
+        Return the parsed value of each card, fetching only the cards that are new or modified.
+
+        Args:
+        - client (AnkiConnectClient): The client.
+        - card_ids (list): The cards.
+        - parse (callable): Maps a card of `cardsInfo` to the json value that is cached for it.
+
+        Returns:
+        - dict: A dictionary from the card ids to their values, in the order of `card_ids`.
+        '''
+        cached = self.get_many(card_ids)
+        card_mods = {row['cardId']: row['mod'] for row in client.cards_mod_time(list(card_ids))}
+        note_mods = {row['noteId']: row['mod'] for row in client.notes_mod_time(list({row[0] for row in cached.values()}))}
+        values = dict()
+        for card_id, (note_id, card_mod, note_mod, value) in cached.items():
+            if card_mods.get(card_id) == card_mod and note_mods.get(note_id) == note_mod:
+                values[card_id] = value
+        to_fetch = [card_id for card_id in card_ids if card_id not in values and card_id in card_mods]
+        cards = [card for card in client.cards_info(to_fetch) if card]
+        fetched_note_mods = {row['noteId']: row['mod'] for row in client.notes_mod_time(list({card['note'] for card in cards}))}
+        rows = []
+        for card in cards:
+            values[card['cardId']] = parse(card)
+            rows.append((card['cardId'], card['note'], card_mods[card['cardId']], fetched_note_mods.get(card['note'], -1), values[card['cardId']]))
+        self.put_many(rows)
+        self.fetched = len(cards)
+        self.reused = len(values) - len(cards)
+        return {card_id: values[card_id] for card_id in card_ids if card_id in values}
+
+
+    def close(self) -> None:
+        self.connection.close()
@@ -0,0 +1,216 @@
+import sqlite3
+import time
+from pathlib import Path
+from SQLiteBatches import batched
+
+
+class ConfigStore:
+    '''
+    The study state of a category (the lists `all`, `new` and `review` of the config json file) in SQLite.
+
+    Every list is stored as rows `(list, position, word)`, so studying words touches only the rows of these words. Each
+    initialisation, study, reset or addition of words is one transaction and is recorded as a session of events (rows
+    inserted and deleted), so the latest sessions can be undone one at a time by replaying their events backwards.
+    `import_config` is the exception: it replaces the state and clears the history.
+    '''
+    lists = ('all', 'new', 'review')
+
+    def __init__(self, store_path:str) -> None:
+        self.store_path = Path(store_path)
+        self.connection = sqlite3.connect(self.store_path)
+        self.__create_tables()
+
+
+    def __create_tables(self) -> None:
+        with self.connection:
+            self.connection.execute('''CREATE TABLE IF NOT EXISTS items (
+                                        list TEXT NOT NULL,
+                                        position INTEGER NOT NULL,
+                                        word TEXT NOT NULL,
+                                        PRIMARY KEY (list, position)) WITHOUT ROWID''')
+            self.connection.execute('CREATE INDEX IF NOT EXISTS items_word ON items (list, word)')
+            self.connection.execute('''CREATE TABLE IF NOT EXISTS sessions (
+                                        id INTEGER PRIMARY KEY AUTOINCREMENT,
+                                        action TEXT NOT NULL,
+                                        created REAL NOT NULL)''')
+            self.connection.execute('''CREATE TABLE IF NOT EXISTS events (
+                                        id INTEGER PRIMARY KEY AUTOINCREMENT,
+                                        session INTEGER NOT NULL,
+                                        operation TEXT NOT NULL,
+                                        list TEXT NOT NULL,
+                                        position INTEGER NOT NULL,
+                                        word TEXT NOT NULL)''')
+            self.connection.execute('CREATE INDEX IF NOT EXISTS events_session ON events (session)')
+            self.connection.execute('CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT)')
+
+
+    def is_initialised(self) -> bool:
+        return self.connection.execute("SELECT 1 FROM meta WHERE key = 'initialised'").fetchone() is not None
+
+
+    def import_config(self, config:dict) -> None:
+        '''
+        Replace the state with the lists of a config dictionary and clear the history.
+        '''
+        with self.connection:
+            for table in ['items', 'events', 'sessions']:
+                self.connection.execute(f'DELETE FROM {table}')
+            for list_name in self.lists:
+                self.connection.executemany('INSERT INTO items VALUES (?, ?, ?)',
+                                            [(list_name, position, word) for position, word in enumerate(config.get(list_name) or [])])
+            self.connection.execute("INSERT OR REPLACE INTO meta VALUES ('initialised', ?)", (str(time.time()),))
+
+
+    def to_config(self) -> dict:
+        '''
+        The state in the layout of the config json file. `last change` holds the words of the latest study, unless the
+        list was initialised or reset after it.
+        '''
+        config = {list_name: self.words(list_name) for list_name in self.lists}
+        config['last change'] = []
+        row = self.connection.execute('''SELECT id, action FROM sessions WHERE action IN ('initialise', 'study', 'reset')
+                                         ORDER BY id DESC LIMIT 1''').fetchone()
+        if row is not None and row[1] == 'study':
+            rows = self.connection.execute('''SELECT word FROM events WHERE session = ? AND operation = 'insert'
+                                              ORDER BY position''', (row[0],))
+            config['last change'] = [word for word, in rows]
+        return config
+
+
+    def words(self, list_name:str, n:int=-1) -> list:
+        '''
+        The first `n` words of a list, or the whole list.
+        '''
+        rows = self.connection.execute('SELECT word FROM items WHERE list = ? ORDER BY position LIMIT ?', (list_name, n))
+        return [word for word, in rows]
+
+
+    def count(self, list_name:str) -> int:
+        return self.connection.execute('SELECT COUNT(*) FROM items WHERE list = ?', (list_name,)).fetchone()[0]
+
+
+    def initialise(self, word_list:list) -> None:
+        '''
+        Replace the lists with `all` and `new` set to the word list and an empty `review`, in one transaction that can be
+        undone.
+        '''
+        with self.connection:
+            session = self.__begin_session('initialise')
+            for list_name in self.lists:
+                rows = self.connection.execute('SELECT position, word FROM items WHERE list = ?', (list_name,)).fetchall()
+                self.__delete(session, list_name, rows)
+            for list_name in ['all', 'new']:
+                self.__insert(session, list_name, list(enumerate(word_list)))
+            self.connection.execute("INSERT OR REPLACE INTO meta VALUES ('initialised', ?)", (str(time.time()),))
+
+
+    def add_words(self, words:list) -> list:
+        '''
+        Append the words that are not in `all` yet to the end of `all` and `new`, in one transaction. Returns the added words.
+        '''
+        unique_words = list(dict.fromkeys(words))
+        with self.connection:
+            known = set()
+            for batch in batched(unique_words):
+                placeholders = ', '.join('?' * len(batch))
+                known.update(word for word, in self.connection.execute(
+                    f"SELECT word FROM items WHERE list = 'all' AND word IN ({placeholders})", batch))
+            added = [word for word in unique_words if word not in known]
+            if added:
+                session = self.__begin_session('add')
+                for list_name in ['all', 'new']:
+                    end = self.__end(list_name)
+                    self.__insert(session, list_name, [(end + i, word) for i, word in enumerate(added)])
+        return added
+
+
+    def study(self, n:int) -> list:
+        '''
+        Move the first `n` words of `new` to the end of `review` in one transaction and return them. Later occurrences of
+        these words are removed from `new` as well.
+        '''
+        with self.connection:
+            taken = self.connection.execute("SELECT position, word FROM items WHERE list = 'new' ORDER BY position LIMIT ?",
+                                            (n,)).fetchall()
+            words = [word for _, word in taken]
+            unique_words = list(dict.fromkeys(words))
+            removed = []
+            for batch in batched(unique_words):
+                placeholders = ', '.join('?' * len(batch))
+                removed += self.connection.execute(f"SELECT position, word FROM items WHERE list = 'new' AND word IN ({placeholders})",
+                                                   batch).fetchall()
+            end = self.__end('review')
+            session = self.__begin_session('study')
+            self.__delete(session, 'new', removed)
+            self.__insert(session, 'review', [(end + i, word) for i, word in enumerate(words)])
+        return words
+
+
+    def reset(self) -> None:
+        '''
+        Set `new` to the whole list and empty `review`, in one transaction.
+        '''
+        with self.connection:
+            session = self.__begin_session('reset')
+            for list_name in ['new', 'review']:
+                rows = self.connection.execute('SELECT position, word FROM items WHERE list = ?', (list_name,)).fetchall()
+                self.__delete(session, list_name, rows)
+            rows = self.connection.execute("SELECT position, word FROM items WHERE list = 'all'").fetchall()
+            self.__insert(session, 'new', rows)
+
+
+    def undo(self) -> str:
+        '''
+        Undo the latest session. Returns its action (`initialise`, `study`, `reset` or `add`), or `None` if there is
+        nothing to undo.
+        '''
+        with self.connection:
+            row = self.connection.execute('SELECT id, action FROM sessions ORDER BY id DESC LIMIT 1').fetchone()
+            if row is None:
+                return None
+            session, action = row
+            events = self.connection.execute('''SELECT operation, list, position, word FROM events
+                                                WHERE session = ? ORDER BY id DESC''', (session,)).fetchall()
+            for operation, list_name, position, word in events:
+                if operation == 'insert':
+                    self.connection.execute('DELETE FROM items WHERE list = ? AND position = ?', (list_name, position))
+                else:
+                    self.connection.execute('INSERT INTO items VALUES (?, ?, ?)', (list_name, position, word))
+            self.connection.execute('DELETE FROM events WHERE session = ?', (session,))
+            self.connection.execute('DELETE FROM sessions WHERE id = ?', (session,))
+        return action
+
+
+    def history(self) -> list:
+        '''
+        The sessions that can be undone, latest first, as `(action, time)` pairs.
+        '''
+        return self.connection.execute('SELECT action, created FROM sessions ORDER BY id DESC').fetchall()
+
+
+    def close(self) -> None:
+        self.connection.close()
+
+
+    def __end(self, list_name:str) -> int:
+        # The position after the last word of a list.
+        return self.connection.execute('SELECT COALESCE(MAX(position) + 1, 0) FROM items WHERE list = ?', (list_name,)).fetchone()[0]
+
+
+    def __begin_session(self, action:str) -> int:
+        return self.connection.execute('INSERT INTO sessions (action, created) VALUES (?, ?)', (action, time.time())).lastrowid
+
+
+    def __insert(self, session:int, list_name:str, rows:list) -> None:
+        self.connection.executemany('INSERT INTO items VALUES (?, ?, ?)', [(list_name, position, word) for position, word in rows])
+        self.__log(session, 'insert', list_name, rows)
+
+
+    def __delete(self, session:int, list_name:str, rows:list) -> None:
+        self.connection.executemany('DELETE FROM items WHERE list = ? AND position = ?', [(list_name, position) for position, _ in rows])
+        self.__log(session, 'delete', list_name, rows)
+
+
+    def __log(self, session:int, operation:str, list_name:str, rows:list) -> None:
+        self.connection.executemany('INSERT INTO events (session, operation, list, position, word) VALUES (?, ?, ?, ?, ?)',
+                                    [(session, operation, list_name, position, word) for position, word in rows])
@@ -0,0 +1,75 @@
+import hashlib
+import re
+import unicodedata
+
+_whitespace = re.compile(r'\s+')
+
+
+def _normalize_text(text:str) -> str:
+    return _whitespace.sub(' ', unicodedata.normalize('NFC', text)).strip().casefold()
+
+
+def entry_hash(entry) -> str:
+    '''
+    Hash the content of a definition entry: its `Definition` and `Beispiele`, normalised for Unicode, case and whitespace.
+    '''
+    parts = [entry.get('Definition') or '', *(entry.get('Beispiele') or [])]
+    content = '\x1f'.join(_normalize_text(part) for part in parts)
+    return hashlib.blake2b(content.encode('utf-8'), digest_size=16).hexdigest()
+
+
+class ContentHashIndex:
+    '''
+    The content hashes of the entries of a dictionary, grouped by headword, so that checking whether an entry is already in
+    the dictionary is a set lookup. The hashes of a headword are computed the first time the headword is checked.
+    '''
+    def __init__(self, dictionary:dict) -> None:
+        self.dictionary = dictionary
+        self.hashes = dict()
+
+
+    def __hashes_of(self, headword:str) -> set:
+        hashes = self.hashes.get(headword)
+        if hashes is None:
+            hashes = {entry_hash(entry) for entry in self.dictionary.get(headword, ())}
+            self.hashes[headword] = hashes
+        return hashes
+
+
+    def contains(self, headword:str, entry) -> bool:
+        return entry_hash(entry) in self.__hashes_of(headword)
+
+
+    def add(self, headword:str, entry) -> bool:
+        '''
+        Record the entry under the headword. Returns `False` if an entry with the same content was already recorded.
+        '''
+        hashes = self.__hashes_of(headword)
+        content_hash = entry_hash(entry)
+        if content_hash in hashes:
+            return False
+        hashes.add(content_hash)
+        return True
+
+
+def dedupe(dictionary:dict):
+    '''
+    Remove the entries whose content repeats an earlier entry of the same headword.
+
+    Returns:
+    - tuple: The deduplicated dictionary and the number of removed entries.
+    '''
+    deduped = dict()
+    removed = 0
+    for headword, entries in dictionary.items():
+        seen = set()
+        kept = []
+        for entry in entries:
+            content_hash = entry_hash(entry)
+            if content_hash in seen:
+                removed += 1
+            else:
+                seen.add(content_hash)
+                kept.append(entry)
+        deduped[headword] = kept
+    return deduped, removed
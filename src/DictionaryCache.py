@@ -0,0 +1,241 @@
+'''
+A process-wide cache of parsed json dictionaries.
+
+Every module that reads a dictionary json file goes through this module, so that each file is parsed at most once per process
+as long as it does not change on disk. The cache is keyed by the resolved path and invalidated by the size and the
+modification time of the file. The returned data is read-only: objects are `ReadOnlyDict`s and arrays are tuples, so that
+callers cannot corrupt the shared copy. Use `thaw` to get a private, mutable copy.
+Files with the suffix `.vbs` are read and written as binary snapshots (see `BinarySnapshot`) instead of json.
+
+Dictionaries are read with `load_dictionary`, which replays the append-only journal `<dictionary file name>.journal.jsonl` on top of the
+json snapshot. Imports append one line per added entry to the journal with `append_journal` instead of rewriting the snapshot;
+`compact` folds the journal into the snapshot. A dictionary path may also be the folder of a sharded dictionary
+(see `ShardedDictionary`), which has no journal: `update_entries` rewrites the changed shards instead.
+'''
+import json
+from pathlib import Path
+import BinarySnapshot
+import ShardedDictionary
+from SideFiles import side_path
+
+
+class ReadOnlyDict(dict):
+    '''
+    A dictionary that refuses to be modified. It is still a `dict`, so it can be passed to `json.dump`.
+
+    This guards the shared copy against accidental changes, not against deliberate ones: calling the methods of `dict`
+    itself, e.g. `dict.__setitem__(view, key, value)` or `dict.__init__(view, pairs)`, bypasses the checks, and an empty
+    `ReadOnlyDict` can still be filled by calling its `__init__` again.
+    '''
+    def __init__(self, *args, **kwargs):
+        # `__init__` fills the dictionary once, when it is created.
+        if self:
+            self.__readonly()
+        super().__init__(*args, **kwargs)
+
+    def __readonly(self, *args, **kwargs):
+        raise TypeError('The cached dictionary is read-only. Use `DictionaryCache.thaw` to get a mutable copy.')
+
+    __setitem__ = __delitem__ = __ior__ = __readonly
+    clear = pop = popitem = setdefault = update = __readonly
+
+    def __copy__(self):
+        return self
+
+    def __deepcopy__(self, memo):
+        return self
+
+
+def _freeze_value(value):
+    if isinstance(value, list):
+        return tuple(_freeze_value(item) for item in value)
+    return value
+
+
+def _read_only_object(pairs):
+    return ReadOnlyDict((key, _freeze_value(value)) for key, value in pairs)
+
+
+def thaw(value):
+    '''
+    Return a mutable deep copy of data returned by `load_json`.
+    '''
+    if isinstance(value, dict):
+        return {key: thaw(item) for key, item in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [thaw(item) for item in value]
+    return value
+
+
+_cache = dict()
+_stats = {'hits': 0, 'misses': 0}
+
+
+def _signature(path:Path):
+    stat = path.stat()
+    return stat.st_size, stat.st_mtime_ns
+
+
+def journal_path(json_path:str) -> Path:
+    return side_path(json_path, '.journal.jsonl')
+
+
+def source_signature(json_path:str) -> str:
+    '''
+    A string that changes whenever the snapshot or the journal of a dictionary changes.
+    '''
+    if ShardedDictionary.is_sharded(json_path):
+        folder = Path(json_path)
+        paths = [folder / ShardedDictionary.manifest_name, *ShardedDictionary.ShardedDictionary(folder).shard_paths()]
+        return ';'.join('{}:{}'.format(*_signature(path)) for path in paths)
+    signature = '{}:{}'.format(*_signature(Path(json_path)))
+    journal = journal_path(json_path)
+    if journal.exists():
+        signature += ';{}:{}'.format(*_signature(journal))
+    return signature
+
+
+def load_json(json_path:str):
+    '''
+    Return the read-only content of the json file, parsing it only if it is not cached or has changed since it was parsed.
+    '''
+    path = Path(json_path).resolve()
+    signature = _signature(path)
+    cached = _cache.get(path)
+    if cached is not None and cached[0] == signature:
+        _stats['hits'] += 1
+        return cached[1]
+    _stats['misses'] += 1
+    if BinarySnapshot.is_snapshot(path):
+        data = BinarySnapshot.load(path, dict_type=ReadOnlyDict, list_type=tuple)
+    else:
+        with open(path) as file:
+            data = _freeze_value(json.load(file, object_pairs_hook=_read_only_object))
+    _cache[path] = (signature, data)
+    return data
+
+
+def load_dictionary(json_path:str):
+    '''
+    Return the read-only dictionary: the json snapshot with the journal replayed on top of it,
+    or all the shards of a sharded dictionary.
+    '''
+    if ShardedDictionary.is_sharded(json_path):
+        path = Path(json_path).resolve()
+        signature = (source_signature(json_path),)
+        cached = _cache.get(path)
+        if cached is not None and cached[0] == signature:
+            _stats['hits'] += 1
+            return cached[1]
+        _stats['misses'] += 1
+        data = ReadOnlyDict(ShardedDictionary.ShardedDictionary(path).load_all())
+        _cache[path] = (signature, data)
+        return data
+    snapshot = load_json(json_path)
+    journal = journal_path(json_path)
+    if not journal.exists():
+        return snapshot
+    path = journal.resolve()
+    signature = (source_signature(json_path),)
+    cached = _cache.get(path)
+    if cached is not None and cached[0] == signature:
+        _stats['hits'] += 1
+        return cached[1]
+    _stats['misses'] += 1
+    dictionary = dict(snapshot)
+    with open(path) as file:
+        for line in file:
+            if not line.strip():
+                continue
+            try:
+                record = json.loads(line, object_pairs_hook=_read_only_object)
+            except json.JSONDecodeError:
+                # A line cut off by an interrupted import is ignored.
+                continue
+            if record['op'] == 'append':
+                dictionary[record['headword']] = (*dictionary.get(record['headword'], ()), record['entry'])
+            elif record['op'] == 'set':
+                dictionary[record['headword']] = record['entries']
+    data = ReadOnlyDict(dictionary)
+    _cache[path] = (signature, data)
+    return data
+
+
+def append_journal(json_path:str, entries:dict, replace:bool=False) -> None:
+    '''
+    Record changes of a dictionary in its journal, without rewriting the snapshot.
+
+    Args:
+    - json_path (str): The path of the dictionary snapshot.
+    - entries (dict): A dictionary from headwords to lists of definition entries.
+    - replace (bool): If `True`, the entries replace the entries of the headword; otherwise they are appended to them.
+    '''
+    with open(journal_path(json_path), 'a') as file:
+        for headword, definition_entries in entries.items():
+            if replace:
+                records = [{'op': 'set', 'headword': headword, 'entries': definition_entries}]
+            else:
+                records = [{'op': 'append', 'headword': headword, 'entry': entry} for entry in definition_entries]
+            for record in records:
+                file.write(json.dumps(record, ensure_ascii=False) + '\n')
+
+
+def update_entries(json_path:str, entries:dict, replace:bool=False) -> None:
+    '''
+    Record new or changed entries of a dictionary: rewrite the affected shards of a sharded dictionary, or append the entries
+    to the journal of a single-file dictionary. The arguments are those of `append_journal`.
+    '''
+    if ShardedDictionary.is_sharded(json_path):
+        ShardedDictionary.ShardedDictionary(json_path).update(entries, replace=replace)
+    else:
+        append_journal(json_path, entries, replace=replace)
+
+
+def compact(json_path:str, dictionary:dict=None) -> None:
+    '''
+    Fold the journal into the snapshot and remove the journal.
+    If `dictionary` is given, it is written as the new snapshot instead of the replayed dictionary.
+    A sharded dictionary has no journal; only the shards changed by `dictionary` are rewritten.
+    '''
+    if ShardedDictionary.is_sharded(json_path):
+        if dictionary is not None:
+            ShardedDictionary.ShardedDictionary(json_path).write_all(dictionary)
+        return
+    journal = journal_path(json_path)
+    if dictionary is None:
+        if not journal.exists():
+            return
+        dictionary = load_dictionary(json_path)
+    dump_json(json_path, dictionary)
+    if journal.exists():
+        journal.unlink()
+        invalidate(journal)
+
+
+def dump_json(json_path:str, data) -> None:
+    '''
+    Write `data` to the json file (or snapshot) and drop the cached copy of the file.
+    '''
+    if BinarySnapshot.is_snapshot(json_path):
+        BinarySnapshot.dump(data, json_path)
+    else:
+        with open(json_path, 'w') as file:
+            json.dump(data, file, indent=4, ensure_ascii=False)
+    invalidate(json_path)
+
+
+def invalidate(json_path:str=None) -> None:
+    '''
+    Drop the cached copy of a json file, or of every file if no path is given.
+    '''
+    if json_path is None:
+        _cache.clear()
+    else:
+        _cache.pop(Path(json_path).resolve(), None)
+
+
+def cache_info() -> dict:
+    '''
+    Return the number of cache hits and misses and the number of cached files.
+    '''
+    return {'hits': _stats['hits'], 'misses': _stats['misses'], 'files': len(_cache)}
@@ -1,87 +1,233 @@
-import json
-from copy import deepcopy
 from abc import ABC, abstractmethod
+from itertools import islice
+from DictionaryStore import DictionaryStore
+from ShardedDictionary import ShardedDictionary, is_sharded
+from HeadwordIndex import HeadwordIndex
 
 pons_json_path = '../../../../../Library/Mobile Documents/com~apple~CloudDocs/Projects/Vocab Builder/German/Dictionary/PONS.json'
 refined_pons_json_path = '../../../../../Library/Mobile Documents/com~apple~CloudDocs/Projects/Vocab Builder/German/Dictionary/Copilot Dictionary.json'
 phrase_json_path = '../../../../../Library/Mobile Documents/com~apple~CloudDocs/Projects/Vocab Builder/German/Dictionary/Phrase.json'
 
 
+class DefinitionEntry:
+    '''
+    An immutable definition of a headword. The fields can be read as attributes or, like a python dictionary,
+    with the keys `part of speech`, `conjugation`, `definition`, `usage`, and `examples`.
+    '''
+    __slots__ = ('part_of_speech', 'conjugation', 'definition', 'usage', 'examples')
+    _keys = {'part of speech': 'part_of_speech',
+             'conjugation': 'conjugation',
+             'definition': 'definition',
+             'usage': 'usage',
+             'examples': 'examples'}
+
+    def __init__(self, definition:str, examples=(), conjugation:str='', usage:str='', part_of_speech:str='') -> None:
+        object.__setattr__(self, 'definition', definition)
+        object.__setattr__(self, 'examples', tuple(examples))
+        object.__setattr__(self, 'conjugation', conjugation)
+        object.__setattr__(self, 'usage', usage)
+        object.__setattr__(self, 'part_of_speech', part_of_speech)
+
+    def __setattr__(self, name, value):
+        raise AttributeError(f'{type(self).__name__} is immutable')
+
+    def __getitem__(self, key:str):
+        try:
+            return getattr(self, self._keys[key])
+        except KeyError:
+            raise KeyError(key) from None
+
+    def get(self, key:str, default=None):
+        attribute = self._keys.get(key)
+        return getattr(self, attribute) if attribute else default
+
+    def keys(self):
+        return self._keys.keys()
+
+    def __reduce__(self):
+        return (type(self), (self.definition, self.examples, self.conjugation, self.usage, self.part_of_speech))
+
+    def __copy__(self):
+        return self
+
+    def __deepcopy__(self, memo):
+        return self
+
+    def __repr__(self) -> str:
+        return f'DefinitionEntry(definition={self.definition!r})'
+
+
 class WordEntry:
     '''
-    The class contains two attributes: `headword` (str) and `definition_entries` (list). 
-    Each member of `definition_entries` is a python dictionary, whose keys are `part of speech`, `conjugation`, `definition`, `usage`, and `examples`
+    The class contains two attributes: `headword` (str) and `definition_entries` (tuple).
+    Each member of `definition_entries` is a `DefinitionEntry`. Word entries are immutable and built once.
+    '''
+    __slots__ = ('headword', 'definition_entries')
+
+    def __init__(self, word:str, definition_entries=()) -> None:
+        object.__setattr__(self, 'headword', word)
+        object.__setattr__(self, 'definition_entries', tuple(definition_entries))
+
+    def __setattr__(self, name, value):
+        raise AttributeError(f'{type(self).__name__} is immutable')
+
+    def __reduce__(self):
+        return (type(self), (self.headword, self.definition_entries))
+
+    def __copy__(self):
+        return self
+
+    def __deepcopy__(self, memo):
+        return self
+
+    def __repr__(self) -> str:
+        return f'WordEntry(headword={self.headword!r}, definitions={len(self.definition_entries)})'
+
+
+class LookupResult:
+    '''
+    The outcome of a dictionary lookup: `found` (int) is the number of headwords found, `missing` (list) holds the
+    words that do not exist in the dictionary and `resolved` (dict) maps the words found through the headword index
+    to their headwords.
     '''
-    def __init__(self, word:str) -> None:
-        self.headword = word
-        self.definition_entries = []
+    __slots__ = ('found', 'missing', 'resolved')
+
+    def __init__(self) -> None:
+        self.found = 0
+        self.missing = []
+        self.resolved = dict()
+
+    def __repr__(self) -> str:
+        return f'LookupResult(found={self.found}, missing={self.missing!r}, resolved={self.resolved!r})'
 
 
 class DictionaryReader(ABC):
     '''
     Given a list `word_list` of words, the class saves the entries for the words in the dictionary.
+    The entries are looked up in the indexed store of the json file, or, for a sharded dictionary, in the shards of the words.
+    The store is opened on the first lookup and rebuilt then if the json file has changed, so creating a reader costs
+    nothing; `refresh` checks the json file again.
+    After a lookup, `lookup_result` reports the words that were not found.
+    If a `HeadwordIndex` is given, words that are not headwords (other cases, NFD encoding, inflected forms) are
+    looked up through the index.
+    The store keeps an SQLite connection open; close it with `close` or use the reader in a `with` statement.
     '''
-    def __init__(self, json_path:str, word_list:list) -> None:
-        with open(json_path) as file:
-            self.dictionary = json.load(file)
+    # The number of headwords fetched from the store at a time by `iter_word_entries`.
+    batch_size = 500
+
+    def __init__(self, json_path:str, word_list:list, headword_index:HeadwordIndex=None) -> None:
+        self.json_path = json_path
+        self.__store = None
+        self.headword_index = headword_index
         self.word_list = word_list
         self.word_entry_list = []
+        self.lookup_result = LookupResult()
+
+
+    @property
+    def store(self):
+        '''
+        The `DictionaryStore` or `ShardedDictionary` of the json file, opened and refreshed on first use.
+        '''
+        if self.__store is None:
+            self.refresh()
+        return self.__store
+
+
+    def refresh(self) -> bool:
+        '''
+        Rebuild the store if the json file has changed since it was built, e.g. after the dictionary was updated while the
+        reader is open. Returns `True` if the store was rebuilt.
+        '''
+        if self.__store is None:
+            self.__store = ShardedDictionary(self.json_path) if is_sharded(self.json_path) else DictionaryStore(self.json_path)
+        return self.__store.refresh()
+
+
+    def close(self) -> None:
+        '''
+        Close the store, if it was opened. The reader can also be used as a context manager, which closes the store on exit.
+        '''
+        if self.__store is not None:
+            self.__store.close()
+            self.__store = None
+
+
+    def __enter__(self):
+        return self
+
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+    def iter_word_entries(self, words=None):
+        '''
+        Yield the word entry of each word found in the dictionary, fetching the entries in batches, so that long word lists
+        can be exported in bounded memory. The words default to `word_list`; missing words are collected in `lookup_result`.
+        '''
+        words = iter(self.word_list if words is None else words)
+        result = LookupResult()
+        self.lookup_result = result
+        while batch := list(islice(words, self.batch_size)):
+            dictionary = self.store.get_many(batch)
+            resolved = self.__resolve([word for word in batch if word not in dictionary])
+            dictionary.update(self.store.get_many(list(resolved.values())))
+            result.resolved.update(resolved)
+            for word in batch:
+                headword = resolved.get(word, word)
+                definition_entries = dictionary.get(headword)
+                if definition_entries:
+                    result.found += 1
+                    yield self._make_word_entry(headword, definition_entries)
+                else:
+                    result.missing.append(word)
+
+
+    def __resolve(self, words:list) -> dict:
+        if not words or self.headword_index is None:
+            return dict()
+        resolved = self.headword_index.resolve_many(words)
+        if self.headword_index.modified:
+            self.headword_index.save()
+        return resolved
 
 
     def get_word_entry_list(self):
-        self._update_word_entry_list(self.word_list)
+        self.word_entry_list = list(self.iter_word_entries(self.word_list))
         return self.word_entry_list
     
 
     def get_concise_dictionary(self):
-        concise_dictionary = dict()
-        for i in range(len(self.word_list)):
-            word = self.word_list[i]
-            definitions = []
-            for entry in self.word_entry_list[i].definition_entries:
-                definition = entry['definition']
-                definitions.append(definition)
-            concise_dictionary[word] = definitions
-        return concise_dictionary
+        entries = self.store.get_many(self.word_list, fields=['Definition'])
+        return {word: [entry['Definition'] for entry in definition_entries] for word, definition_entries in entries.items()}
 
 
+    @staticmethod
     @abstractmethod
-    def _update_word_entry_list(self, word_list:list) -> None:
+    def _make_word_entry(word:str, definition_entries:list) -> WordEntry:
         pass
 
 
 class GermanDictionaryReader(DictionaryReader):
-    def __init__(self, json_path, word_list:list) -> None:
-        super().__init__(json_path, word_list)
-
-    def _update_word_entry_list(self, word_list: list) -> None:
-        for word in word_list:
-            word_entry = WordEntry(word)
-            definition_entries = self.dictionary.get(word, [])
-            if definition_entries:
-                for entry in definition_entries:
-                    definition_entry = dict()
-                    definition = entry['Definition']
-                    examples = entry['Beispiele']
-                    forms = entry['Formen']
-                    anwendung = entry['Anwendung']
-                    definition_entry['conjugation'] = forms
-                    definition_entry['definition'] = definition
-                    definition_entry['examples'] = examples
-                    definition_entry['part of speech'] = ''
-                    definition_entry['usage'] = anwendung
-                    word_entry.definition_entries.append(deepcopy(definition_entry))
-                
-                self.word_entry_list.append(deepcopy(word_entry))
-            else:
-                print(f'The word {word} does not exist in the json file!')
+    def __init__(self, json_path, word_list:list, headword_index:HeadwordIndex=None) -> None:
+        super().__init__(json_path, word_list, headword_index)
+
+
+    @staticmethod
+    def _make_word_entry(word:str, definition_entries:list) -> WordEntry:
+        return WordEntry(word, [DefinitionEntry(definition=entry['Definition'],
+                                                examples=entry['Beispiele'],
+                                                conjugation=entry['Formen'],
+                                                usage=entry['Anwendung'])
+                                for entry in definition_entries])
 
 
 class GermanWordReader(GermanDictionaryReader):
-    def __init__(self, word_list: list) -> None:
-        super().__init__(json_path=refined_pons_json_path, word_list=word_list)
+    def __init__(self, word_list: list, headword_index:HeadwordIndex=None) -> None:
+        super().__init__(json_path=refined_pons_json_path, word_list=word_list, headword_index=headword_index)
 
 
 class GermanPhraseReader(GermanDictionaryReader):
-    def __init__(self, word_list: list) -> None:
-        super().__init__(json_path=phrase_json_path, word_list=word_list)
\ No newline at end of file
+    def __init__(self, word_list: list, headword_index:HeadwordIndex=None) -> None:
+        super().__init__(json_path=phrase_json_path, word_list=word_list, headword_index=headword_index)
\ No newline at end of file
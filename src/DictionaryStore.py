@@ -0,0 +1,105 @@
+import json
+import sqlite3
+from pathlib import Path
+import DictionaryCache
+from SQLiteBatches import batched
+from SideFiles import side_path
+
+
+class DictionaryStore:
+    '''
+    An indexed SQLite copy of a dictionary json file, so that a handful of headwords can be looked up
+    without parsing the whole dictionary.
+
+    The json file and its journal stay the source of truth. The store records the size and the modification time of the
+    files it was built from; `refresh` rebuilds the store when they have changed and `rebuild` always rebuilds it.
+    '''
+    def __init__(self, json_path:str, store_path:str=None) -> None:
+        self.json_path = Path(json_path)
+        self.store_path = Path(store_path) if store_path else side_path(self.json_path, '.sqlite')
+        self.connection = sqlite3.connect(self.store_path)
+        self.__create_tables()
+
+
+    def __create_tables(self) -> None:
+        with self.connection:
+            self.connection.execute('''CREATE TABLE IF NOT EXISTS entries (
+                                        headword TEXT NOT NULL,
+                                        position INTEGER NOT NULL,
+                                        definition TEXT,
+                                        entry TEXT NOT NULL,
+                                        PRIMARY KEY (headword, position)) WITHOUT ROWID''')
+            self.connection.execute('CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT)')
+
+
+    def __stored_signature(self):
+        row = self.connection.execute("SELECT value FROM meta WHERE key = 'source'").fetchone()
+        return row[0] if row else None
+
+
+    def is_stale(self) -> bool:
+        '''
+        Whether the json file has changed since the store was built. A store whose json file is missing is stale, so that
+        `refresh` raises `FileNotFoundError` instead of serving the rows of a deleted or misplaced dictionary.
+        '''
+        if not self.json_path.exists():
+            return True
+        return self.__stored_signature() != DictionaryCache.source_signature(self.json_path)
+
+
+    def refresh(self) -> bool:
+        '''
+        Rebuild the store if the json file has changed. Returns `True` if the store was rebuilt.
+        '''
+        if self.is_stale():
+            self.rebuild()
+            return True
+        return False
+
+
+    def rebuild(self) -> None:
+        '''
+        Rebuild the store from the json file.
+        '''
+        signature = DictionaryCache.source_signature(self.json_path)
+        dictionary = DictionaryCache.load_dictionary(self.json_path)
+        rows = ((word, position, entry.get('Definition'), json.dumps(entry, ensure_ascii=False))
+                for word, entries in dictionary.items()
+                for position, entry in enumerate(entries))
+        with self.connection:
+            self.connection.execute('DELETE FROM entries')
+            self.connection.executemany('INSERT INTO entries VALUES (?, ?, ?, ?)', rows)
+            self.connection.execute("INSERT OR REPLACE INTO meta VALUES ('source', ?)", (signature,))
+
+
+    def get_many(self, words:list, fields:list=None) -> dict:
+        '''
+        Look up a list of headwords in batches.
+
+        Args:
+        - words (list): The headwords to look up.
+        - fields (list, optional): Only return these fields of each entry. `['Definition']` is answered without decoding the entries.
+
+        Returns:
+        - dict: The entries of every headword found, in the order of `words`. Missing headwords are left out.
+        '''
+        unique_words = list(dict.fromkeys(words))
+        found = dict()
+        projection = 'definition' if fields == ['Definition'] else 'entry'
+        for batch in batched(unique_words):
+            placeholders = ', '.join('?' * len(batch))
+            cursor = self.connection.execute(f'SELECT headword, {projection} FROM entries '
+                                             f'WHERE headword IN ({placeholders}) ORDER BY headword, position', batch)
+            for word, value in cursor:
+                if projection == 'definition':
+                    entry = {'Definition': value}
+                else:
+                    entry = json.loads(value)
+                    if fields is not None:
+                        entry = {field: entry.get(field) for field in fields}
+                found.setdefault(word, []).append(entry)
+        return {word: found[word] for word in unique_words if word in found}
+
+
+    def close(self) -> None:
+        self.connection.close()
@@ -6,6 +6,15 @@ import prompts
 import json
 from pathlib import Path
 import string
+import DictionaryCache
+from DictionaryReader import GermanDictionaryReader
+from PromptBatcher import PromptBatcher
+from LLMBackend import LLMBackend
+from GenerationCache import GenerationCache
+import StreamingJSON
+from TextNormalizer import TextNormalizer
+
+normalizer = TextNormalizer()
 
 def remove_punctuation(input_string):
     # Create translation table
@@ -29,6 +38,10 @@ def json_string_to_dict(json_string: str):
         python_dict = json.loads(json_string)
         return python_dict
     except json.JSONDecodeError as e:
+        # Strip code fences and keep the complete entries of a truncated answer
+        python_dict = StreamingJSON.loads(json_string)
+        if python_dict:
+            return python_dict
         print("Error decoding JSON:", e)
         return None
 
@@ -65,39 +78,11 @@ class Exercise(ABC):
 
     def _string_processing(self, text):
         '''
-        Parse strings
+        Prepare a string for LaTeX, see `TextNormalizer`. The strings in dictionaries and lists are processed as one batch.
         '''
-        text = self.__unify_quotes(text)
-        text = self.__replace_en_dashes(text)
-        text = self.__replace_quotes(text)
-        text = self.__replace_pounds(text)
-        return text
-    
-
-    def __unify_quotes(self, text):
-        text = text.replace("’", "'")
-        text = text.replace("‘", "'")
-        text = text.replace("“", '"')
-        text = text.replace("”", '"')
-        return text
-                            
-
-    def __replace_quotes(self, text):
-        text_list = text.split(' ')
-        text_list_new = []
-        for word in text_list:
-            if word.startswith("'"):
-                word = '`' + word[1:]
-            text_list_new.append(word)
-        return ' '.join(text_list_new)
-
-
-    def __replace_pounds(self, text):
-        return text.replace('£', r'\pounds')
-
-
-    def __replace_en_dashes(self, text):
-        return text.replace('–', '--')
+        if isinstance(text, str):
+            return normalizer.normalize(text)
+        return normalizer.normalize_values(text)
     
 
     def _write_box(self, word_list:list):
@@ -125,6 +110,7 @@ class Definition(Exercise):
 
     Methods:
     - import_definition_from_dictionary: Imports definitions and examples from the dictionary and generates the fill-in-the-gap exercise.
+    - import_definition_from_entries: Imports definitions and examples from word entries, e.g. from `DictionaryReader.iter_word_entries`.
     - finish_import: Adds the definition, exercise, and solution to the exercise dictionary.
     '''
 
@@ -143,33 +129,13 @@ class Definition(Exercise):
         '''
         dictionary_json = Path(dictionary_path)
         try:
-            with open(dictionary_json) as json_file:
-                dictionary = json.load(json_file)
+            dictionary = DictionaryCache.load_dictionary(dictionary_json)
 
             def_text = ''
             for word in self.word_list:
                 if word in dictionary:
-                    def_text += r'\vocabulary{' + word + r'}'
-                    def_text += r'{}' + '\n'
-                    for entry in dictionary[word]:
-                        forms = r'\trianglebullet ' + entry['Formen']
-                        if forms != r'\trianglebullet ':
-                            forms += ';'
-                        def_text += r'\gerdefitem{' + forms + r'}'
-                        usage = entry['Anwendung']
-                        if usage:
-                            usage += ';'
-                        def_text += r'{' + usage + r'}'
-                        definition = entry['Definition']
-                        definition = self._string_processing(definition)
-                        def_text += r'{' + definition + r'}'
-                        if entry['Beispiele']:
-                            sentence = entry['Beispiele'][0]
-                            sentence = self._string_processing(sentence)
-                            def_text += r'{' + sentence + r'}' + '\n'
-                        else:
-                            # If there is no example sentence, we still need a `{}` for the LaTeX command.
-                            def_text += r'{}' + '\n'
+                    word_entry = GermanDictionaryReader._make_word_entry(word, dictionary[word])
+                    def_text += self._format_word_entry(word_entry)
                 else:
                     print(f'The word {word} does not exist in the dictionary.')
 
@@ -179,6 +145,37 @@ class Definition(Exercise):
         except FileNotFoundError:
             print(f"The dictionary file '{dictionary_json}' does not exist.")
 
+    def import_definition_from_entries(self, word_entries) -> None:
+        '''
+        Write the definitions and the examples of the word entries as a form that the LaTeX template is expecting.
+
+        Args:
+        - word_entries (iterable): `WordEntry` objects, for example the generator `DictionaryReader.iter_word_entries`.
+        '''
+        self.definition = ''.join(self._format_word_entry(word_entry) for word_entry in word_entries)
+
+    def _format_word_entry(self, word_entry) -> str:
+        def_text = r'\vocabulary{' + word_entry.headword + r'}'
+        def_text += r'{}' + '\n'
+        for entry in word_entry.definition_entries:
+            forms = r'\trianglebullet ' + entry['conjugation']
+            if forms != r'\trianglebullet ':
+                forms += ';'
+            def_text += r'\gerdefitem{' + forms + r'}'
+            usage = entry['usage']
+            if usage:
+                usage += ';'
+            def_text += r'{' + usage + r'}'
+            definition = self._string_processing(entry['definition'])
+            def_text += r'{' + definition + r'}'
+            if entry['examples']:
+                sentence = self._string_processing(entry['examples'][0])
+                def_text += r'{' + sentence + r'}' + '\n'
+            else:
+                # If there is no example sentence, we still need a `{}` for the LaTeX command.
+                def_text += r'{}' + '\n'
+        return def_text
+
     def finish_import(self):
         self.exercise_dict['definition'] = self.definition
 
@@ -186,16 +183,68 @@ class Definition(Exercise):
 class ExampleSentences(Exercise):
     example_sentences: dict = dict()
     example_sentences_with_analysis: dict = dict()
+    # The expected size of the answer for one word (three sentences with their exercises), in tokens.
+    answer_tokens_per_word = 150
 
     def create_prompt(self, number_of_sentences:str):
+        self.generation_prompt = self._build_prompt(self.word_list, number_of_sentences)
+
+
+    def iter_prompts(self, number_of_sentences:str, batcher:PromptBatcher=None, word_list:list=None):
+        '''
+        Yield `(words, prompt)` for the word list (by default `self.word_list`), packed into as few prompts as the batcher's
+        budget allows.
+        '''
+        batcher = batcher or PromptBatcher(per_term=self.answer_tokens_per_word)
+        word_list = self.word_list if word_list is None else word_list
+        payloads = {word: repr(word) for word in word_list}
+        for words in batcher.batches(payloads, template=self._build_prompt([], number_of_sentences)):
+            yield words, self._build_prompt(words, number_of_sentences)
+
+
+    def _build_prompt(self, word_list:list, number_of_sentences:str) -> str:
         prompt = prompts.example_sentences_prompt + '\n'
-        prompt += f'For each word in the list {self.word_list}, provide {number_of_sentences} example sentences and the corresponding fill-in-the-gap exercises.'
-        self.generation_prompt = prompt
+        prompt += f'For each word in the list {word_list}, provide {number_of_sentences} example sentences and the corresponding fill-in-the-gap exercises.'
+        return prompt
 
     
     def import_sentences(self, text: str):
-        self.import_exercise(text)
-        self.example_sentences = json.loads(self.exercise)
+        self.example_sentences = dict(self.iter_sentences(text))
+
+
+    def iter_sentences(self, chunks):
+        '''
+        Yield `(word, sentences)` for each word of an answer as soon as its entry is complete, so that the exercises can be
+        built while the answer is still being streamed. The strings are processed after decoding, so that the replacements
+        cannot break the JSON, and the complete entries of a truncated answer are kept.
+
+        Args:
+        - chunks: The answer, or an iterable of its chunks such as `LLMBackend.stream(prompt)`.
+        '''
+        for word, sentences in StreamingJSON.iter_members(chunks):
+            yield word, self._string_processing(sentences)
+
+
+    def generate(self, backend:LLMBackend, number_of_sentences:str, batcher:PromptBatcher=None, cache:GenerationCache=None):
+        '''
+        Generate the example sentences for the whole word list through the backend, with all the prompt batches submitted at once.
+        With a cache, the sentences of words generated before are reused and only the other words are sent to the backend.
+        '''
+        keys = {word: GenerationCache.key(prompts.example_sentences_prompt, word, number_of_sentences=number_of_sentences)
+                for word in self.word_list}
+        cached = cache.get_many(list(keys.values())) if cache else dict()
+        example_sentences = {word: cached[key] for word, key in keys.items() if key in cached}
+        missing_words = [word for word in self.word_list if word not in example_sentences]
+        batches = list(self.iter_prompts(number_of_sentences, batcher, word_list=missing_words))
+        answers = backend.complete_many([prompt for _, prompt in batches])
+        generated = dict()
+        for answer in answers:
+            self.import_sentences(answer)
+            generated.update(self.example_sentences)
+        if cache:
+            cache.put_many({keys[word]: sentences for word, sentences in generated.items() if word in keys})
+        example_sentences.update(generated)
+        self.example_sentences = {word: example_sentences[word] for word in self.word_list if word in example_sentences}
 
 
     def get_second_prompt(self):
@@ -281,6 +330,8 @@ class DialogueExercise(Exercise):
         finish_import: Finishes the import process.
 
     """
+    # The expected size of the answer for one term (a dialogue with its paraphrase), in tokens.
+    answer_tokens_per_term = 120
 
     def __init__(self, word_list: list):
         super().__init__(word_list=word_list)
@@ -305,8 +356,7 @@ class DialogueExercise(Exercise):
 
         """
         try:
-            with open(dictionary_path) as file:
-                self.phrase_dict = json.load(file)
+            self.phrase_dict = DictionaryCache.load_dictionary(dictionary_path)
             for word in self.word_list:
                 if word in self.phrase_dict.keys():
                     self.abridged_phrase_dict[word] = self.phrase_dict[word][0]['Definition']
@@ -321,10 +371,59 @@ class DialogueExercise(Exercise):
         Creates the prompt for the exercise.
 
         """
+        self.generation_prompt = self._build_prompt(self.abridged_phrase_dict)
+
+
+    def iter_prompts(self, batcher:PromptBatcher=None, terms:list=None):
+        """
+        Yields the prompts for the exercise, packed into as few prompts as the batcher's budget allows.
+
+        Args:
+            batcher (PromptBatcher, optional): The batcher. Defaults to the default budget.
+            terms (list, optional): The terms to include. Defaults to all the terms of the exercise.
+
+        Yields:
+            tuple: The terms of the batch and the prompt.
+
+        """
+        batcher = batcher or PromptBatcher(per_term=self.answer_tokens_per_term)
+        terms = self.abridged_phrase_dict if terms is None else terms
+        payloads = {term: json.dumps({term: self.abridged_phrase_dict[term]}, ensure_ascii=False) for term in terms}
+        for terms in batcher.batches(payloads, template=self._build_prompt(dict())):
+            yield terms, self._build_prompt({term: self.abridged_phrase_dict[term] for term in terms})
+
+
+    def _build_prompt(self, abridged_phrase_dict:dict) -> str:
         prompt = prompts.dialogue_exercise_prompt
         prompt += 'Create the JSON file based on the following inputs'
-        prompt += json.dumps(self.abridged_phrase_dict, ensure_ascii=False)
-        self.generation_prompt = prompt
+        prompt += json.dumps(abridged_phrase_dict, ensure_ascii=False)
+        return prompt
+
+
+    def generate(self, backend:LLMBackend, batcher:PromptBatcher=None, cache:GenerationCache=None):
+        """
+        Generates the dialogues through the backend, with all the prompt batches submitted at once, and then the exercise.
+
+        Args:
+            backend (LLMBackend): The backend that answers the prompts.
+            batcher (PromptBatcher, optional): The batcher. Defaults to the default budget.
+            cache (GenerationCache, optional): Dialogues generated before for the same term and definition are reused.
+
+        """
+        keys = {term: GenerationCache.key(prompts.dialogue_exercise_prompt, term, definition)
+                for term, definition in self.abridged_phrase_dict.items()}
+        cached = cache.get_many(list(keys.values())) if cache else dict()
+        dialogue_dict = {term: cached[key] for term, key in keys.items() if key in cached}
+        missing_terms = [term for term in keys if term not in dialogue_dict]
+        batches = list(self.iter_prompts(batcher, terms=missing_terms))
+        answers = backend.complete_many([prompt for _, prompt in batches])
+        generated = dict()
+        for answer in answers:
+            generated.update(StreamingJSON.loads(answer))
+        if cache:
+            cache.put_many({keys[term]: dialogue for term, dialogue in generated.items() if term in keys})
+        dialogue_dict.update(generated)
+        self.generate_exercise(dialogue_dict={term: dialogue_dict[term] for term in keys if term in dialogue_dict})
 
 
     def generate_exercise(self, dialogue_dict:dict):
@@ -0,0 +1,98 @@
+import hashlib
+import json
+from pathlib import Path
+
+
+def _hash(text:str) -> str:
+    return hashlib.blake2b(text.encode('utf-8'), digest_size=8).hexdigest()
+
+
+class ExportManifest:
+    '''
+    A record of the cards exported to a deck, so that later exports contain only new and changed cards.
+
+    A card is identified by its headword and the index of its definition entry, and the manifest keeps the hashes of its
+    front and back. When the word list of an export overlaps earlier ones, the unchanged cards are left out; cards whose
+    front changed are exported again and their old versions are listed as replaced (Anki matches notes by their first field,
+    so the old note stays), cards whose back changed only are exported again to update their notes in place, and entries
+    that no longer exist are listed as deleted.
+
+    The changes of an export are pending until `save` is called, e.g. after the csv file has been written.
+
+    Members:
+    - manifest_path (Path): The json file of the manifest.
+    - removed (list): `(headword, index, reason)` tuples of the cards to delete in Anki, the reason being `deleted` or `replaced`.
+    '''
+    version = 1
+
+    def __init__(self, manifest_path:str) -> None:
+        self.manifest_path = Path(manifest_path)
+        self.cards = dict()
+        if self.manifest_path.exists():
+            with open(self.manifest_path, encoding='utf-8') as file:
+                manifest = json.load(file)
+            if manifest.get('version') != self.version:
+                raise ValueError(f'Unsupported manifest version in {self.manifest_path}.')
+            self.cards = manifest['cards']
+        self.removed = []
+        self.__pending = dict()
+
+
+    def check_word(self, headword:str, cards:list) -> list:
+        '''
+        Compare the cards of a headword with the manifest and record them as pending.
+
+        Args:
+        - headword (str): The headword.
+        - cards (list): The `(front, back)` pairs of its definition entries, in order.
+
+        Returns:
+        - list: The status of each card: `new`, `changed` (the front changed, so the card is a new note), `updated` (only the
+        back changed, so the note can be updated in place) or `unchanged`.
+        '''
+        hashes = [[_hash(front), _hash(back)] for front, back in cards]
+        exported = self.__pending.get(headword, self.cards.get(headword, []))
+        statuses = []
+        for index, card_hashes in enumerate(hashes):
+            if index >= len(exported):
+                statuses.append('new')
+            elif exported[index] == card_hashes:
+                statuses.append('unchanged')
+            elif exported[index][0] == card_hashes[0]:
+                statuses.append('updated')
+            else:
+                statuses.append('changed')
+                self.removed.append((headword, index, 'replaced'))
+        self.removed += [(headword, index, 'deleted') for index in range(len(hashes), len(exported))]
+        self.__pending[headword] = hashes
+        return statuses
+
+
+    def matches_exported(self, headword:str, index:int, back:str) -> bool:
+        '''
+        Whether `back` is the back of the card as it was last exported, e.g. to find its note among notes with the same front.
+        '''
+        exported = self.cards.get(headword, [])
+        return index < len(exported) and exported[index] is not None and exported[index][1] == _hash(back)
+
+
+    def discard(self, headword:str, index:int) -> None:
+        '''
+        Forget the pending change of a card that could not be exported, so that the next export tries it again.
+        '''
+        pending = self.__pending.get(headword)
+        if pending is None or index >= len(pending):
+            return
+        exported = self.cards.get(headword, [])
+        pending[index] = exported[index] if index < len(exported) else None
+
+
+    def save(self) -> None:
+        for headword, hashes in self.__pending.items():
+            # A new card that could not be exported ends the list, so that it counts as new next time.
+            if None in hashes:
+                hashes = hashes[:hashes.index(None)]
+            self.cards[headword] = hashes
+        self.__pending = dict()
+        with open(self.manifest_path, 'w', encoding='utf-8') as file:
+            json.dump({'version': self.version, 'cards': self.cards}, file, ensure_ascii=False)
@@ -0,0 +1,215 @@
+import heapq
+import json
+import math
+import re
+from pathlib import Path
+import DictionaryCache
+from DictionaryReader import refined_pons_json_path, phrase_json_path
+from HeadwordIndex import normalize
+
+full_text_index_path = '../../../../../Library/Mobile Documents/com~apple~CloudDocs/Projects/Vocab Builder/German/Dictionary/Full Text Index.json'
+default_sources = {'words': refined_pons_json_path, 'phrases': phrase_json_path}
+
+_token_pattern = re.compile(r'\w+')
+
+
+def tokenize(text:str) -> list:
+    return _token_pattern.findall(normalize(text))
+
+
+class Hit:
+    '''
+    A search result: the entry `position` of `headword` in the dictionary `source`, with its relevance `score`.
+    '''
+    __slots__ = ('source', 'headword', 'position', 'score')
+
+    def __init__(self, source:str, headword:str, position:int, score:float) -> None:
+        self.source = source
+        self.headword = headword
+        self.position = position
+        self.score = score
+
+    def __repr__(self) -> str:
+        return f'Hit({self.source!r}, {self.headword!r}, {self.position}, score={self.score:.3f})'
+
+
+class FullTextIndex:
+    '''
+    An inverted index over the `Definition` and `Beispiele` fields of one or more dictionaries (e.g. the word dictionary and
+    Phrase.json), so that questions like "which examples use 'Altersheim'" are answered without scanning the dictionaries.
+
+    Each token maps to a list of postings `[document, field, count]`, where a document is one definition entry and the field is
+    `d` (definition) or `e` (examples). Documents are kept in `documents` as `[source, headword, position]`; the documents of
+    replaced entries are set to `None`, and their postings are dropped when the index is saved.
+
+    A query ranks the documents with tf-idf. For each query token, the live documents that contain it are sorted by their
+    weighted count (impact) the first time the token is searched after the index changed, which costs time in proportion to
+    its postings once. The query then reads the sorted lists in parallel and stops as soon as no unread document can beat
+    the best hits found (the threshold algorithm). Even a token that occurs in every entry (e.g. `wenn`, `man`) is then
+    answered in well under a millisecond. The idf counts the live documents of a token only, so replaced entries do not
+    change the scores.
+    '''
+    version = 1
+    fields = {'d': 'Definition', 'e': 'Beispiele'}
+    # Matches in a definition weigh more than matches in an example sentence.
+    field_weights = {'d': 2.0, 'e': 1.0}
+
+    def __init__(self, index_path:str=full_text_index_path) -> None:
+        self.index_path = Path(index_path)
+        self.documents = []
+        self.postings = dict()
+        if self.index_path.exists():
+            with open(self.index_path) as file:
+                saved = json.load(file)
+            if saved.get('version') == self.version:
+                self.documents = saved['documents']
+                self.postings = saved['postings']
+        self.__document_ids = {tuple(document): i for i, document in enumerate(self.documents) if document is not None}
+        # (token, field code or None) -> the live documents of the token sorted by impact, and their impacts.
+        self.__rankings = dict()
+
+
+    def build(self, sources:dict=default_sources) -> None:
+        '''
+        Rebuild the index from scratch.
+
+        Args:
+        - sources (dict): A dictionary from a source name (e.g. `words`, `phrases`) to the path of its dictionary json file.
+        '''
+        self.documents = []
+        self.postings = dict()
+        self.__document_ids = dict()
+        self.__rankings = dict()
+        for source, json_path in sources.items():
+            self.add_entries(source, DictionaryCache.load_dictionary(json_path))
+
+
+    def add_entries(self, source:str, entries:dict, replace:bool=False) -> None:
+        '''
+        Index new entries of a dictionary. `entries` maps headwords to lists of definition entries, as in the dictionary json.
+        Entries are identified by their position in the list of their headword; positions that are already indexed are skipped,
+        so the whole entry list of a headword can be passed after appending to it.
+        With `replace`, the entries replace the indexed entries of their headwords, as in `DictionaryCache.update_entries`.
+        '''
+        for headword, definition_entries in entries.items():
+            if replace:
+                self.remove_headword(source, headword)
+            for position, entry in enumerate(definition_entries):
+                key = (source, headword, position)
+                if key in self.__document_ids:
+                    continue
+                document = len(self.documents)
+                self.documents.append(list(key))
+                self.__document_ids[key] = document
+                for field, name in self.fields.items():
+                    text = entry.get(name) or ''
+                    if not isinstance(text, str):
+                        text = ' '.join(text)
+                    counts = dict()
+                    for token in tokenize(text):
+                        counts[token] = counts.get(token, 0) + 1
+                    for token, count in counts.items():
+                        self.postings.setdefault(token, []).append([document, field, count])
+                    if self.__rankings:
+                        for token in counts:
+                            for code in (None, *self.fields):
+                                self.__rankings.pop((token, code), None)
+
+
+    def remove_headword(self, source:str, headword:str) -> None:
+        '''
+        Remove the indexed entries of a headword, e.g. before its changed entries are indexed again.
+        '''
+        position = 0
+        while (key := (source, headword, position)) in self.__document_ids:
+            self.documents[self.__document_ids.pop(key)] = None
+            position += 1
+        if position:
+            # The tokens of the removed documents are not known without their postings.
+            self.__rankings.clear()
+
+
+    def search(self, query:str, source:str=None, field:str=None, limit:int=20) -> list:
+        '''
+        Return the entries matching the tokens of `query`, ranked by a tf-idf score.
+
+        Args:
+        - query (str): One or more words.
+        - source (str, optional): Only return hits from this source.
+        - field (str, optional): Only search `Definition` or `Beispiele`.
+        - limit (int): The maximal number of hits.
+        '''
+        if limit <= 0:
+            return []
+        field_code = {name: code for code, name in self.fields.items()}.get(field)
+        lists = []
+        for token in sorted(set(tokenize(query))):
+            ranked, impacts = self.__ranking(token, field_code)
+            if ranked:
+                idf = math.log(1 + len(self.__document_ids) / len(self.__ranking(token, None)[0]))
+                lists.append((idf, ranked, impacts))
+        documents = self.documents
+        # A min-heap of the best `(score, -document)` pairs: among equal scores, the documents indexed first come first.
+        best, seen = [], set()
+        for depth in range(max((len(ranked) for _, ranked, _ in lists), default=0)):
+            for _, ranked, _ in lists:
+                if depth >= len(ranked) or ranked[depth][1] in seen:
+                    continue
+                document = ranked[depth][1]
+                seen.add(document)
+                if source is not None and documents[document][0] != source:
+                    continue
+                # The terms are summed in the order of the lists, like the threshold below, so equal sums are equal floats.
+                score = 0.0
+                for idf, _, impacts in lists:
+                    score += idf * impacts.get(document, 0)
+                if len(best) < limit:
+                    heapq.heappush(best, (score, -document))
+                elif (score, -document) > best[0]:
+                    heapq.heapreplace(best, (score, -document))
+            if len(best) == limit and self.__is_final(best[0], lists, depth + 1):
+                break
+        return [Hit(*documents[-document], score) for score, document in sorted(best, reverse=True)]
+
+
+    @staticmethod
+    def __is_final(worst:tuple, lists:list, depth:int) -> bool:
+        # An unread document scores at most the sum of the impacts at `depth`, and if it reaches that sum exactly, it comes
+        # after the document at `depth` of every list, so it cannot beat the worst hit if that was indexed earlier.
+        threshold, last = 0.0, -1
+        for idf, ranked, _ in lists:
+            if depth < len(ranked):
+                threshold += idf * ranked[depth][0]
+                last = max(last, ranked[depth][1])
+        if last < 0:
+            return True
+        return worst[0] > threshold or (worst[0] == threshold and -worst[1] < last)
+
+
+    def __ranking(self, token:str, field_code:str=None) -> tuple:
+        '''
+        The live documents of a token as `(impact, document)` pairs sorted by decreasing impact and increasing document,
+        and a dictionary of their impacts, for one field or (`None`) for both.
+        '''
+        ranking = self.__rankings.get((token, field_code))
+        if ranking is None:
+            impacts = dict()
+            for document, posting_field, count in self.postings.get(token, ()):
+                if self.documents[document] is not None and field_code in (None, posting_field):
+                    impacts[document] = impacts.get(document, 0) + self.field_weights[posting_field] * count
+            ranked = sorted(((impact, document) for document, impact in impacts.items()), key=lambda pair: (-pair[0], pair[1]))
+            ranking = self.__rankings[(token, field_code)] = (ranked, impacts)
+        return ranking
+
+
+    def save(self) -> None:
+        if len(self.__document_ids) < len(self.documents):
+            # Drop the postings of removed documents.
+            postings = dict()
+            for token, token_postings in self.postings.items():
+                kept = [posting for posting in token_postings if self.documents[posting[0]] is not None]
+                if kept:
+                    postings[token] = kept
+            self.postings = postings
+        with open(self.index_path, 'w') as file:
+            json.dump({'version': self.version, 'documents': self.documents, 'postings': self.postings}, file, ensure_ascii=False)
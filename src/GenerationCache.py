@@ -0,0 +1,79 @@
+import hashlib
+import json
+import sqlite3
+import time
+from pathlib import Path
+from SQLiteBatches import batched
+
+generation_cache_path = '../../../../../Library/Mobile Documents/com~apple~CloudDocs/Projects/Vocab Builder/German/Dictionary/Generation Cache.sqlite'
+
+
+def _hash(text:str) -> str:
+    return hashlib.sha256(text.encode('utf-8')).hexdigest()
+
+
+class GenerationCache:
+    '''
+    A persistent, content-addressed cache of generated content (example sentences, dialogues, definitions) for single terms.
+
+    An item is keyed by the hash of the prompt template, the term, the hash of the definition given for the term and the
+    generation parameters, so editing a prompt in `prompts` or a definition makes the old items unreachable. When the cache
+    holds more than `max_items` items, the least recently used ones are evicted.
+    '''
+    def __init__(self, cache_path:str=generation_cache_path, max_items:int=50000) -> None:
+        self.cache_path = Path(cache_path)
+        self.max_items = max_items
+        self.hits = 0
+        self.misses = 0
+        self.connection = sqlite3.connect(self.cache_path)
+        with self.connection:
+            self.connection.execute('''CREATE TABLE IF NOT EXISTS items (
+                                        key TEXT PRIMARY KEY,
+                                        value TEXT NOT NULL,
+                                        last_used REAL NOT NULL)''')
+            self.connection.execute('CREATE INDEX IF NOT EXISTS items_last_used ON items (last_used)')
+
+
+    @staticmethod
+    def key(template:str, term:str, definition:str='', **parameters) -> str:
+        return _hash(json.dumps([_hash(template), term, _hash(definition), parameters], ensure_ascii=False, sort_keys=True))
+
+
+    def get_many(self, keys:list) -> dict:
+        '''
+        Return the cached values of the keys that are in the cache, and count the hits and misses.
+        '''
+        keys = list(dict.fromkeys(keys))
+        found = dict()
+        for batch in batched(keys):
+            placeholders = ', '.join('?' * len(batch))
+            for key, value in self.connection.execute(f'SELECT key, value FROM items WHERE key IN ({placeholders})', batch):
+                found[key] = json.loads(value)
+        if found:
+            with self.connection:
+                self.connection.executemany('UPDATE items SET last_used = ? WHERE key = ?', [(time.time(), key) for key in found])
+        self.hits += len(found)
+        self.misses += len(keys) - len(found)
+        return found
+
+
+    def put_many(self, items:dict) -> None:
+        '''
+        Store a dictionary from keys to json values, then evict the least recently used items beyond `max_items`.
+        '''
+        now = time.time()
+        with self.connection:
+            self.connection.executemany('INSERT OR REPLACE INTO items VALUES (?, ?, ?)',
+                                        [(key, json.dumps(value, ensure_ascii=False), now) for key, value in items.items()])
+            self.connection.execute('''DELETE FROM items WHERE key IN (
+                                        SELECT key FROM items ORDER BY last_used DESC LIMIT -1 OFFSET ?)''', (self.max_items,))
+
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        size = self.connection.execute('SELECT COUNT(*) FROM items').fetchone()[0]
+        return {'hits': self.hits, 'misses': self.misses, 'hit rate': self.hits / lookups if lookups else 0.0, 'items': size}
+
+
+    def close(self) -> None:
+        self.connection.close()
@@ -8,6 +8,11 @@ from pathlib import Path
 import json
 from dotenv import load_dotenv
 import os
+import DictionaryCache
+from HeadwordIndex import HeadwordIndex
+from FullTextIndex import FullTextIndex
+from ContentHash import ContentHashIndex, dedupe
+from toolbox import Configurator
 
 
 # load_dotenv(dotenv_path='../../../../../Library/Mobile Documents/com~apple~CloudDocs/Projects/Vocab Builder/vars/.env')
@@ -329,30 +334,73 @@ notes_path = 'vocab notes.json'
 class GermanDictionary:
     def __init__(self, dict_path: str=dictionary_path):
         self.dict_path = dict_path
-        with open(self.dict_path) as file:
-            self.dict = json.load(file)
+        self.dict = DictionaryCache.load_dictionary(self.dict_path)
+        self.content_hashes = ContentHashIndex(self.dict)
         
     def update_dict(self, notes_path:str=notes_path, config_path:str=config_path):
         with open(notes_path) as file:
             notes = json.load(file)
 
-        with open(config_path) as file:
-            config = json.load(file)
-        
-        current_all_list = set(config['all'])
+        self.dict = dict(self.dict)
+        self.content_hashes.dictionary = self.dict
+        new_entries = dict()
 
         for word in notes:
-            original_entry = self.dict.get(word, [])
-            original_entry.append(notes[word])
-            self.dict[word] = original_entry
-            if word not in current_all_list:
-                config['all'].append(word)
-                config['new'].append(word)
-        
-        with open(config_path, 'w') as file:
-            json.dump(config, file, indent=4, ensure_ascii=False)
+            if self.content_hashes.add(word, notes[word]):
+                self.dict[word] = (*self.dict.get(word, ()), notes[word])
+                new_entries[word] = [notes[word]]
+            else:
+                print(f'The entry of {word} is already in the dictionary and will be ignored.')
+
+        Configurator(config_path).add_words(list(notes))
+
+        if not new_entries:
+            print('==== Nothing new to update ====')
+            return
 
-        with open(self.dict_path, 'w') as file:
-            json.dump(self.dict, file, indent=4, ensure_ascii=False)
+        DictionaryCache.update_entries(self.dict_path, new_entries)
+
+        headword_index = HeadwordIndex(self.dict_path)
+        if headword_index.index_path.exists():
+            headword_index.add_entries(new_entries)
+            headword_index.save()
+
+        full_text_index = FullTextIndex()
+        if full_text_index.index_path.exists():
+            full_text_index.add_entries('words', {word: self.dict[word] for word in new_entries})
+            full_text_index.save()
 
         print('==== Update successful ====')
+
+    def compact(self):
+        '''
+        Rewrite the dictionary snapshot with all the updates recorded in the journal.
+        '''
+        DictionaryCache.compact(self.dict_path)
+        self.dict = DictionaryCache.load_dictionary(self.dict_path)
+        self.content_hashes = ContentHashIndex(self.dict)
+
+    def dedupe(self) -> int:
+        '''
+        Remove repeated entries (same definition and examples) from the dictionary and rewrite the snapshot.
+        The saved headword and full-text indexes are updated, since the positions of the remaining entries shift.
+        Returns the number of removed entries.
+        '''
+        deduped, removed = dedupe(self.dict)
+        if removed:
+            changed = {word: entries for word, entries in deduped.items() if len(entries) < len(self.dict[word])}
+            DictionaryCache.compact(self.dict_path, deduped)
+            self.dict = DictionaryCache.load_dictionary(self.dict_path)
+            self.content_hashes = ContentHashIndex(self.dict)
+
+            headword_index = HeadwordIndex(self.dict_path)
+            if headword_index.index_path.exists():
+                headword_index.build()
+                headword_index.save()
+
+            full_text_index = FullTextIndex()
+            if full_text_index.index_path.exists():
+                full_text_index.add_entries('words', changed, replace=True)
+                full_text_index.save()
+        print(f'==== Removed {removed} duplicate entries ====')
+        return removed
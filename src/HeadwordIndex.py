@@ -0,0 +1,124 @@
+import json
+import unicodedata
+from pathlib import Path
+import DictionaryCache
+from SideFiles import side_path
+
+spacy_model = 'de_core_news_sm'
+
+
+def normalize(text:str) -> str:
+    '''
+    Normalise a word for lookups: NFC Unicode normalisation (files synced from macOS are often NFD), case folding and stripping.
+    '''
+    return unicodedata.normalize('NFC', text).casefold().strip()
+
+
+class HeadwordIndex:
+    '''
+    A secondary index that maps normalised and lemmatised keys to the headwords of a dictionary, so that "Städte", "lernte"
+    or an NFD-encoded "städtisch" still find their headword. Lookups are a single dictionary access.
+
+    The keys are the normalised headwords and the normalised inflected forms found in the example sentences whose spaCy lemma
+    is a headword. Words that are lemmatised at lookup time are added to the index, so each form needs the model only once.
+    The index is saved next to the dictionary (`<dictionary file name>.index.json`) so the model is not loaded on every run.
+    '''
+    version = 1
+
+    def __init__(self, json_path:str, index_path:str=None, lemmatize_queries:bool=True) -> None:
+        self.json_path = Path(json_path)
+        self.index_path = Path(index_path) if index_path else side_path(self.json_path, '.index.json')
+        self.lemmatize_queries = lemmatize_queries
+        self.keys = dict()
+        # Whether keys were added since the index was loaded or saved.
+        self.modified = False
+        self.__nlp = None
+        if self.index_path.exists():
+            with open(self.index_path) as file:
+                saved = json.load(file)
+            if saved.get('version') == self.version:
+                self.keys = saved['keys']
+
+
+    @property
+    def nlp(self):
+        '''
+        The spaCy pipeline, loaded on first use, or `None` if spaCy or its German model is not installed. Then the index
+        only holds the normalised headwords.
+        '''
+        if self.__nlp is None:
+            try:
+                import spacy
+                self.__nlp = spacy.load(spacy_model, disable=['parser', 'ner'])
+            except (ImportError, OSError) as error:
+                print(f'Cannot load the spaCy model {spacy_model} ({error}), so the headword index holds the headwords only. '
+                      f'Install it with `python -m spacy download {spacy_model}` and rebuild the index.')
+                self.__nlp = False
+        return self.__nlp or None
+
+
+    def build(self) -> None:
+        '''
+        Rebuild the index from the whole dictionary.
+        '''
+        self.keys = dict()
+        self.add_entries(DictionaryCache.load_dictionary(self.json_path))
+
+
+    def add_entries(self, entries:dict) -> None:
+        '''
+        Add the headwords of `entries` (headword -> list of definition entries) and the inflected forms in their examples.
+        The example sentences are lemmatised in batches.
+        '''
+        self.modified = True
+        for headword in entries:
+            self.keys.setdefault(normalize(headword), headword)
+        if self.nlp is None:
+            return
+        sentences = ((sentence, headword)
+                     for headword, definition_entries in entries.items()
+                     for entry in definition_entries
+                     for sentence in entry.get('Beispiele', []))
+        for doc, headword in self.nlp.pipe(sentences, as_tuples=True, batch_size=256):
+            target = normalize(headword)
+            for token in doc:
+                if normalize(token.lemma_) == target:
+                    self.keys.setdefault(normalize(token.text), headword)
+
+
+    def lookup(self, word:str):
+        '''
+        Return the headword of `word`, or `None` if the index does not know the word.
+        '''
+        return self.keys.get(normalize(word))
+
+
+    def resolve_many(self, words:list) -> dict:
+        '''
+        Return a dictionary from each word to its headword. Words that are not in the index are lemmatised in one batch
+        if `lemmatize_queries` is set; words that still cannot be resolved are left out. An empty index is built first.
+        '''
+        if not self.keys:
+            self.build()
+        resolved = dict()
+        unknown = []
+        for word in words:
+            headword = self.lookup(word)
+            if headword is not None:
+                resolved[word] = headword
+            else:
+                unknown.append(word)
+        if unknown and self.lemmatize_queries and self.nlp is not None:
+            for word, doc in zip(unknown, self.nlp.pipe(unknown, batch_size=256)):
+                headword = self.keys.get(normalize(' '.join(token.lemma_ for token in doc)))
+                if headword is not None:
+                    self.keys[normalize(word)] = headword
+                    self.modified = True
+                    resolved[word] = headword
+        return resolved
+
+
+    def save(self) -> None:
+        with open(self.index_path, 'w') as file:
+            json.dump({'version': self.version, 'keys': self.keys}, file, ensure_ascii=False)
+        self.modified = False
@@ -0,0 +1,158 @@
+'''
+Backends that turn prompts into answers. `ClipboardBackend` keeps the manual ChatGPT round trip; `HTTPBackend` talks to an
+OpenAI-compatible chat completions endpoint and submits many prompts at once with asyncio.
+'''
+import asyncio
+import concurrent.futures
+import json
+import time
+from abc import ABC, abstractmethod
+import pyperclip
+import requests
+
+
+class LLMError(Exception):
+    pass
+
+
+class _RetryableError(Exception):
+    pass
+
+
+class LLMBackend(ABC):
+    @abstractmethod
+    def complete(self, prompt:str) -> str:
+        '''
+        Return the answer to a prompt.
+        '''
+        pass
+
+
+    def complete_many(self, prompts:list) -> list:
+        '''
+        Return the answers to a list of prompts, in order.
+        '''
+        return [self.complete(prompt) for prompt in prompts]
+
+
+    def stream(self, prompt:str):
+        '''
+        Yield the answer to a prompt in chunks as it is generated. By default the whole answer is one chunk.
+        '''
+        yield self.complete(prompt)
+
+
+class ClipboardBackend(LLMBackend):
+    '''
+    Copies each prompt to the clipboard and waits until the answer has been copied back.
+    '''
+    def complete(self, prompt:str) -> str:
+        pyperclip.copy(prompt)
+        input('Please go to Chat GPT, copy the answer and press Enter.')
+        return pyperclip.paste()
+
+
+class HTTPBackend(LLMBackend):
+    '''
+    An asyncio client for an OpenAI-compatible `/v1/chat/completions` endpoint.
+
+    Args:
+    - url (str): The base url, e.g. `https://api.openai.com` or the url of `LLMStandIn`.
+    - model (str): The model name sent with each request.
+    - api_key (str, optional): Sent as a bearer token.
+    - concurrency (int): The maximal number of requests in flight.
+    - retries (int): How often a failed request (connection error, timeout, 429 or 5xx) is retried.
+    - timeout (float): The connect and read timeout of one request, in seconds, passed to `requests`. It bounds the wait for
+    the connection and for each part of the answer, not the total time of a slowly streamed answer.
+    - backoff (float): The wait before the first retry, in seconds; it doubles with every retry.
+    '''
+    def __init__(self, url:str, model:str, api_key:str=None, concurrency:int=4, retries:int=3, timeout:float=120, backoff:float=1.0):
+        self.url = url.rstrip('/') + '/v1/chat/completions'
+        self.model = model
+        self.api_key = api_key
+        self.concurrency = concurrency
+        self.retries = retries
+        self.timeout = timeout
+        self.backoff = backoff
+
+
+    def complete(self, prompt:str) -> str:
+        return self.complete_many([prompt])[0]
+
+
+    def complete_many(self, prompts:list) -> list:
+        coroutine = self.acomplete_many(prompts)
+        try:
+            asyncio.get_running_loop()
+        except RuntimeError:
+            return asyncio.run(coroutine)
+        # Jupyter already runs an event loop, so the requests get a loop of their own in another thread.
+        with concurrent.futures.ThreadPoolExecutor(max_workers=1) as executor:
+            return executor.submit(asyncio.run, coroutine).result()
+
+
+    async def acomplete_many(self, prompts:list) -> list:
+        semaphore = asyncio.Semaphore(self.concurrency)
+        return await asyncio.gather(*(self.acomplete(prompt, semaphore) for prompt in prompts))
+
+
+    async def acomplete(self, prompt:str, semaphore:asyncio.Semaphore=None) -> str:
+        semaphore = semaphore or asyncio.Semaphore(1)
+        async with semaphore:
+            for attempt in range(self.retries + 1):
+                try:
+                    # The timeout is enforced by `requests` inside the worker thread: a thread cannot be cancelled, so
+                    # a timeout around `to_thread` would leave the request running and holding a worker.
+                    return await asyncio.to_thread(self.__post, prompt)
+                except (requests.ConnectionError, requests.Timeout, _RetryableError) as error:
+                    if attempt == self.retries:
+                        raise LLMError(f'The request failed after {self.retries + 1} attempts: {error}') from error
+                    await asyncio.sleep(self.backoff * 2**attempt)
+
+
+    def stream(self, prompt:str):
+        '''
+        Yield the answer in chunks from a streamed (server-sent events) response. Failed requests are not retried once the
+        first chunk has arrived.
+        '''
+        for attempt in range(self.retries + 1):
+            try:
+                response = self.__request(prompt, stream=True)
+                break
+            except (requests.ConnectionError, requests.Timeout, _RetryableError) as error:
+                if attempt == self.retries:
+                    raise LLMError(f'The request failed after {self.retries + 1} attempts: {error}') from error
+                time.sleep(self.backoff * 2**attempt)
+        with response:
+            for line in response.iter_lines(decode_unicode=True):
+                if not line or not line.startswith('data:'):
+                    continue
+                data = line[len('data:'):].strip()
+                if data == '[DONE]':
+                    break
+                content = json.loads(data)['choices'][0]['delta'].get('content')
+                if content:
+                    yield content
+
+
+    def __request(self, prompt:str, stream:bool=False) -> requests.Response:
+        headers = {'Content-Type': 'application/json'}
+        if self.api_key:
+            headers['Authorization'] = f'Bearer {self.api_key}'
+        data = {'model': self.model, 'messages': [{'role': 'user', 'content': prompt}]}
+        if stream:
+            data['stream'] = True
+        response = requests.post(self.url, json=data, headers=headers, timeout=self.timeout, stream=stream)
+        if response.status_code != 200:
+            # The connection of a failed response is released before raising; the caller only closes successful ones.
+            with response:
+                if response.status_code == 429 or response.status_code >= 500:
+                    raise _RetryableError(f'HTTP {response.status_code}')
+                raise LLMError(f'HTTP {response.status_code}: {response.text}')
+        response.encoding = 'utf-8'
+        return response
+
+
+    def __post(self, prompt:str) -> str:
+        with self.__request(prompt) as response:
+            return response.json()['choices'][0]['message']['content']
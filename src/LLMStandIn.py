@@ -0,0 +1,113 @@
+'''
+A local stand-in for an OpenAI-compatible chat completions server, so that `HTTPBackend` and the generation steps can be
+run and tested offline.
+
+    with LLMStandIn(responder=lambda prompt: '{}') as server:
+        backend = HTTPBackend(server.url, model='stand-in')
+        answers = backend.complete_many(prompts)
+'''
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+class LLMStandIn:
+    '''
+    Args:
+    - responder (callable, optional): Maps a prompt to the answer text. By default the prompt is echoed.
+    - latency (float): Seconds to wait before answering, to imitate generation time.
+    - failures (int): The number of first requests answered with HTTP 500, to exercise retries.
+    - chunk_size (int): The number of characters per chunk of a streamed answer.
+    '''
+    def __init__(self, responder=None, latency:float=0.0, failures:int=0, chunk_size:int=16) -> None:
+        self.responder = responder or (lambda prompt: prompt)
+        self.latency = latency
+        self.failures = failures
+        self.chunk_size = chunk_size
+        self.requests = 0
+        self.__lock = threading.Lock()
+        self.__server = ThreadingHTTPServer(('127.0.0.1', 0), self.__handler())
+        self.__server.daemon_threads = True
+        self.__thread = None
+
+
+    @property
+    def url(self) -> str:
+        host, port = self.__server.server_address[:2]
+        return f'http://{host}:{port}'
+
+
+    def start(self) -> 'LLMStandIn':
+        self.__thread = threading.Thread(target=self.__server.serve_forever, daemon=True)
+        self.__thread.start()
+        return self
+
+
+    def stop(self) -> None:
+        self.__server.shutdown()
+        self.__server.server_close()
+
+
+    def __enter__(self):
+        return self.start()
+
+
+    def __exit__(self, *exc_info):
+        self.stop()
+
+
+    def _answer(self, body:dict):
+        with self.__lock:
+            self.requests += 1
+            failing = self.requests <= self.failures
+        time.sleep(self.latency)
+        if failing:
+            return 500, {'error': {'message': 'Injected failure'}}
+        prompt = body['messages'][-1]['content']
+        content = self.responder(prompt)
+        if body.get('stream'):
+            return 200, [{'object': 'chat.completion.chunk',
+                          'model': body.get('model', ''),
+                          'choices': [{'index': 0, 'delta': {'content': content[start:start + self.chunk_size]}}]}
+                         for start in range(0, len(content), self.chunk_size)]
+        return 200, {'object': 'chat.completion',
+                     'model': body.get('model', ''),
+                     'choices': [{'index': 0, 'finish_reason': 'stop', 'message': {'role': 'assistant', 'content': content}}]}
+
+
+    def __handler(self):
+        stand_in = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_POST(self):
+                if self.path.rstrip('/') != '/v1/chat/completions':
+                    self.send_error(404)
+                    return
+                length = int(self.headers.get('Content-Length', 0))
+                status, answer = stand_in._answer(json.loads(self.rfile.read(length)))
+                if isinstance(answer, list):
+                    self.__send_events(answer)
+                    return
+                data = json.dumps(answer, ensure_ascii=False).encode('utf-8')
+                self.send_response(status)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+            def __send_events(self, chunks:list):
+                self.send_response(200)
+                self.send_header('Content-Type', 'text/event-stream')
+                self.send_header('Connection', 'close')
+                self.end_headers()
+                for chunk in chunks:
+                    self.wfile.write(f'data: {json.dumps(chunk, ensure_ascii=False)}\n\n'.encode('utf-8'))
+                    self.wfile.flush()
+                self.wfile.write(b'data: [DONE]\n\n')
+                self.close_connection = True
+
+            def log_message(self, format, *args):
+                pass
+
+        return Handler
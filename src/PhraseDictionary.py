@@ -2,8 +2,17 @@ import json
 import prompts
 import pyperclip
 import itertools
+import DictionaryCache
 from copy import deepcopy
 from DictionaryReader import phrase_json_path
+from FullTextIndex import FullTextIndex
+from HeadwordIndex import HeadwordIndex
+from ContentHash import dedupe
+from toolbox import Configurator
+from PromptBatcher import PromptBatcher
+from LLMBackend import LLMBackend
+from GenerationCache import GenerationCache
+import StreamingJSON
 
 phrase_json_config_path = '../scr/config/Alltagsdeutsch/config.json'
 
@@ -11,8 +20,7 @@ phrase_json_config_path = '../scr/config/Alltagsdeutsch/config.json'
 class PhraseDictionary:
     def __init__(self):
         self.init_phrase_dict = dict()
-        with open(phrase_json_path) as file:
-            self.phrase_dict = json.load(file)
+        self.phrase_dict = DictionaryCache.load_dictionary(phrase_json_path)
 
 
     def import_initial_JSON(self, json_path:str):
@@ -21,26 +29,54 @@ class PhraseDictionary:
         '''
         with open(json_path) as file:
             self.init_phrase_dict = json.load(file)
-        word_list = self.init_phrase_dict.keys()
-        with open(phrase_json_config_path) as file:
-            old_config = json.load(file)
-        seen = set(old_config.get('all', []))
-        for word in word_list:
-            if word not in seen:
-                old_config['new'].append(word)
-                old_config['all'].append(word)
-        with open(phrase_json_config_path, 'w') as file:
-            json.dump(old_config, file, ensure_ascii=False, indent=4)
+        Configurator(phrase_json_config_path).add_words(list(self.init_phrase_dict))
 
 
 
     def get_prompt(self, start_index:int, end_index:int):
         dict_in_the_prompt = dict(itertools.islice(self.init_phrase_dict.items(), start_index, end_index))
+        pyperclip.copy(self._build_prompt(dict_in_the_prompt))
+        print('Please go to Chat GPT to generate the JSON file.')
+
+
+    def iter_prompts(self, batcher:PromptBatcher=None, terms:list=None):
+        '''
+        Yield `(terms, prompt)` for the terms (by default all the terms of the initial JSON), packed into as few prompts as the
+        batcher's budget allows, instead of choosing `start_index` and `end_index` by hand.
+        '''
+        batcher = batcher or PromptBatcher()
+        terms = self.init_phrase_dict if terms is None else terms
+        payloads = {term: json.dumps({term: self.init_phrase_dict[term]}, ensure_ascii=False) for term in terms}
+        for terms in batcher.batches(payloads, template=self._build_prompt(dict())):
+            yield terms, self._build_prompt({term: self.init_phrase_dict[term] for term in terms})
+
+
+    def generate_entries(self, backend:LLMBackend, batcher:PromptBatcher=None, cache:GenerationCache=None):
+        '''
+        Define all the terms of the initial JSON through the backend, with all the prompt batches submitted at once,
+        and import the new entries. With a cache, terms defined before with the same notes are not sent again.
+        '''
+        keys = {term: GenerationCache.key(prompts.phrase_def_prompt, term, json.dumps(entry, ensure_ascii=False, sort_keys=True))
+                for term, entry in self.init_phrase_dict.items()}
+        cached = cache.get_many(list(keys.values())) if cache else dict()
+        new_dict = {term: cached[key] for term, key in keys.items() if key in cached}
+        missing_terms = [term for term in keys if term not in new_dict]
+        batches = list(self.iter_prompts(batcher, terms=missing_terms))
+        answers = backend.complete_many([prompt for _, prompt in batches])
+        generated = dict()
+        for answer in answers:
+            generated.update(StreamingJSON.loads(answer))
+        if cache:
+            cache.put_many({keys[term]: entry for term, entry in generated.items() if term in keys})
+        new_dict.update(generated)
+        self.import_new_entries(new_dict=new_dict)
+
+
+    def _build_prompt(self, dict_in_the_prompt:dict) -> str:
         prompt = prompts.phrase_def_prompt
         prompt += '\n' + 'Please use define the following terms and write example sentences for each.' + '\n'
         prompt += json.dumps(dict_in_the_prompt, ensure_ascii=False)
-        pyperclip.copy(prompt)
-        print('Please go to Chat GPT to generate the JSON file.')
+        return prompt
 
     
     def import_new_entries(self, new_dict:dict):
@@ -58,10 +94,46 @@ class PhraseDictionary:
                 extended_entry['Redewendungen'] = []
                 extended_dict[word].append(deepcopy(extended_entry))
         
-        self.phrase_dict.update(extended_dict)
-        with open(phrase_json_path, 'w') as file:
-            json.dump(self.phrase_dict, file, indent=4, ensure_ascii=False)
-        print('==== Import successful ====')    
+        self.phrase_dict = {**self.phrase_dict, **extended_dict}
+        DictionaryCache.update_entries(phrase_json_path, extended_dict, replace=True)
+        full_text_index = FullTextIndex()
+        if full_text_index.index_path.exists():
+            full_text_index.add_entries('phrases', extended_dict, replace=True)
+            full_text_index.save()
+        print('==== Import successful ====')
+
+
+    def compact(self):
+        '''
+        Rewrite the phrase dictionary snapshot with all the imports recorded in the journal.
+        '''
+        DictionaryCache.compact(phrase_json_path)
+        self.phrase_dict = DictionaryCache.load_dictionary(phrase_json_path)
+
+
+    def dedupe(self) -> int:
+        '''
+        Remove repeated entries (same definition and examples) from the phrase dictionary and rewrite the snapshot.
+        The saved headword and full-text indexes are updated, since the positions of the remaining entries shift.
+        Returns the number of removed entries.
+        '''
+        deduped, removed = dedupe(self.phrase_dict)
+        if removed:
+            changed = {term: entries for term, entries in deduped.items() if len(entries) < len(self.phrase_dict[term])}
+            DictionaryCache.compact(phrase_json_path, deduped)
+            self.phrase_dict = DictionaryCache.load_dictionary(phrase_json_path)
+
+            headword_index = HeadwordIndex(phrase_json_path)
+            if headword_index.index_path.exists():
+                headword_index.build()
+                headword_index.save()
+
+            full_text_index = FullTextIndex()
+            if full_text_index.index_path.exists():
+                full_text_index.add_entries('phrases', changed, replace=True)
+                full_text_index.save()
+        print(f'==== Removed {removed} duplicate entries ====')
+        return removed    
 
 
 
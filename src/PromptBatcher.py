@@ -0,0 +1,62 @@
+'''
+Packs the terms of a prompt into as few batches as possible under a size budget, so that large word lists need few round trips
+without any prompt running into the model's limits.
+'''
+
+default_budget = 3000
+chars_per_token = 4
+
+
+def estimate_tokens(text:str) -> int:
+    '''
+    A rough token count: about four characters per token for German and English text.
+    '''
+    return -(-len(text) // chars_per_token)
+
+
+class PromptBatcher:
+    '''
+    Packs terms into batches whose total size fits a budget.
+
+    Args:
+    - budget (int): The budget per prompt, in tokens (or in characters if `unit` is `chars`).
+    - unit (str): `tokens` or `chars`.
+    - per_term (int): An extra size counted for every term, e.g. the expected size of the answer for one term.
+    '''
+    def __init__(self, budget:int=default_budget, unit:str='tokens', per_term:int=0) -> None:
+        if unit not in ('tokens', 'chars'):
+            raise ValueError(f'Invalid unit {unit}!')
+        self.budget = budget
+        self.unit = unit
+        self.per_term = per_term
+
+
+    def size(self, text:str) -> int:
+        return estimate_tokens(text) if self.unit == 'tokens' else len(text)
+
+
+    def batches(self, payloads:dict, template:str=''):
+        '''
+        Yield lists of terms whose payloads fit into one prompt together with the template.
+        The terms are packed first-fit by decreasing size, which gives few and full batches; a term that does not fit into the
+        budget on its own gets a batch of its own. The terms keep their original order within each batch.
+
+        Args:
+        - payloads (dict): A dictionary from each term to the text that the prompt contains for it (e.g. its definition).
+        - template (str): The fixed part of the prompt.
+        '''
+        available = self.budget - self.size(template)
+        order = {term: i for i, term in enumerate(payloads)}
+        sizes = {term: self.size(payload) + self.per_term for term, payload in payloads.items()}
+        bins = []
+        for term in sorted(payloads, key=sizes.get, reverse=True):
+            for batch in bins:
+                if batch[0] + sizes[term] <= available:
+                    batch[0] += sizes[term]
+                    batch[1].append(term)
+                    break
+            else:
+                bins.append([sizes[term], [term]])
+        bins.sort(key=lambda batch: min(order[term] for term in batch[1]))
+        for _, terms in bins:
+            yield sorted(terms, key=order.get)
@@ -0,0 +1,14 @@
+'''
+Batching of the key lists that the SQLite stores (`DictionaryStore`, `ConfigStore`, `GenerationCache`, `CardCache`) pass
+to `... IN (?, ?, ...)` queries.
+'''
+# SQLite limits the number of host parameters in a single statement (999 before SQLite 3.32).
+max_parameters = 500
+
+
+def batched(items:list, size:int=max_parameters):
+    '''
+    Yield consecutive slices of `items` with at most `size` items each, as lists.
+    '''
+    for start in range(0, len(items), size):
+        yield list(items[start:start + size])
@@ -0,0 +1,158 @@
+'''
+A sharded on-disk layout for dictionaries. A sharded dictionary is a folder with a `manifest.json` and one file per shard;
+headwords are assigned to shards by their normalised first letter. Updates rewrite only the shards they touch, so a cloud
+folder only re-uploads those files, and lookups open only the shards of the words they need.
+
+Use `migrate` to convert a single-file dictionary (with its journal) to the sharded layout.
+'''
+import json
+from pathlib import Path
+import DictionaryCache
+from HeadwordIndex import normalize
+
+manifest_name = 'manifest.json'
+
+
+def is_sharded(path:str) -> bool:
+    path = Path(path)
+    return path.is_dir() and (path / manifest_name).exists()
+
+
+def shard_key(headword:str) -> str:
+    '''
+    The shard of a headword: its normalised first letter, or `_` if it does not start with a letter.
+    '''
+    first = normalize(headword)[:1]
+    return first if first.isalpha() else '_'
+
+
+class ShardedDictionary:
+    '''
+    A dictionary stored as shards in `folder`. It offers the same `refresh` and `get_many` methods as `DictionaryStore`, so that
+    `DictionaryReader` can use either.
+    '''
+    version = 1
+
+    def __init__(self, folder:str) -> None:
+        self.folder = Path(folder)
+        with open(self.folder / manifest_name) as file:
+            self.manifest = json.load(file)
+        if self.manifest.get('version') != self.version:
+            raise ValueError(f'Unsupported shard manifest version in {self.folder}.')
+
+
+    def shard_path(self, key:str) -> Path:
+        return self.folder / f'{key}{self.manifest["format"]}'
+
+
+    def shard_paths(self) -> list:
+        return [self.shard_path(key) for key in self.manifest['shards']]
+
+
+    def refresh(self) -> bool:
+        # The shards are the source of truth, there is nothing to rebuild.
+        return False
+
+
+    def close(self) -> None:
+        # The shards are read on demand, there is nothing to close.
+        pass
+
+
+    def get_many(self, words:list, fields:list=None) -> dict:
+        '''
+        Look up a list of headwords, loading only the shards that can contain them. See `DictionaryStore.get_many`.
+        '''
+        unique_words = list(dict.fromkeys(words))
+        found = dict()
+        for word in unique_words:
+            key = shard_key(word)
+            if key not in self.manifest['shards']:
+                continue
+            entries = DictionaryCache.load_json(self.shard_path(key)).get(word)
+            if entries:
+                if fields is not None:
+                    entries = [{field: entry.get(field) for field in fields} for entry in entries]
+                found[word] = entries
+        return found
+
+
+    def load_all(self) -> dict:
+        dictionary = dict()
+        for path in self.shard_paths():
+            dictionary.update(DictionaryCache.load_json(path))
+        return dictionary
+
+
+    def update(self, entries:dict, replace:bool=False) -> list:
+        '''
+        Add entries and rewrite only the shards that changed.
+
+        Args:
+        - entries (dict): A dictionary from headwords to lists of definition entries.
+        - replace (bool): If `True`, the entries replace the entries of the headword; otherwise they are appended to them.
+
+        Returns:
+        - list: The keys of the rewritten shards.
+        '''
+        changes = dict()
+        for headword, definition_entries in entries.items():
+            changes.setdefault(shard_key(headword), dict())[headword] = definition_entries
+        for key, shard_changes in changes.items():
+            path = self.shard_path(key)
+            shard = dict(DictionaryCache.load_json(path)) if key in self.manifest['shards'] else dict()
+            for headword, definition_entries in shard_changes.items():
+                if replace:
+                    shard[headword] = definition_entries
+                else:
+                    shard[headword] = [*shard.get(headword, ()), *definition_entries]
+            DictionaryCache.dump_json(path, shard)
+        new_keys = [key for key in changes if key not in self.manifest['shards']]
+        if new_keys:
+            self.manifest['shards'] = sorted([*self.manifest['shards'], *new_keys])
+            self.__write_manifest()
+        return list(changes)
+
+
+    def write_all(self, dictionary:dict) -> None:
+        '''
+        Replace the whole dictionary, e.g. after a deduplication pass. Shards whose content did not change are not rewritten.
+        '''
+        shards = dict()
+        for headword, definition_entries in dictionary.items():
+            shards.setdefault(shard_key(headword), dict())[headword] = definition_entries
+        for key, shard in shards.items():
+            path = self.shard_path(key)
+            if key not in self.manifest['shards'] or DictionaryCache.thaw(DictionaryCache.load_json(path)) != DictionaryCache.thaw(shard):
+                DictionaryCache.dump_json(path, shard)
+        for key in self.manifest['shards']:
+            if key not in shards:
+                self.shard_path(key).unlink()
+                DictionaryCache.invalidate(self.shard_path(key))
+        if sorted(shards) != self.manifest['shards']:
+            self.manifest['shards'] = sorted(shards)
+            self.__write_manifest()
+
+
+    def __write_manifest(self) -> None:
+        with open(self.folder / manifest_name, 'w') as file:
+            json.dump(self.manifest, file, indent=4, ensure_ascii=False)
+
+
+def migrate(json_path:str, folder:str, shard_format:str='.json') -> ShardedDictionary:
+    '''
+    Split a single-file dictionary (its snapshot with the journal replayed) into a sharded dictionary in `folder`.
+
+    Args:
+    - json_path (str): The path of the single-file dictionary.
+    - folder (str): The folder of the sharded dictionary. It is created if needed.
+    - shard_format (str): `.json` or `.vbs` (binary snapshots).
+    '''
+    folder = Path(folder)
+    folder.mkdir(parents=True, exist_ok=True)
+    with open(folder / manifest_name, 'w') as file:
+        json.dump({'version': ShardedDictionary.version, 'scheme': 'first-letter', 'format': shard_format, 'shards': []},
+                  file, indent=4, ensure_ascii=False)
+    sharded = ShardedDictionary(folder)
+    sharded.write_all(DictionaryCache.load_dictionary(json_path))
+    return sharded
@@ -0,0 +1,18 @@
+'''
+The paths of the files kept next to a dictionary or a config file: the journal, the SQLite stores and the headword index.
+'''
+from pathlib import Path
+
+
+def side_path(path:str, suffix:str) -> Path:
+    '''
+    The path of a side file, named after the whole file name: `x.json` has `x.json.sqlite` and its snapshot `x.vbs` has
+    `x.vbs.sqlite`, so the two formats of a file in the same folder never share a side file.
+    A side file with the former name, which replaced the suffix (`x.sqlite`), is renamed if the new one does not exist yet.
+    '''
+    path = Path(path)
+    side = path.with_name(path.name + suffix)
+    legacy = path.with_suffix(suffix)
+    if legacy != side and legacy.exists() and not side.exists():
+        legacy.rename(side)
+    return side
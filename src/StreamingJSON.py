@@ -0,0 +1,136 @@
+'''
+An incremental parser for the JSON objects that the language model answers with, e.g. `{"term": [...], "term": [...]}`.
+
+The parser is fed the answer chunk by chunk as it is streamed and returns each top-level member as soon as it is complete,
+so the exercises can be built before the generation has finished. Text around the object (such as Markdown code fences)
+is ignored, and when the answer is truncated or one member is malformed, the other members are still returned.
+
+    parser = StreamingJSONParser()
+    for chunk in backend.stream(prompt):
+        for term, value in parser.feed(chunk):
+            ...
+    parser.close()
+'''
+import json
+import re
+
+_structure = re.compile(r'["{}\[\],]')
+_string_end = re.compile(r'["\\]')
+
+
+class StreamingJSONParser:
+    '''
+    Members:
+    - skipped (list): The text of the members that could not be decoded.
+    - truncated (bool): Whether the answer ended inside an object; set by `close`.
+    '''
+    def __init__(self) -> None:
+        self.skipped = []
+        self.truncated = False
+        self.__buffer = ''
+        self.__position = 0
+        self.__depth = 0
+        self.__in_string = False
+        self.__member_start = None
+
+
+    def feed(self, chunk:str) -> list:
+        '''
+        Add a chunk of the answer and return the `(key, value)` pairs of the top-level members completed by it.
+        '''
+        self.__buffer += chunk
+        members = []
+        buffer = self.__buffer
+        position = self.__position
+        while position < len(buffer):
+            if self.__depth == 0:
+                start = buffer.find('{', position)
+                if start == -1:
+                    position = len(buffer)
+                    break
+                self.__depth = 1
+                self.__member_start = position = start + 1
+            elif self.__in_string:
+                match = _string_end.search(buffer, position)
+                if match is None:
+                    position = len(buffer)
+                elif match.group() == '\\':
+                    if match.end() == len(buffer):
+                        # The escaped character is in the next chunk.
+                        position = match.start()
+                        break
+                    position = match.end() + 1
+                else:
+                    self.__in_string = False
+                    position = match.end()
+            else:
+                match = _structure.search(buffer, position)
+                if match is None:
+                    position = len(buffer)
+                    break
+                char, position = match.group(), match.end()
+                if char == '"':
+                    self.__in_string = True
+                elif char in '{[':
+                    self.__depth += 1
+                elif char in '}]':
+                    self.__depth -= 1
+                    if self.__depth == 0:
+                        self.__decode(buffer[self.__member_start:match.start()], members)
+                elif char == ',' and self.__depth == 1:
+                    self.__decode(buffer[self.__member_start:match.start()], members)
+                    self.__member_start = position
+        # Keep only the text that is still needed.
+        keep = self.__member_start if self.__depth > 0 else position
+        self.__buffer = buffer[keep:]
+        self.__position = position - keep
+        if self.__member_start is not None:
+            self.__member_start -= keep
+        return members
+
+
+    def close(self) -> None:
+        '''
+        Finish the answer. An incomplete last member is dropped and `truncated` is set.
+        '''
+        self.truncated = self.__depth > 0
+        self.__buffer = ''
+        self.__position = 0
+        self.__depth = 0
+        self.__in_string = False
+        self.__member_start = None
+
+
+    def __decode(self, text:str, members:list) -> None:
+        text = text.strip()
+        if not text:
+            return
+        try:
+            members.extend(json.loads('{' + text + '}').items())
+        except json.JSONDecodeError:
+            self.skipped.append(text)
+
+
+def iter_members(chunks):
+    '''
+    Yield the `(key, value)` pairs of the top-level members of a streamed answer, as soon as each one is complete.
+
+    Args:
+    - chunks (iterable): The chunks of the answer, e.g. `LLMBackend.stream(prompt)`, or a single string.
+    '''
+    if isinstance(chunks, str):
+        chunks = [chunks]
+    parser = StreamingJSONParser()
+    for chunk in chunks:
+        yield from parser.feed(chunk)
+    parser.close()
+    if parser.truncated or parser.skipped:
+        print(f'The answer was incomplete: {len(parser.skipped)} malformed entries were skipped'
+              + (' and the last entry was cut off.' if parser.truncated else '.'))
+
+
+def loads(text:str) -> dict:
+    '''
+    Decode an answer into a dictionary, salvaging the complete members of a truncated or partly malformed answer.
+    '''
+    return dict(iter_members(text))
@@ -0,0 +1,83 @@
+import re
+
+
+class TextNormalizer:
+    '''
+    Prepares generated and dictionary text for LaTeX:
+    - typographic quotes become plain quotes, and a quote that starts a word becomes the LaTeX opening quote `` ` ``;
+    - en dashes become `--` and pounds become `\\pounds{}`, whose braces keep the following space;
+    - the LaTeX specials `&`, `%`, `_` and `#` are escaped, unless they already are: a special counts as escaped if an odd
+      number of backslashes precedes it, since `\\\\` is a line break.
+
+    All the replacements are in one table of fixed strings, applied with `str.replace`, which scans a string much faster
+    than `str.translate` or a regex with a callback. Only text that already contains backslashes needs the regex that leaves
+    escaped specials alone. `normalize_many` joins a whole batch of strings and processes it with a single call of each
+    replacement, which is much faster than one call per string.
+    '''
+    # A separator between the strings of a batch, which also counts as the start of a word.
+    separator = '\x00'
+    table = (('’', "'"), ('‘', "'"), ('“', '"'), ('”', '"'), ('–', '--'),
+             (" '", ' `'), (separator + "'", separator + '`'))
+    specials = '&%_#'
+    # The backslashes before a special, which must all be matched so that only an even number counts as unescaped.
+    escaped_pattern = re.compile(r'(?<!\\)((?:\\\\)*)([&%_#])')
+
+    def normalize(self, text:str) -> str:
+        escape_with_regex = '\\' in text
+        for old, new in self.table:
+            if old in text:
+                text = text.replace(old, new)
+        if text.startswith("'"):
+            text = '`' + text[1:]
+        if escape_with_regex:
+            text = self.escaped_pattern.sub(r'\1\\\2', text)
+        else:
+            for special in self.specials:
+                if special in text:
+                    text = text.replace(special, '\\' + special)
+        # After the escapes, so that the backslash of `\pounds{}` is not taken for an escape.
+        return text.replace('£', r'\pounds{}') if '£' in text else text
+
+
+    def normalize_many(self, texts:list) -> list:
+        '''
+        Normalize a list of strings at once.
+        '''
+        if not texts:
+            return []
+        joined = self.separator.join(texts)
+        if joined.count(self.separator) != len(texts) - 1:
+            # A string contains the separator itself.
+            return [self.normalize(text) for text in texts]
+        return self.normalize(joined).split(self.separator)
+
+
+    def normalize_values(self, value):
+        '''
+        Normalize every string in a json value, e.g. a whole dictionary or an answer of the language model, with one
+        `normalize_many` call. Other values are kept as they are.
+        '''
+        texts = []
+        self.__collect(value, texts)
+        return self.__rebuild(value, iter(self.normalize_many(texts)))
+
+
+    def __collect(self, value, texts:list) -> None:
+        if isinstance(value, str):
+            texts.append(value)
+        elif isinstance(value, dict):
+            for item in value.values():
+                self.__collect(item, texts)
+        elif isinstance(value, list):
+            for item in value:
+                self.__collect(item, texts)
+
+
+    def __rebuild(self, value, normalized):
+        if isinstance(value, str):
+            return next(normalized)
+        if isinstance(value, dict):
+            return {key: self.__rebuild(item, normalized) for key, item in value.items()}
+        if isinstance(value, list):
+            return [self.__rebuild(item, normalized) for item in value]
+        return value
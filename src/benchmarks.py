@@ -0,0 +1,432 @@
+'''
+Benchmarks for the dictionary and export tooling. Run a benchmark from the `src` folder with
+
+    python benchmarks.py <name>
+
+where `<name>` is one of the keys of `benchmarks` at the bottom of this file.
+'''
+import json
+import random
+import sys
+import tempfile
+import time
+import tracemalloc
+from pathlib import Path
+
+
+def synthetic_dictionary(n_words:int, entries_per_word:int=2, seed:int=0) -> dict:
+    '''
+    Create a dictionary with the same layout as the Copilot Dictionary.
+    '''
+    rng = random.Random(seed)
+    syllables = ['ab', 'be', 'ch', 'de', 'er', 'fa', 'ge', 'hau', 'ig', 'ke', 'lu', 'mö', 'na', 'or', 'pf', 'rä', 'st', 'tü', 'ung', 'zw']
+    dictionary = dict()
+    while len(dictionary) < n_words:
+        word = ''.join(rng.choice(syllables) for _ in range(rng.randint(2, 5)))
+        dictionary[word] = [{'Definition': f'Wenn man {word} sagt, meint man die Bedeutung Nummer {i}.',
+                             'Anwendung': '',
+                             'Beispiele': [f'Das Wort {word} steht im {k}. Beispielsatz.' for k in range(2)],
+                             'Formen': '',
+                             'Redewendungen': []}
+                            for i in range(entries_per_word)]
+    return dictionary
+
+
+def _timed(function, *args, **kwargs):
+    start = time.perf_counter()
+    result = function(*args, **kwargs)
+    return result, time.perf_counter() - start
+
+
+def _traced(function, *args, **kwargs):
+    tracemalloc.start()
+    start = time.perf_counter()
+    result = function(*args, **kwargs)
+    elapsed = time.perf_counter() - start
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return result, elapsed, peak
+
+
+def benchmark_dictionary_store(n_words:int=100000, n_lookups:int=20):
+    '''
+    Compare the cold-start cost of looking up a day's word list with a full `json.load` against the indexed store.
+    '''
+    from DictionaryStore import DictionaryStore
+
+    dictionary = synthetic_dictionary(n_words)
+    word_list = random.Random(1).sample(list(dictionary), n_lookups)
+    with tempfile.TemporaryDirectory() as folder:
+        json_path = Path(folder) / 'dictionary.json'
+        with open(json_path, 'w') as file:
+            json.dump(dictionary, file, indent=4, ensure_ascii=False)
+        del dictionary
+
+        def json_lookup():
+            with open(json_path) as file:
+                loaded = json.load(file)
+            return {word: loaded[word] for word in word_list}
+
+        def store_lookup(fields=None):
+            store = DictionaryStore(json_path)
+            store.refresh()
+            entries = store.get_many(word_list, fields=fields)
+            store.close()
+            return entries
+
+        _, build_time = _timed(DictionaryStore(json_path).rebuild)
+        expected, json_time = _timed(json_lookup)
+        found, store_time = _timed(store_lookup)
+        _, projection_time = _timed(store_lookup, fields=['Definition'])
+        assert found == expected
+
+    print(f'{n_words} headwords, {n_lookups} lookups')
+    print(f'  json.load + lookup:        {json_time * 1000:9.2f} ms')
+    print(f'  store rebuild (one-off):   {build_time * 1000:9.2f} ms')
+    print(f'  store open + get_many:     {store_time * 1000:9.2f} ms')
+    print(f'  store open + definitions:  {projection_time * 1000:9.2f} ms')
+
+
+def benchmark_word_entries(n_words:int=10000):
+    '''
+    Compare building word entries as deep-copied dictionaries, as the reader used to, against the slotted records.
+    '''
+    from copy import deepcopy
+    from DictionaryReader import GermanDictionaryReader
+
+    dictionary = synthetic_dictionary(n_words)
+
+    class DictWordEntry:
+        def __init__(self, word):
+            self.headword = word
+            self.definition_entries = []
+
+    def build_dicts():
+        entries = []
+        for word, definition_entries in dictionary.items():
+            word_entry = DictWordEntry(word)
+            for entry in definition_entries:
+                definition_entry = {'conjugation': entry['Formen'], 'definition': entry['Definition'],
+                                    'examples': entry['Beispiele'], 'part of speech': '', 'usage': entry['Anwendung']}
+                word_entry.definition_entries.append(deepcopy(definition_entry))
+            entries.append(deepcopy(word_entry))
+        return entries
+
+    def build_records():
+        return [GermanDictionaryReader._make_word_entry(word, definition_entries)
+                for word, definition_entries in dictionary.items()]
+
+    for name, build in [('deep-copied dicts', build_dicts), ('slotted records', build_records)]:
+        _, elapsed, peak = _traced(build)
+        print(f'  {name:18} {elapsed * 1000:9.2f} ms  peak {peak / 2**20:7.2f} MiB  ({n_words} headwords)')
+
+
+def benchmark_full_text_index(n_words:int=50000, n_queries:int=1000):
+    '''
+    Measure the query time of a fresh full-text index over `2 * n_words` definition entries, for rare tokens (headwords)
+    and for tokens that occur in every entry (`wenn`, `man`), whose posting lists are as long as the dictionary.
+    '''
+    from FullTextIndex import FullTextIndex
+
+    dictionary = synthetic_dictionary(n_words)
+    with tempfile.TemporaryDirectory() as folder:
+        index = FullTextIndex(index_path=Path(folder) / 'full text index.json')
+        _, build_time = _timed(index.add_entries, 'words', dictionary)
+    queries = random.Random(2).sample(list(dictionary), n_queries)
+    _, query_time = _timed(lambda: [index.search(query) for query in queries])
+    common_queries = ['wenn', 'man', 'wenn man']
+    # The first query of a token sorts its postings by impact; the later ones stop after the best hits.
+    _, first_time = _timed(lambda: [index.search(query) for query in common_queries])
+    _, common_time = _timed(lambda: [index.search(query) for query in common_queries * 100])
+    common_time /= 100 * len(common_queries)
+    print(f'{len(index.documents)} entries, {len(index.postings)} tokens, {len(index.postings["man"])} postings of "man"')
+    print(f'  build:            {build_time * 1000:9.2f} ms')
+    print(f'  headword query:   {query_time / n_queries * 1000:9.4f} ms per query')
+    print(f'  first common:     {first_time / len(common_queries) * 1000:9.4f} ms per query')
+    print(f'  common query:     {common_time * 1000:9.4f} ms per query')
+    assert common_time < 0.001, 'a query of a common token should take well under a millisecond'
+
+
+def benchmark_journal(sizes:tuple=(10000, 100000), n_notes:int=20):
+    '''
+    Compare the cost of importing a notes file by rewriting the whole dictionary against appending to the journal.
+    '''
+    import DictionaryCache
+
+    notes = {f'neues Wort {i}': {'Definition': 'Eine neue Bedeutung.', 'Anwendung': '', 'Beispiele': ['Ein Satz.'], 'Formen': ''}
+             for i in range(n_notes)}
+    for n_words in sizes:
+        dictionary = synthetic_dictionary(n_words)
+        with tempfile.TemporaryDirectory() as folder:
+            json_path = Path(folder) / 'dictionary.json'
+            DictionaryCache.dump_json(json_path, dictionary)
+
+            def rewrite():
+                updated = dict(dictionary)
+                for word, note in notes.items():
+                    updated[word] = [*updated.get(word, []), note]
+                DictionaryCache.dump_json(json_path, updated)
+
+            _, rewrite_time = _timed(rewrite)
+            _, journal_time = _timed(DictionaryCache.append_journal, json_path, {word: [note] for word, note in notes.items()})
+            assert len(DictionaryCache.load_dictionary(json_path)) == n_words + n_notes
+        print(f'{n_words} headwords, {n_notes} notes')
+        print(f'  full rewrite:    {rewrite_time * 1000:9.2f} ms')
+        print(f'  journal append:  {journal_time * 1000:9.2f} ms')
+
+
+def benchmark_snapshot(n_words:int=50000):
+    '''
+    Compare load time, save time and file size of the pretty-printed json dictionary and the binary snapshot,
+    on a dictionary with `2 * n_words` entries.
+    '''
+    import BinarySnapshot
+    import DictionaryCache
+
+    dictionary = synthetic_dictionary(n_words)
+    with tempfile.TemporaryDirectory() as folder:
+        for name in ['dictionary.json', 'dictionary.vbs']:
+            path = Path(folder) / name
+            _, save_time = _timed(DictionaryCache.dump_json, path, dictionary)
+            loaded, load_time = _timed(DictionaryCache.load_json, path)
+            assert DictionaryCache.thaw(loaded) == dictionary
+            print(f'  {name:16} save {save_time * 1000:9.2f} ms  load {load_time * 1000:9.2f} ms  '
+                  f'size {path.stat().st_size / 2**20:7.2f} MiB')
+        json_path = BinarySnapshot.snapshot_to_json(Path(folder) / 'dictionary.vbs', Path(folder) / 'round trip.json')
+        assert json_path.read_bytes() == (Path(folder) / 'dictionary.json').read_bytes()
+
+
+def benchmark_configurator(n_words:int=100000, n_sessions:int=50, n_per_session:int=20):
+    '''
+    Compare the in-memory cost of `Configurator.study_n_words` with the former list-based update, and time the whole call
+    including writing the config file.
+    '''
+    from copy import deepcopy
+    from toolbox import Configurator, WordQueue
+
+    words = list(synthetic_dictionary(n_words, entries_per_word=1))
+
+    def study_lists(config, n):
+        new_word_list = config['new'][:n]
+        config['review'] += new_word_list
+        new_list = [word for word in config['new'] if word not in new_word_list]
+        config['review'] = deepcopy(config['review'])
+        config['new'] = deepcopy(new_list)
+        config['last change'] = deepcopy(new_list)
+
+    def study_queues(new, review, n):
+        review.extend(new.take(n))
+
+    config = {'all': words, 'new': list(words), 'review': [], 'last change': []}
+    _, list_time = _timed(lambda: [study_lists(config, n_per_session) for _ in range(n_sessions)])
+    new, review = WordQueue(words), WordQueue()
+    _, queue_time = _timed(lambda: [study_queues(new, review, n_per_session) for _ in range(n_sessions)])
+    assert list(new) == config['new'] and list(review) == config['review']
+    with tempfile.TemporaryDirectory() as folder:
+        configurator = Configurator(Path(folder) / 'config.json')
+        configurator.initialise(words)
+        _, call_time = _timed(lambda: [configurator.study_n_words(n_per_session) for _ in range(n_sessions)])
+        configurator = Configurator(Path(folder) / 'config.json', use_sqlite=True)
+        configurator.initialise(words)
+        _, sqlite_time = _timed(lambda: [configurator.study_n_words(n_per_session) for _ in range(n_sessions)])
+        _, undo_time = _timed(configurator.store.undo)
+    print(f'{n_words} words, {n_sessions} sessions of {n_per_session} words')
+    print(f'  lists, per session:               {list_time / n_sessions * 1000:9.2f} ms')
+    print(f'  queues, per session:              {queue_time / n_sessions * 1000:9.2f} ms')
+    print(f'  study_n_words with file writing:  {call_time / n_sessions * 1000:9.2f} ms  (dominated by rewriting the file)')
+    print(f'  study_n_words with SQLite:        {sqlite_time / n_sessions * 1000:9.2f} ms  (including the export of the json file)')
+    print(f'  undo of the last session:         {undo_time * 1000:9.2f} ms')
+
+
+def benchmark_scheduler(n_words:int=100000, reviews_per_word:int=5, n_queries:int=100):
+    '''
+    Time the import of a review history into `SRSScheduler`, one vectorised pass over all the words, and the
+    "due in n days" queries of the due index against a scan of the due days.
+    '''
+    import numpy as np
+    from toolbox import SRSScheduler
+
+    rng = random.Random(0)
+    today = 739000
+    words = list(synthetic_dictionary(n_words, entries_per_word=1))
+    reviews = [(word, today - rng.randint(0, 365), rng.choice([1, 2, 3, 3, 3, 4])) for word in words for _ in range(reviews_per_word)]
+    with tempfile.TemporaryDirectory() as folder:
+        scheduler = SRSScheduler(Path(folder) / 'srs.npz')
+        _, import_time = _timed(scheduler.import_history, reviews)
+        # Catch up with the backlog, so that the queries see the load of a deck that is studied every day.
+        scheduler.review(scheduler.get_words_in_n_days(0, day=today), 3, today)
+        today += 1
+        _, pass_time = _timed(lambda: (scheduler.due_days(), scheduler.retrievability(today)))
+        due, index_time = _timed(lambda: [scheduler.get_words_in_n_days(1, day=today) for _ in range(n_queries)])
+
+        def scan():
+            due_days = scheduler.due_days()
+            order = np.argsort(due_days, kind='stable')
+            return [scheduler.words[i] for i in order if due_days[i] <= today + 1]
+
+        scanned, scan_time = _timed(lambda: [scan() for _ in range(n_queries)])
+        assert due[0] == scanned[0]
+    print(f'{n_words} words, {len(reviews)} reviews, {len(due[0])} due by tomorrow')
+    print(f'  history import:         {import_time * 1000:9.2f} ms')
+    print(f'  due days and recall:    {pass_time * 1000:9.2f} ms')
+    print(f'  due index query:        {index_time / n_queries * 1000:9.2f} ms')
+    print(f'  scan and sort query:    {scan_time / n_queries * 1000:9.2f} ms')
+
+
+def benchmark_anki(sizes:tuple=(5000, 50000), chunk_sizes:tuple=(10**9, 1000, 250), latency:float=0.0):
+    '''
+    Measure round trips, time and payload sizes of `AnkiCommunicator.get_words_in_n_days` against the AnkiConnect stand-in,
+    for several chunk sizes; the largest chunk size sends all the cards in one `cardsInfo` request. Then compare a cold and
+    a warm run with a `CardCache`, after 1% of the due cards have been reviewed.
+    '''
+    from AnkiConnect import AnkiConnectClient
+    from AnkiStandIn import AnkiStandIn, synthetic_collection
+    from CardCache import CardCache
+    from toolbox import AnkiCommunicator
+
+    for n_cards in sizes:
+        print(f'{n_cards} cards')
+        with AnkiStandIn(synthetic_collection(n_cards), latency=latency) as anki:
+            for chunk_size in chunk_sizes:
+                communicator = AnkiCommunicator(AnkiConnectClient(anki.url, chunk_size=chunk_size))
+                anki.reset_stats()
+                words, elapsed = _timed(communicator.get_words_in_n_days, 7, 'Vokabelbox')
+                stats = anki.stats()
+                label = 'one request' if chunk_size >= n_cards else f'chunks of {chunk_size}'
+                print(f'  {label:16} {elapsed * 1000:9.2f} ms  {stats["requests"]:4} requests  '
+                      f'sent {stats["bytes received"] / 2**10:8.1f} KiB  received {stats["bytes sent"] / 2**10:8.1f} KiB  '
+                      f'largest response {stats["largest response"] / 2**10:8.1f} KiB  ({len(words)} words)')
+            with tempfile.TemporaryDirectory() as folder:
+                client = AnkiConnectClient(anki.url)
+                communicator = AnkiCommunicator(client, CardCache(Path(folder) / 'cards.sqlite'))
+                for label in ['cold cache', 'warm cache']:
+                    if label == 'warm cache':
+                        due_cards = client.find_cards(f'{communicator.deck_query("Vokabelbox")} prop:due<=7')
+                        anki.touch_cards(due_cards[:len(due_cards) // 100])
+                    anki.reset_stats()
+                    _, elapsed = _timed(communicator.get_words_in_n_days, 7, 'Vokabelbox')
+                    stats = anki.stats()
+                    print(f'  {label:16} {elapsed * 1000:9.2f} ms  {stats["requests"]:4} requests  '
+                          f'received {stats["bytes sent"] / 2**10:8.1f} KiB  ({communicator.card_cache.fetched} cards fetched)')
+
+
+def benchmark_card_writer(n_cards:int=500000, memory_rows:int=50000):
+    '''
+    Compare time and peak memory of writing `n_cards` shuffled cards to a csv file, with all the cards in a list as before
+    and with the streaming writer and its bounded-memory shuffle.
+    '''
+    import csv
+    import numpy as np
+    from DictionaryReader import DefinitionEntry, WordEntry
+    from toolbox import AnkiCardWriter
+
+    def word_entries():
+        for i in range(n_cards // 2):
+            word = f'Wort{i}'
+            yield WordEntry(word, tuple(DefinitionEntry(f'Die Bedeutung Nummer {k} von {word}.', (f'Ein Satz mit {word}.', f'Noch ein Satz mit {word}.'),
+                                                        part_of_speech='Substantiv', usage='gehoben' if k else '')
+                                        for k in range(2)))
+
+    def write_list(csv_path):
+        cards = []
+        for word_entry in word_entries():
+            for definition_entry in word_entry.definition_entries:
+                front = '<b>' + word_entry.headword + '</b>' + '<br>' + '<br>'
+                back = ''
+                back += (definition_entry['part of speech'] + '<br>' + '<br>') if definition_entry['part of speech'] else ''
+                back += (definition_entry['usage'] + '<br>' + '<br>') if definition_entry['usage'] else ''
+                back += definition_entry['definition']
+                for sentence in definition_entry['examples']:
+                    front += '<i>' + sentence + '</i>' + '<br>'
+                cards.append([front, back])
+        np.random.shuffle(cards)
+        with open(csv_path, 'w', encoding='utf-8') as file:
+            csv.writer(file, delimiter=';', quotechar='"', quoting=csv.QUOTE_ALL).writerows(cards)
+
+    def write_stream(csv_path):
+        AnkiCardWriter(word_entries()).write_cards(csv_path, seed=0, memory_rows=memory_rows)
+
+    with tempfile.TemporaryDirectory() as folder:
+        # The times are measured without tracemalloc, which slows the code down.
+        _, list_time = _timed(write_list, Path(folder) / 'list.csv')
+        _, stream_time = _timed(write_stream, Path(folder) / 'stream.csv')
+        _, _, list_peak = _traced(write_list, Path(folder) / 'list.csv')
+        _, _, stream_peak = _traced(write_stream, Path(folder) / 'stream.csv')
+        assert (Path(folder) / 'list.csv').stat().st_size == (Path(folder) / 'stream.csv').stat().st_size
+    print(f'{n_cards} cards, shuffled')
+    print(f'  list:       {list_time:7.2f} s  peak {list_peak / 2**20:8.1f} MiB')
+    print(f'  streaming:  {stream_time:7.2f} s  peak {stream_peak / 2**20:8.1f} MiB  (at most {memory_rows} cards in memory)')
+
+
+def benchmark_package(n_notes:int=50000):
+    '''
+    Time writing `n_notes` notes to an Anki package, compared with the csv export of the same cards.
+    '''
+    import zipfile
+    from DictionaryReader import DefinitionEntry, WordEntry
+    from toolbox import AnkiCardWriter
+
+    word_entries = [WordEntry(f'Wort{i}', tuple(DefinitionEntry(f'Die Bedeutung Nummer {k} von Wort{i}.', (f'Ein Satz mit Wort{i}.',),
+                                                                part_of_speech='Substantiv') for k in range(2)))
+                    for i in range(n_notes // 2)]
+    with tempfile.TemporaryDirectory() as folder:
+        _, csv_time = _timed(AnkiCardWriter(word_entries).write_cards, Path(folder) / 'cards.csv', seed=0)
+        _, package_time = _timed(AnkiCardWriter(word_entries).write_package, Path(folder) / 'cards.apkg', 'Vokabelbox', seed=0)
+        package_size = (Path(folder) / 'cards.apkg').stat().st_size
+        with zipfile.ZipFile(Path(folder) / 'cards.apkg') as package:
+            assert set(package.namelist()) == {'collection.anki2', 'media'}
+    print(f'{n_notes} notes')
+    print(f'  csv:      {csv_time:7.2f} s')
+    print(f'  package:  {package_time:7.2f} s  ({package_size / 2**20:.1f} MiB)')
+
+
+def benchmark_normalizer(n_sentences:int=1000000):
+    '''
+    Compare the throughput of the former four-pass string processing of `Exercise` with `TextNormalizer`, one string at
+    a time and as one batch.
+    '''
+    import re
+    from TextNormalizer import TextNormalizer
+
+    def four_passes(text):
+        for old, new in [("’", "'"), ("‘", "'"), ("“", '"'), ("”", '"'), ('–', '--')]:
+            text = text.replace(old, new)
+        text = ' '.join('`' + word[1:] if word.startswith("'") else word for word in text.split(' '))
+        return text.replace('£', r'\pounds')
+
+    rng = random.Random(0)
+    templates = ['„Das kostet 5 £“, sagte er – und ging.', "Sie sagte: ‘Das Wort {i} ist neu’ und lachte.",
+                 'Im {i}. Satz steht ein ganz gewöhnliches Beispiel.', 'Die Rabatte liegen bei {i} % & mehr.']
+    sentences = [rng.choice(templates).format(i=i) for i in range(n_sentences)]
+    normalizer = TextNormalizer()
+    old, old_time = _timed(lambda: [four_passes(sentence) for sentence in sentences])
+    single, single_time = _timed(lambda: [normalizer.normalize(sentence) for sentence in sentences])
+    batch, batch_time = _timed(normalizer.normalize_many, sentences)
+    assert single == batch
+    # The former processing did not escape the LaTeX specials, and its `\pounds` swallowed the following space.
+    assert [re.sub(r'([&%_#])', r'\\\1', sentence).replace(r'\pounds', r'\pounds{}') for sentence in old] == batch
+    print(f'{n_sentences} sentences')
+    for name, elapsed in [('four passes', old_time), ('one by one', single_time), ('batch', batch_time)]:
+        print(f'  {name + ":":13s} {elapsed:6.2f} s  {n_sentences / elapsed / 1e6:5.2f} M sentences/s')
+
+
+benchmarks = {
+    'store': benchmark_dictionary_store,
+    'entries': benchmark_word_entries,
+    'fulltext': benchmark_full_text_index,
+    'journal': benchmark_journal,
+    'snapshot': benchmark_snapshot,
+    'configurator': benchmark_configurator,
+    'scheduler': benchmark_scheduler,
+    'anki': benchmark_anki,
+    'cards': benchmark_card_writer,
+    'package': benchmark_package,
+    'normalizer': benchmark_normalizer,
+}
+
+
+if __name__ == '__main__':
+    names = sys.argv[1:] or list(benchmarks)
+    for name in names:
+        print(f'==== {name} ====')
+        benchmarks[name]()
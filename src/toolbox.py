@@ -1,31 +1,190 @@
 import json
+import heapq
+from collections import deque
+from datetime import date
+from itertools import chain, count, islice
 from pathlib import Path
-from copy import deepcopy
-import requests
-from numpy import random
+import numpy as np
 import csv
+import tempfile
 import re
+import BinarySnapshot
+from AnkiConnect import AnkiConnectClient
+from CardCache import CardCache
+from ConfigStore import ConfigStore
+from ExportManifest import ExportManifest
+from ApkgWriter import ApkgWriter, guid_for
+from SideFiles import side_path
+
+
+class WordQueue:
+    '''
+    An ordered queue of words with constant-time membership checks. Taking `n` words from the front costs O(n) no matter how
+    long the queue is.
+
+    The queue is a deque of `(sequence number, word)` pairs together with a map from each word to the sequence numbers of
+    its occurrences. A removed word is dropped from the map only; its stale pairs are skipped when they are reached.
+    '''
+    def __init__(self, words=()) -> None:
+        self.__queue = deque()
+        self.__positions = dict()
+        self.__sequence = count()
+        self.__length = 0
+        self.extend(words or ())
+
+
+    def __len__(self) -> int:
+        return self.__length
+
+
+    def __contains__(self, word:str) -> bool:
+        return word in self.__positions
+
+
+    def __iter__(self):
+        for sequence, word in self.__queue:
+            if self.__is_live(sequence, word):
+                yield word
+
+
+    def append(self, word:str) -> None:
+        sequence = next(self.__sequence)
+        self.__queue.append((sequence, word))
+        self.__positions.setdefault(word, deque()).append(sequence)
+        self.__length += 1
+
+
+    def extend(self, words) -> None:
+        for word in words:
+            self.append(word)
+
+
+    def peek(self, n:int) -> list:
+        '''
+        Return the first `n` words without removing them.
+        '''
+        words = []
+        for word in self:
+            if len(words) == n:
+                break
+            words.append(word)
+        return words
+
+
+    def take(self, n:int) -> list:
+        '''
+        Remove the first `n` words and return them. Later occurrences of the taken words are removed as well.
+        '''
+        words = []
+        while self.__queue and len(words) < n:
+            sequence, word = self.__queue.popleft()
+            if self.__is_live(sequence, word):
+                self.__positions[word].popleft()
+                self.__length -= 1
+                words.append(word)
+        for word in words:
+            self.remove(word)
+        return words
+
+
+    def remove(self, word:str) -> None:
+        '''
+        Remove all the occurrences of a word.
+        '''
+        self.__length -= len(self.__positions.pop(word, ()))
+
+
+    def __is_live(self, sequence:int, word:str) -> bool:
+        return sequence in self.__positions.get(word, ())
 
 
 class Configurator:
     '''
     A class that manipulates the configuration json file.
+    A path with the suffix `.vbs` is read and written as a binary snapshot instead.
+    With `use_sqlite=True` the state is kept in a `ConfigStore` next to the json file (`config.json.sqlite`) instead,
+    which is created from the json file the first time; then every change can be undone with `undo`. By default
+    (`use_sqlite=None`) the SQLite backend is used if its store exists, so that code that only adds words, such as
+    `GermanDictionary.update_dict` and `PhraseDictionary.import_initial_JSON`, changes the same state as the study sessions.
+    The json file is still written after every change of the store, so that the notebooks and other readers of the json
+    file see the current state.
+    With an `SRSScheduler`, studying a word counts as its first review (graded good), and `get_words_to_review` selects the
+    words that are due from the scheduler, so that sheets can be written without Anki running.
     Members:
     json_path: The path of the json file.
     config(dict): The data saved in the config json file.
+    new (WordQueue): The words that have not been studied yet.
+    review (WordQueue): The words that have been studied.
+    store (ConfigStore): The SQLite backend, or `None`.
+    scheduler (SRSScheduler): The local scheduler of the reviews, or `None`.
+    With the SQLite backend, `config`, `new` and `review` are read from the store on every access and are read-only copies:
+    `config` as in `ConfigStore.to_config`, `new` and `review` as tuples.
     '''
-    def __init__(self, json_path:str):
+    def __init__(self, json_path:str, use_sqlite:bool=None, scheduler:'SRSScheduler'=None):
         self.json_path = Path(json_path)
+        self.store = None
+        self.scheduler = scheduler
+        store_path = side_path(self.json_path, '.sqlite')
+        if use_sqlite is None:
+            use_sqlite = store_path.exists()
+        if use_sqlite:
+            self.store = ConfigStore(store_path)
+            if not self.store.is_initialised() and Path.exists(self.json_path):
+                self.store.import_config(self.__load())
+                print(f'Migrated {self.json_path} to {self.store.store_path}')
+            return
+        self.config = self.__load()
+        self.new = WordQueue(self.config['new'])
+        self.review = WordQueue(self.config['review'])
+
+
+    @property
+    def config(self) -> dict:
+        return self.store.to_config() if self.store else self.__config
+
+
+    @config.setter
+    def config(self, config:dict):
+        self.__config = config
+
+
+    @property
+    def new(self):
+        return tuple(self.store.words('new')) if self.store else self.__new
+
+
+    @new.setter
+    def new(self, queue:WordQueue):
+        self.__new = queue
+
+
+    @property
+    def review(self):
+        return tuple(self.store.words('review')) if self.store else self.__review
+
+
+    @review.setter
+    def review(self, queue:WordQueue):
+        self.__review = queue
+
+
+    def __load(self) -> dict:
         keys = ['all', 'new', 'review', 'last change']
-        if Path.exists(self.json_path):
+        if Path.exists(self.json_path) and BinarySnapshot.is_snapshot(self.json_path):
+            try:
+                return BinarySnapshot.load(self.json_path)
+            except ValueError:
+                print('Failed to load the snapshot file')
+                return dict.fromkeys(keys)
+        elif Path.exists(self.json_path):
             with open(self.json_path) as file:
                 try:
-                    self.config = json.load(file)
+                    return json.load(file)
                 except json.JSONDecodeError:
                     print('Failed to load the json file')
-                    self.config = dict.fromkeys(keys)
+                    return dict.fromkeys(keys)
         else:
-            self.config = dict.fromkeys(keys)
+            return dict.fromkeys(keys)
 
 
     def initialise(self, word_list:list):
@@ -33,9 +192,13 @@ class Configurator:
         The method create a new configuration dictionary based on the word list inputs and write the dictionary
         to the config file.
         '''
-        self.config['all'] = deepcopy(word_list)
-        self.config['new'] = deepcopy(word_list)
-        self.config['review'] = []
+        if self.store:
+            self.store.initialise(word_list)
+            self.__export()
+            return
+        self.config['all'] = list(word_list)
+        self.new = WordQueue(word_list)
+        self.review = WordQueue()
         self.config['last change'] = []
         self.__export()
 
@@ -44,73 +207,351 @@ class Configurator:
         '''
         The method set the `review` list to an empty list and set the `new` list to the whole list.
         '''
-        self.config['new'] = self.config['all']
-        self.config['review'] = []
+        if self.store:
+            self.store.reset()
+            self.__export()
+            return
+        self.new = WordQueue(self.config['all'])
+        self.review = WordQueue()
         self.config['last change'] = []
         self.__export()
 
     
     def get_n_words_to_learn(self, n:int):
-        list_to_return = self.config['new'][:n]
+        list_to_return = self.store.words('new', n) if self.store else self.new.peek(n)
         if len(list_to_return) < n:
             print('Congratulations! You have finished studying the list.')
         return list_to_return
     
 
     def study_n_words(self, n:int):
-        new_list = self.config['new']
-        review_list = self.config['review']
+        '''
+        Move the first `n` words of `new` to `review`; `last change` records the words moved.
+        The queues update in O(n), but the whole json file (or snapshot) is still rewritten afterwards, which costs O(N) in
+        the length of the lists and dominates the call, with the SQLite backend as well.
+        With a scheduler, the words are also reviewed in it and it is saved; `undo` does not revert that.
+        '''
         new_word_list = self.get_n_words_to_learn(n)
-        review_list += new_word_list
-        new_list = [word for word in new_list if word not in new_word_list]
-        self.config['review'] = deepcopy(review_list)
-        self.config['new'] = deepcopy(new_list)
-        self.config['last change'] = deepcopy(new_list)
+        if self.scheduler is not None and new_word_list:
+            self.scheduler.review(list(dict.fromkeys(new_word_list)), 3)
+            self.scheduler.save()
+        if self.store:
+            self.store.study(len(new_word_list))
+            self.__export()
+            return
+        self.new.take(len(new_word_list))
+        self.review.extend(new_word_list)
+        self.config['last change'] = list(new_word_list)
+        self.__export()
+
+
+    def get_words_to_review(self, n_days:int=1) -> list:
+        '''
+        The words that the scheduler finds due within `n_days` days, the most overdue first, like the cards of the deck due
+        in Anki.
+        '''
+        if self.scheduler is None:
+            raise ValueError('The Configurator has no scheduler.')
+        return self.scheduler.get_words_in_n_days(n_days)
+
+
+    def add_words(self, words:list) -> list:
+        '''
+        Append the words that are not in the `all` list yet to `all` and `new`, e.g. the headwords of new dictionary entries.
+        Returns the added words.
+        '''
+        if self.store:
+            added = self.store.add_words(words)
+            self.__export()
+            return added
+        known = set(self.config['all'] or ())
+        added = [word for word in dict.fromkeys(words) if word not in known]
+        self.config['all'] = list(self.config['all'] or ()) + added
+        self.new.extend(added)
         self.__export()
+        return added
+
+
+    def undo(self):
+        '''
+        Undo the latest change (initialisation, study, reset or added words). Only the SQLite backend keeps the history.
+        '''
+        if not self.store:
+            print('There is no history to undo. Use the SQLite backend with `use_sqlite=True`.')
+            return
+        action = self.store.undo()
+        if action:
+            self.__export()
+        print(f'Undid the last {action}.' if action else 'There is nothing to undo.')
 
 
     def __export(self):
+        if self.store:
+            config = self.store.to_config()
+        else:
+            self.config['new'] = list(self.new)
+            self.config['review'] = list(self.review)
+            config = self.config
+        if BinarySnapshot.is_snapshot(self.json_path):
+            BinarySnapshot.dump(config, self.json_path)
+            return
         with open(self.json_path, 'w') as file:
-            json.dump(self.config, file, indent=4, ensure_ascii=False)
+            json.dump(config, file, indent=4, ensure_ascii=False)
+
+
+class SRSScheduler:
+    '''
+    A local spaced-repetition scheduler, so that the words due for review are known without Anki running.
+
+    The review state of every word (stability in days, difficulty between 1 and 10, day of the last review) is kept in NumPy
+    arrays and updated with the FSRS-4.5 formulas, for many words at once. Days are ordinal days (`date.toordinal`), and
+    grades are Anki's answer buttons: 1 again, 2 hard, 3 good, 4 easy. A word is due when its predicted recall probability
+    falls to `desired_retention`.
+
+    Members:
+    path (Path): The file with the state, in the `.npz` format whatever its suffix.
+    words (list): The words, in the order of the arrays.
+    '''
+    # The default FSRS-4.5 parameters.
+    weights = np.array([0.4872, 1.4003, 3.7145, 13.8206, 5.1618, 1.2298, 0.8975, 0.031, 1.6474, 0.1367, 1.0461,
+                        2.1072, 0.0793, 0.3246, 1.587, 0.2272, 2.8755])
+    decay = -0.5
+    factor = 19 / 81
+
+    def __init__(self, path:str, desired_retention:float=0.9):
+        self.path = Path(path)
+        self.desired_retention = desired_retention
+        self.words = []
+        self.stability = np.empty(0)
+        self.difficulty = np.empty(0)
+        self.last_review = np.empty(0)
+        if Path.exists(self.path):
+            with np.load(self.path) as state:
+                self.words = state['words'].tolist()
+                self.stability = state['stability']
+                self.difficulty = state['difficulty']
+                self.last_review = state['last_review']
+        self.__index = {word: i for i, word in enumerate(self.words)}
+        self.__build_due_index()
+
+
+    def __len__(self):
+        return len(self.words)
+
+
+    def add_words(self, word_list:list):
+        '''
+        Add words that have not been reviewed yet. Words that are already known are ignored.
+        '''
+        new_words = [word for word in dict.fromkeys(word_list) if word not in self.__index]
+        for word in new_words:
+            self.__index[word] = len(self.words)
+            self.words.append(word)
+        if not new_words:
+            return
+        self.stability = np.concatenate([self.stability, np.full(len(new_words), np.nan)])
+        self.difficulty = np.concatenate([self.difficulty, np.full(len(new_words), np.nan)])
+        self.last_review = np.concatenate([self.last_review, np.full(len(new_words), np.nan)])
+        self.__due = np.concatenate([self.__due, np.full(len(new_words), np.nan)])
+
+
+    def review(self, word_list:list, grades, day=None):
+        '''
+        Record one review of each word, for all the words in one vectorised step. Unknown words are added first.
+
+        Args:
+        - word_list (list): The reviewed words, each at most once.
+        - grades (int or array): The grade of each review, from 1 (again) to 4 (easy).
+        - day (int or array, optional): The day of each review. Defaults to today.
+        '''
+        if len(set(word_list)) != len(word_list):
+            raise ValueError('Each word can be reviewed only once per call.')
+        self.add_words(word_list)
+        indices = np.array([self.__index[word] for word in word_list], dtype=np.int64)
+        grades = np.broadcast_to(np.asarray(grades, dtype=np.int64), indices.shape)
+        days = np.broadcast_to(np.asarray(date.today().toordinal() if day is None else day, dtype=float), indices.shape)
+        self.__apply(indices, grades, days)
+        due = self.due_days()[indices]
+        self.__due[indices] = due
+        for i, due_day in zip(indices.tolist(), due.tolist()):
+            heapq.heappush(self.__due_index, (due_day, i))
+        if len(self.__due_index) > 2 * len(self.words) + 1000:
+            self.__build_due_index()
+
+
+    def __apply(self, indices:np.ndarray, grades:np.ndarray, days:np.ndarray):
+        w = self.weights
+        stability = self.stability[indices]
+        difficulty = self.difficulty[indices]
+        first = np.isnan(stability)
+        retrievability = np.where(first, 1.0, self.__retrievability(days - self.last_review[indices], stability))
+        initial_difficulty = np.clip(w[4] - (grades - 3) * w[5], 1, 10)
+        difficulty = np.where(first, initial_difficulty,
+                              np.clip(w[7] * w[4] + (1 - w[7]) * (difficulty - w[6] * (grades - 3)), 1, 10))
+        with np.errstate(invalid='ignore'):
+            recalled = stability * (1 + np.exp(w[8]) * (11 - difficulty) * stability**-w[9]
+                                    * (np.exp(w[10] * (1 - retrievability)) - 1)
+                                    * np.where(grades == 2, w[15], 1) * np.where(grades == 4, w[16], 1))
+            forgotten = w[11] * difficulty**-w[12] * ((stability + 1)**w[13] - 1) * np.exp(w[14] * (1 - retrievability))
+        stability = np.where(first, w[np.clip(grades, 1, 4) - 1], np.where(grades == 1, forgotten, recalled))
+        self.stability[indices] = stability
+        self.difficulty[indices] = difficulty
+        self.last_review[indices] = days
+
+
+    def retrievability(self, day:int=None) -> np.ndarray:
+        '''
+        The predicted probability of recalling each word on a day (by default today); `nan` for words never reviewed.
+        '''
+        day = date.today().toordinal() if day is None else day
+        return self.__retrievability(day - self.last_review, self.stability)
+
+
+    def due_days(self) -> np.ndarray:
+        '''
+        The day on which each word is due; `nan` for words never reviewed.
+        '''
+        interval = self.stability / self.factor * (self.desired_retention**(1 / self.decay) - 1)
+        return self.last_review + np.maximum(np.round(interval), 1)
+
 
+    def get_words_in_n_days(self, n:int, day:int=None) -> list:
+        '''
+        The words due within `n` days from `day` (by default today), the most overdue first.
+        Only the entries of the due index up to that day are visited; outdated entries among them are dropped on the way.
+        '''
+        limit = (date.today().toordinal() if day is None else day) + n
+        heap = self.__due_index
+        found = dict()
+        while heap and heap[0][0] <= limit:
+            due_day, i = heapq.heappop(heap)
+            if self.__due[i] == due_day:
+                found[i] = due_day
+        for i, due_day in found.items():
+            heapq.heappush(heap, (due_day, i))
+        return [self.words[i] for i in found]
+
+
+    def get_words_for_tomorrow(self) -> list:
+        return self.get_words_in_n_days(1)
+
+
+    def import_history(self, reviews:list):
+        '''
+        Replace the state of the reviewed words by replaying their review history, e.g. from
+        `AnkiCommunicator.get_review_history`. Only the first review of a word on a day counts.
+
+        Args:
+        - reviews (list): `(word, day, grade)` tuples.
+        '''
+        if not reviews:
+            return
+        word_list, days, grades = zip(*reviews)
+        self.add_words(word_list)
+        indices = np.array([self.__index[word] for word in word_list], dtype=np.int64)
+        days = np.array(days, dtype=float)
+        grades = np.array(grades, dtype=np.int64)
+        order = np.lexsort((days, indices))
+        indices, days, grades = indices[order], days[order], grades[order]
+        first_of_day = np.ones(len(indices), dtype=bool)
+        first_of_day[1:] = (indices[1:] != indices[:-1]) | (days[1:] != days[:-1])
+        indices, days, grades = indices[first_of_day], days[first_of_day], grades[first_of_day]
+        # The number of each review in the history of its word
+        starts = np.flatnonzero(np.r_[True, indices[1:] != indices[:-1]])
+        ranks = np.arange(len(indices)) - np.repeat(starts, np.diff(np.r_[starts, len(indices)]))
+        self.stability[indices] = np.nan
+        self.difficulty[indices] = np.nan
+        self.last_review[indices] = np.nan
+        # The k-th reviews of all the words are applied together.
+        for k in range(ranks.max() + 1):
+            selected = ranks == k
+            self.__apply(indices[selected], grades[selected], days[selected])
+        self.__build_due_index()
+
+
+    def save(self):
+        # Through a file object, since `np.savez` appends `.npz` to a path without that suffix and `load` would miss the file.
+        with open(self.path, 'wb') as file:
+            np.savez(file, words=np.array(self.words, dtype=str), stability=self.stability, difficulty=self.difficulty,
+                     last_review=self.last_review)
+
+
+    def __retrievability(self, elapsed_days, stability):
+        return (1 + self.factor * np.maximum(elapsed_days, 0) / stability)**self.decay
+
+
+    def __build_due_index(self):
+        self.__due = self.due_days()
+        reviewed = np.flatnonzero(~np.isnan(self.__due))
+        self.__due_index = list(zip(self.__due[reviewed].tolist(), reviewed.tolist()))
+        heapq.heapify(self.__due_index)
 
 
 class AnkiCommunicator:
-    def __init__(self):
-        self.base_url = 'http://localhost:8765'
+    '''
+    Reads the cards of the decks through AnkiConnect. The deck and the due date are part of the search query, so only the
+    matching cards are transferred, and their details are fetched in chunks over one pooled connection.
+    With a `CardCache`, only the cards modified since the last run are fetched and parsed again.
+    '''
+    def __init__(self, client:AnkiConnectClient=None, card_cache:CardCache=None):
+        self.client = client or AnkiConnectClient()
+        self.card_cache = card_cache
+        self.base_url = self.client.url
 
-    def __get_request(self, action, params):
-        return {'action': action, 'params': params, 'version': 6}
-    
-    def __invoke(self, action, params):
-        data = json.dumps(self.__get_request(action, params))
-        headers = {'Content-Type': 'application/json'}
-        response = requests.post(self.base_url, data=data, headers=headers)
-        response_json = response.json()
-        if 'error' in response_json and response_json['error']:
-            raise Exception(f'Failed to fetch card info: {response_json["error"]}')
-        return response_json['result']
-
-    def __get_cards_id_in_n_days(self, n):
-        query = f'prop:due<={n}'
-        response = self.__invoke('findCards', {'query': query})
-        return response
+    @staticmethod
+    def deck_query(deck_name):
+        # `deck:` also matches the subdecks, which are excluded.
+        return f'deck:"{deck_name}" -deck:"{deck_name}::*"'
 
     def get_words_in_n_days(self, n, deck_name):
-        card_ids = self.__get_cards_id_in_n_days(n)
-        if not card_ids:
-            return [], dict()
-        cards_info = self.__invoke('cardsInfo', {'cards': card_ids})
-        result_list = [(self._extract_word_from_field(card['fields']['Front']['value']), self._extract_def_from_field(card['fields']['Back']['value'])) \
-                       for card in cards_info if card and card['deckName'] == deck_name]
-        result_dict = dict()
-        for term_def in result_list:
-            result_dict[term_def[0]] = result_dict.get(term_def[0], []) + [term_def[1]]
-        return result_dict
+        return self.get_words_in_n_days_for_decks(n, [deck_name])[deck_name]
+
+    def get_words_in_n_days_for_decks(self, n, deck_names):
+        '''
+        Returns, for each deck, a dictionary from the words due in `n` days to their definitions.
+        The searches of all the decks are sent in one request.
+        '''
+        card_id_lists = self.client.multi([('findCards', {'query': f'{self.deck_query(deck_name)} prop:due<={n}'}) for deck_name in deck_names])
+        result = dict()
+        for deck_name, card_ids in zip(deck_names, card_id_lists):
+            result_dict = dict()
+            for word, definition in self.__parse_cards(card_ids):
+                result_dict.setdefault(word, []).append(definition)
+            result[deck_name] = result_dict
+        return result
+
+    def __parse_cards(self, card_ids):
+        if self.card_cache:
+            return self.card_cache.sync(self.client, card_ids, self.__parse_card).values()
+        return [self.__parse_card(card) for card in self.client.cards_info(card_ids) if card]
+
+    def __parse_card(self, card):
+        return (self._extract_word_from_field(card['fields']['Front']['value']),
+                self._extract_def_from_field(card['fields']['Back']['value']))
 
     def get_words_for_tomorrow(self, deck_name):
         return self.get_words_in_n_days(1, deck_name)
 
+    def get_review_history(self, deck_name):
+        '''
+        Returns the reviews of the cards of a deck as `(word, day, grade)` tuples for `SRSScheduler.import_history`.
+        The card details and the reviews of each chunk of cards are fetched in one request.
+        '''
+        card_ids = self.client.find_cards(self.deck_query(deck_name))
+        history = []
+        for start in range(0, len(card_ids), self.client.chunk_size):
+            chunk = card_ids[start:start + self.client.chunk_size]
+            cards_info, reviews_of_cards = self.client.multi([('cardsInfo', {'cards': chunk}),
+                                                              ('getReviewsOfCards', {'cards': [str(card_id) for card_id in chunk]})])
+            words = {card['cardId']: self._extract_word_from_field(card['fields']['Front']['value']) for card in cards_info if card}
+            for card_id, reviews in reviews_of_cards.items():
+                word = words.get(int(card_id))
+                for review in reviews:
+                    # Reviews without an answer (e.g. manual rescheduling) have the ease 0.
+                    if word and review['ease'] > 0:
+                        history.append((word, date.fromtimestamp(review['id'] / 1000).toordinal(), review['ease']))
+        return history
+
     def _extract_word_from_field(self, input_string):
         matches = re.findall(r'<b>(.*?)</b>', input_string)
         if matches:
@@ -132,49 +573,234 @@ class AnkiCommunicator:
             return rows[1]
 
 
+def shuffled(rows, seed=None, memory_rows:int=100000):
+    '''
+    Yield the rows in a uniformly random order, holding at most about `memory_rows` rows in memory.
+
+    If there are more rows, every chunk of `memory_rows` rows is shuffled and written to a temporary file (a run). The runs
+    are then merged in a random interleaving: for each block of output rows, the number of rows taken from each run is drawn
+    from a multivariate hypergeometric distribution and the order of the runs within the block is shuffled. Shuffled runs
+    merged this way give a uniformly random order. The rows are tuples of strings.
+
+    Args:
+    - rows (iterable): The rows.
+    - seed (int, optional): The seed, for a reproducible order.
+    - memory_rows (int): The maximal number of rows held in memory.
+    '''
+    rng = np.random.default_rng(seed)
+    rows = iter(rows)
+    buffer = list(islice(rows, memory_rows + 1))
+    if len(buffer) <= memory_rows:
+        for i in rng.permutation(len(buffer)):
+            yield buffer[i]
+        return
+    with tempfile.TemporaryDirectory() as folder:
+        run_paths, run_sizes = [], []
+        chunks = chain([buffer], iter(lambda: list(islice(rows, memory_rows)), []))
+        del buffer
+        for chunk in chunks:
+            run_paths.append(Path(folder) / f'run {len(run_paths)}.csv')
+            run_sizes.append(len(chunk))
+            with open(run_paths[-1], 'w', encoding='utf-8', newline='') as file:
+                csv.writer(file).writerows([chunk[i] for i in rng.permutation(len(chunk))])
+            del chunk
+        run_files = [open(path, encoding='utf-8', newline='') for path in run_paths]
+        try:
+            readers = [csv.reader(file) for file in run_files]
+            remaining = np.array(run_sizes)
+            while remaining.any():
+                counts = rng.multivariate_hypergeometric(remaining, min(memory_rows, remaining.sum()))
+                labels = np.repeat(np.arange(len(readers)), counts)
+                rng.shuffle(labels)
+                for label in labels.tolist():
+                    yield tuple(next(readers[label]))
+                remaining -= counts
+        finally:
+            for file in run_files:
+                file.close()
+
+
 class AnkiCardWriter:
     '''
-    The writer takes a list of word entries as an input. The user can use the method `write_cards` to create a csv file that are suitable for Anki imports.
+    The writer takes a list of word entries as an input. The user can use the method `write_cards` to create a csv file that are suitable for Anki imports,
+    the method `push_cards` to add the cards to a deck directly through AnkiConnect, or the method `write_package` to build an
+    Anki package without Anki.
+    The cards are produced and written one at a time, so the word entries can be a generator (e.g. `DictionaryReader.iter_word_entries`)
+    and the memory use does not grow with the export. A generator is consumed by the first export; after `write_cards`,
+    `push_cards` reads the cards back from the csv file, and `write_package` has to come before it.
+    With an `ExportManifest`, only the cards that are new or changed since the earlier exports are written or pushed.
     '''
-    def __init__(self, word_entry_list: list):
+    def __init__(self, word_entry_list: list, manifest:ExportManifest=None):
         self.word_entry_list = word_entry_list
-        self.Anki_cards = []
+        self.manifest = manifest
+        self.csv_path = None
 
-    def write_cards(self, csv_path = str, shuffle_cards=True):
-        self.__write_cards(self.word_entry_list)
+    def write_cards(self, csv_path = str, shuffle_cards=True, seed=None, memory_rows=100000, removed_path=None):
+        '''
+        Writes the cards to a csv file. With `shuffle_cards`, they are shuffled with at most `memory_rows` cards in memory,
+        see `shuffled`; a `seed` makes the order reproducible.
+        With a manifest, the manifest is saved afterwards, and the cards to delete in Anki are written to `removed_path`
+        (headword, entry index and reason) if it is given.
+        '''
+        cards = ((front, back) for _, _, _, front, back in self.__iter_keyed_cards())
         if shuffle_cards:
-            random.shuffle(self.Anki_cards)
+            cards = shuffled(cards, seed=seed, memory_rows=memory_rows)
         with open(csv_path, 'w', encoding='utf-8') as file:
             writer = csv.writer(file, delimiter=';', quotechar='"', quoting=csv.QUOTE_ALL)
-            writer.writerows(self.Anki_cards)
-
-
-
-    def __write_cards(self, word_entry_list: list):
-        '''
-        Updates the list `self.Anki_cards`.
-        '''
-        for word_entry in word_entry_list:
-            word = word_entry.headword
-            definition_entries = word_entry.definition_entries
-            for definition_entry in definition_entries:
-                conjugation = definition_entry['conjugation']
-                examples = definition_entry['examples']
-                definition = definition_entry['definition']
-                usage = definition_entry['usage']
-                part_of_speech = definition_entry['part of speech']
-                anki_card = []
-                front = ''
-                back = ''
-                front += '<b>' + word + '</b>' + '<br>' + '<br>'
-                back += (part_of_speech + '<br>' + '<br>') if part_of_speech else ''
-                back += (conjugation + '<br>' + '<br>') if conjugation else ''
-                back += (usage + '<br>' + '<br>') if usage else ''
-                back += definition
-                for sentence in examples:
-                    front += '<i>' + sentence + '</i>' + '<br>'
-                anki_card.append(front)
-                anki_card.append(back)
-                self.Anki_cards.append(anki_card)
-
-    
\ No newline at end of file
+            writer.writerows(cards)
+        self.csv_path = csv_path
+        if self.manifest:
+            self.__finish_manifest(removed_path)
+
+    def push_cards(self, deck_name:str, model_name:str='Basic', client:AnkiConnectClient=None, removed_path=None):
+        '''
+        Adds the cards to a deck through AnkiConnect's `addNotes`, in chunks. Notes that already exist in the deck (same front)
+        are found with `canAddNotes` and skipped, so pushing the same cards twice does not create duplicates. A card that was
+        already pushed in this call (the same definition of a headword repeated in the word list) is skipped as well.
+        Anki compares only the fronts, so a further definition of a headword with the same front as an earlier one, e.g. two
+        definitions without examples, is a different card and is allowed to duplicate the front; it is skipped if a note with
+        the same front and back is found with `findNotes`.
+        With a manifest, a card whose back changed since the last export updates its note in place with `updateNoteFields`:
+        the note with the same front, and among several such notes the one with the exported back. Only the added and updated
+        cards are recorded in the manifest, so that the next export tries the others again.
+        The csv export of `write_cards` remains available as a fallback.
+
+        Returns:
+        - dict: The numbers of `added`, `updated`, `skipped` and `failed` notes.
+        '''
+        client = client or AnkiConnectClient()
+        report = {'added': 0, 'updated': 0, 'skipped': 0, 'failed': 0}
+        chunk, keys, statuses, pushed = [], [], [], set()
+        headword, headword_fronts = None, set()
+        for key, status, _, front, back in chain(self.__iter_keyed_cards(), [(None, None, None, None, None)]):
+            if front is not None:
+                card = key or (front, back)
+                if card in pushed:
+                    self.__count(report, 'skipped', key)
+                    continue
+                pushed.add(card)
+                if key and key[0] != headword:
+                    headword, headword_fronts = key[0], set()
+                repeated_front = key is not None and front in headword_fronts
+                if key:
+                    headword_fronts.add(front)
+                chunk.append({'deckName': deck_name, 'modelName': model_name, 'fields': {'Front': front, 'Back': back},
+                              'options': {'allowDuplicate': repeated_front, 'duplicateScope': 'deck'}})
+                keys.append(key)
+                statuses.append(status)
+            if len(chunk) == client.chunk_size or (front is None and chunk):
+                self.__push_chunk(client, chunk, keys, statuses, report)
+                chunk, keys, statuses = [], [], []
+        if self.manifest and self.csv_path is None:
+            self.__finish_manifest(removed_path)
+        print(f'Added {report["added"]} cards to {deck_name}, updated {report["updated"]}, '
+              f'skipped {report["skipped"]} existing or repeated cards, {report["failed"]} failed.')
+        return report
+
+    def __push_chunk(self, client:AnkiConnectClient, chunk:list, keys:list, statuses:list, report:dict):
+        outcomes = dict(self.__update_notes(client, chunk, keys, statuses))
+        # `canAddNotes` lets every note with `allowDuplicate` through, so those are looked up by both fields first.
+        duplicates = [i for i, note in enumerate(chunk) if note['options']['allowDuplicate'] and i not in outcomes]
+        for i, note_ids in zip(duplicates, client.find_notes_with_fields([chunk[i] for i in duplicates])):
+            if note_ids:
+                outcomes[i] = 'skipped'
+        additions = [i for i in range(len(chunk)) if i not in outcomes]
+        outcomes.update(zip(additions, client.add_notes([chunk[i] for i in additions])))
+        for i, key in enumerate(keys):
+            self.__count(report, outcomes[i], key)
+
+    def __update_notes(self, client:AnkiConnectClient, chunk:list, keys:list, statuses:list):
+        # Yields `(index in the chunk, outcome)` for the cards whose note was found; the others are added as new notes.
+        updates = [i for i, status in enumerate(statuses) if status == 'updated']
+        if not updates:
+            return
+        front_notes = [{'deckName': chunk[i]['deckName'], 'fields': {'Front': chunk[i]['fields']['Front']}} for i in updates]
+        note_id_lists = client.find_notes_with_fields(front_notes)
+        backs = {info['noteId']: info['fields']['Back']['value']
+                 for info in client.notes_info(sorted({note_id for note_ids in note_id_lists for note_id in note_ids})) if info}
+        targets = dict()
+        for i, note_ids in zip(updates, note_id_lists):
+            matching = [note_id for note_id in note_ids if self.manifest.matches_exported(*keys[i], backs.get(note_id, ''))]
+            if matching or (len(note_ids) == 1 and not chunk[i]['options']['allowDuplicate']):
+                targets[i] = (matching or note_ids)[0]
+        succeeded = client.update_note_fields([{'id': note_id, 'fields': chunk[i]['fields']} for i, note_id in targets.items()])
+        for i, success in zip(targets, succeeded):
+            yield i, 'updated' if success else 'failed'
+
+    def __count(self, report:dict, outcome:str, key):
+        report[outcome] += 1
+        if outcome not in ('added', 'updated') and key and self.manifest:
+            self.manifest.discard(*key)
+
+    def write_package(self, apkg_path:str, deck_name:str, model_name:str=ApkgWriter.default_model_name, shuffle_cards=True,
+                      seed=None, memory_rows=100000, removed_path=None) -> int:
+        '''
+        Writes the cards to an Anki package (`.apkg`), see `ApkgWriter`. The notes get GUIDs derived from their headword
+        and definition, so importing a later package updates the notes of the same definitions in place. A definition that
+        a headword has more than once gets its occurrence in the GUID too, so every card becomes a note.
+        The cards read back from the csv file of `write_cards` have no headword, so the package has to be written first, or
+        by another writer.
+        The new cards are studied in the order of the package, which is shuffled like in `write_cards`.
+
+        Returns:
+        - int: The number of notes written.
+        '''
+        if self.csv_path is not None:
+            raise ValueError(f'The cards of {self.csv_path} have no headwords, so they cannot get the GUIDs of a package. '
+                             'Write the package before the csv file.')
+        notes = ((guid_for(*guid_source), front, back) for _, _, guid_source, front, back in self.__iter_keyed_cards())
+        if shuffle_cards:
+            notes = shuffled(notes, seed=seed, memory_rows=memory_rows)
+        n_notes = ApkgWriter(apkg_path, deck_name, model_name).write(notes)
+        if self.manifest and self.csv_path is None:
+            self.__finish_manifest(removed_path)
+        print(f'Wrote {n_notes} notes to {apkg_path}.')
+        return n_notes
+
+    def iter_cards(self):
+        '''
+        Yields the cards as `(front, back)` tuples, from the csv file if `write_cards` has written one.
+        '''
+        for _, _, _, front, back in self.__iter_keyed_cards():
+            yield front, back
+
+    def __iter_keyed_cards(self):
+        # Yields `(key, status, GUID source, front, back)`. The key of a card is its headword and the index of its definition
+        # entry, and the status is the one of `ExportManifest.check_word`. The source of the GUID of a card is its headword and
+        # definition, and the occurrence of a repeated definition. The cards read from the csv file have neither.
+        if self.csv_path is not None:
+            with open(self.csv_path, encoding='utf-8') as file:
+                for row in csv.reader(file, delimiter=';', quotechar='"'):
+                    yield None, 'new', None, row[0], row[1]
+            return
+        for word_entry in self.word_entry_list:
+            cards = list(self.__iter_cards(word_entry))
+            if self.manifest:
+                statuses = self.manifest.check_word(word_entry.headword, cards)
+            else:
+                statuses = ['new'] * len(cards)
+            occurrences = dict()
+            for index, ((front, back), status) in enumerate(zip(cards, statuses)):
+                definition = word_entry.definition_entries[index]['definition']
+                occurrences[definition] = occurrence = occurrences.get(definition, 0) + 1
+                if status == 'unchanged':
+                    continue
+                guid_source = (word_entry.headword, definition) + ((str(occurrence),) if occurrence > 1 else ())
+                yield (word_entry.headword, index), status, guid_source, front, back
+
+    def __iter_cards(self, word_entry):
+        front_start = '<b>' + word_entry.headword + '</b><br><br>'
+        for definition_entry in word_entry.definition_entries:
+            front = front_start + ''.join(['<i>' + sentence + '</i><br>' for sentence in definition_entry['examples']])
+            back = ''.join([part + '<br><br>' for part in (definition_entry['part of speech'], definition_entry['conjugation'],
+                                                         definition_entry['usage']) if part])
+            yield front, back + definition_entry['definition']
+
+    def __finish_manifest(self, removed_path):
+        self.manifest.save()
+        if removed_path is not None:
+            with open(removed_path, 'w', encoding='utf-8') as file:
+                writer = csv.writer(file, delimiter=';', quotechar='"', quoting=csv.QUOTE_ALL)
+                writer.writerows(self.manifest.removed)
+        if self.manifest.removed:
+            print(f'{len(self.manifest.removed)} cards in Anki are outdated' + (f', see {removed_path}.' if removed_path else '.'))
@@ -0,0 +1,79 @@
+import json
+
+import pytest
+
+from AnkiConnect import AnkiConnectClient
+from AnkiStandIn import AnkiStandIn
+from DictionaryReader import WordEntry
+from ExportManifest import ExportManifest
+from toolbox import AnkiCardWriter
+
+
+def definition(text, examples=()):
+    return {'definition': text, 'examples': list(examples), 'part of speech': 'Verb', 'conjugation': '', 'usage': ''}
+
+
+def test_push_adds_definitions_with_the_same_front(tmp_path):
+    manifest_path = tmp_path / 'manifest.json'
+    words = [WordEntry('laufen', [definition('to run'), definition('to walk'), definition('to run', ['Er läuft.'])])]
+    with AnkiStandIn() as anki:
+        client = AnkiConnectClient(anki.url, chunk_size=2)
+        report = AnkiCardWriter(words, ExportManifest(manifest_path)).push_cards('Deck', client=client)
+        assert report == {'added': 3, 'updated': 0, 'skipped': 0, 'failed': 0}
+        assert sorted(note['fields']['Back'] for note in anki.notes.values()) == ['Verb<br><br>to run', 'Verb<br><br>to run',
+                                                                                  'Verb<br><br>to walk']
+    assert len(json.loads(manifest_path.read_text(encoding='utf-8'))['cards']['laufen']) == 3
+
+
+def test_skipped_cards_are_not_recorded(tmp_path):
+    manifest_path = tmp_path / 'manifest.json'
+    words = [WordEntry('laufen', [definition('to run', ['Er läuft.'])])]
+    with AnkiStandIn() as anki:
+        client = AnkiConnectClient(anki.url)
+        assert AnkiCardWriter(words).push_cards('Deck', client=client)['added'] == 1
+        # The card is already in the deck, so the push with the manifest skips it and does not record it.
+        report = AnkiCardWriter(words + words, ExportManifest(manifest_path)).push_cards('Deck', client=client)
+    assert report == {'added': 0, 'updated': 0, 'skipped': 1, 'failed': 0}
+    assert json.loads(manifest_path.read_text(encoding='utf-8'))['cards']['laufen'] == []
+
+
+def test_package_keeps_repeated_definitions(tmp_path):
+    words = [WordEntry('laufen', [definition('to run'), definition('to run', ['Er läuft.'])])]
+    writer = AnkiCardWriter(words)
+    assert writer.write_package(tmp_path / 'deck.apkg', 'Deck') == 2
+    writer.write_cards(tmp_path / 'cards.csv')
+    with pytest.raises(ValueError):
+        writer.write_package(tmp_path / 'again.apkg', 'Deck')
+
+
+def test_pushing_twice_adds_nothing_new():
+    # The wildcards and quotes of the second definition are escaped in the search for existing notes.
+    words = [WordEntry('laufen', [definition('to run'), definition('to "walk" _ * \\')])]
+    with AnkiStandIn() as anki:
+        client = AnkiConnectClient(anki.url)
+        assert AnkiCardWriter(words).push_cards('Deck', client=client)['added'] == 2
+        assert AnkiCardWriter(words).push_cards('Deck', client=client) == {'added': 0, 'updated': 0, 'skipped': 2, 'failed': 0}
+        assert len(anki.notes) == 2
+
+
+def test_a_repeated_word_is_added_once_across_chunks():
+    words = [WordEntry('laufen', [definition('to run'), definition('to walk')])] * 2
+    with AnkiStandIn() as anki:
+        report = AnkiCardWriter(words).push_cards('Deck', client=AnkiConnectClient(anki.url, chunk_size=1))
+        assert report == {'added': 2, 'updated': 0, 'skipped': 2, 'failed': 0}
+        assert len(anki.notes) == 2
+
+
+def test_a_changed_back_updates_the_note(tmp_path):
+    manifest_path = tmp_path / 'manifest.json'
+    with AnkiStandIn() as anki:
+        client = AnkiConnectClient(anki.url)
+        words = [WordEntry('laufen', [definition('to run'), definition('to walk')])]
+        AnkiCardWriter(words, ExportManifest(manifest_path)).push_cards('Deck', client=client)
+        words = [WordEntry('laufen', [definition('to run'), definition('to go on foot')])]
+        report = AnkiCardWriter(words, ExportManifest(manifest_path)).push_cards('Deck', client=client)
+        assert report == {'added': 0, 'updated': 1, 'skipped': 0, 'failed': 0}
+        assert sorted(note['fields']['Back'] for note in anki.notes.values()) == ['Verb<br><br>to go on foot', 'Verb<br><br>to run']
+        # The update is recorded, so the next export has nothing to push.
+        report = AnkiCardWriter(words, ExportManifest(manifest_path)).push_cards('Deck', client=client)
+        assert report == {'added': 0, 'updated': 0, 'skipped': 0, 'failed': 0}
@@ -0,0 +1,46 @@
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+from AnkiConnect import AnkiConnectClient, AnkiConnectError
+
+
+class Server:
+    def __init__(self, body:bytes, delay:float=0.0) -> None:
+        class Handler(BaseHTTPRequestHandler):
+            def do_POST(self):
+                self.rfile.read(int(self.headers.get('Content-Length', 0)))
+                time.sleep(delay)
+                self.send_response(200)
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass
+
+        self.server = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+        self.server.daemon_threads = True
+        self.url = 'http://{}:{}'.format(*self.server.server_address[:2])
+
+    def __enter__(self):
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.server.shutdown()
+        self.server.server_close()
+
+
+def test_a_timeout_raises_the_client_error():
+    with Server(b'{"result": 6, "error": null}', delay=1.0) as server:
+        with pytest.raises(AnkiConnectError, match='did not answer'):
+            AnkiConnectClient(server.url, timeout=0.1).invoke('version')
+
+
+def test_a_response_without_json_raises_the_client_error():
+    with Server(b'<html>Anki is busy</html>') as server:
+        with pytest.raises(AnkiConnectError, match='no json'):
+            AnkiConnectClient(server.url).invoke('version')
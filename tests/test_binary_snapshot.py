@@ -0,0 +1,37 @@
+import pytest
+
+import BinarySnapshot
+from toolbox import Configurator
+
+config = {'all': ['Haus', 'Straße', 'lernen'], 'new': ['Straße', 'lernen'], 'review': ['Haus'], 'last change': None,
+          'numbers': [1, 2.5, True, {'nested': None}]}
+
+
+def test_round_trip():
+    assert BinarySnapshot.loads(BinarySnapshot.dumps(config)) == config
+
+
+def test_truncated_snapshot_raises_value_error():
+    data = BinarySnapshot.dumps(config)
+    for length in range(len(data)):
+        with pytest.raises(ValueError):
+            BinarySnapshot.loads(data[:length])
+
+
+def test_trailing_data_raises_value_error():
+    with pytest.raises(ValueError):
+        BinarySnapshot.loads(BinarySnapshot.dumps(config) + b'\x00')
+
+
+def test_configurator_survives_a_truncated_snapshot(tmp_path, capsys):
+    path = tmp_path / 'config.vbs'
+    data = BinarySnapshot.dumps(config)
+    path.write_bytes(data[:len(data) // 2])
+    configurator = Configurator(path)
+    assert len(configurator.new) == len(configurator.review) == 0
+    assert 'Failed to load the snapshot file' in capsys.readouterr().out
+
+
+def test_integers_outside_64_bits_name_their_field():
+    with pytest.raises(ValueError, match=r'\["Haus"\]\[1\]\["count"\]'):
+        BinarySnapshot.dumps({'Haus': [{'count': 1}, {'count': 2**64}]})
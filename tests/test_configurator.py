@@ -0,0 +1,60 @@
+import json
+
+from toolbox import Configurator
+
+
+def write_config(path, words):
+    path.write_text(json.dumps({'all': words, 'new': words, 'review': [], 'last change': []}), encoding='utf-8')
+
+
+def test_json_backend_adds_only_new_words(tmp_path):
+    path = tmp_path / 'config.json'
+    write_config(path, ['Haus', 'Baum'])
+    configurator = Configurator(path)
+    assert configurator.add_words(['Baum', 'lernen', 'lernen']) == ['lernen']
+    saved = json.loads(path.read_text(encoding='utf-8'))
+    assert saved['all'] == saved['new'] == ['Haus', 'Baum', 'lernen']
+
+
+def test_study_records_the_studied_words(tmp_path):
+    path = tmp_path / 'config.json'
+    write_config(path, ['Haus', 'Baum', 'lernen'])
+    Configurator(path).study_n_words(2)
+    saved = json.loads(path.read_text(encoding='utf-8'))
+    assert saved['last change'] == ['Haus', 'Baum']
+    assert saved['new'] == ['lernen']
+
+
+def test_sqlite_backend_receives_added_words(tmp_path):
+    path = tmp_path / 'config.json'
+    write_config(path, ['Haus', 'Baum'])
+    Configurator(path, use_sqlite=True).study_n_words(1)
+    # A later Configurator without `use_sqlite`, as in `GermanDictionary.update_dict`, uses the existing store.
+    assert Configurator(path).add_words(['lernen']) == ['lernen']
+    configurator = Configurator(path, use_sqlite=True)
+    assert configurator.new == ('Baum', 'lernen')
+    assert configurator.review == ('Haus',)
+    assert configurator.config['all'] == ['Haus', 'Baum', 'lernen']
+    assert configurator.config['last change'] == ['Haus']
+
+
+def test_sqlite_initialise_can_be_undone(tmp_path):
+    path = tmp_path / 'config.json'
+    write_config(path, ['Haus', 'Baum'])
+    configurator = Configurator(path, use_sqlite=True)
+    configurator.initialise(['lernen'])
+    assert configurator.new == ('lernen',)
+    configurator.undo()
+    assert configurator.new == ('Haus', 'Baum')
+    assert configurator.store.history() == []
+
+
+def test_sqlite_backend_keeps_the_json_file_current(tmp_path):
+    path = tmp_path / 'config.json'
+    write_config(path, ['Haus', 'Baum', 'lernen'])
+    configurator = Configurator(path, use_sqlite=True)
+    configurator.study_n_words(2)
+    saved = json.loads(path.read_text(encoding='utf-8'))
+    assert saved['new'] == ['lernen'] and saved['review'] == ['Haus', 'Baum'] and saved['last change'] == ['Haus', 'Baum']
+    configurator.undo()
+    assert json.loads(path.read_text(encoding='utf-8'))['new'] == ['Haus', 'Baum', 'lernen']
@@ -0,0 +1,79 @@
+import json
+
+import pytest
+
+import BinarySnapshot
+import DictionaryCache
+from DictionaryStore import DictionaryStore
+from Exercise import Definition
+from GermanDictionary import GermanDictionary
+
+
+@pytest.fixture
+def dictionary_path(tmp_path):
+    path = tmp_path / 'dictionary.json'
+    entry = {'Definition': 'ein Gebäude zum Wohnen', 'Anwendung': '', 'Beispiele': ['Das Haus ist alt.'], 'Formen': '', 'Redewendungen': []}
+    path.write_text(json.dumps({'Haus': [entry]}, ensure_ascii=False), encoding='utf-8')
+    DictionaryCache.invalidate()
+    yield path
+    DictionaryCache.invalidate()
+
+
+def test_one_parse_per_file_across_readers(dictionary_path):
+    misses = DictionaryCache.cache_info()['misses']
+    store = DictionaryStore(dictionary_path, dictionary_path.with_suffix('.sqlite'))
+    store.rebuild()
+    store.close()
+    definition = Definition(['Haus'])
+    definition.import_definition_from_dictionary(dictionary_path)
+    german_dictionary = GermanDictionary(dictionary_path)
+    assert 'Haus' in german_dictionary.dict
+    assert DictionaryCache.cache_info()['misses'] - misses == 1
+
+
+def test_changed_file_is_parsed_again(dictionary_path):
+    first = DictionaryCache.load_dictionary(dictionary_path)
+    dictionary_path.write_text(json.dumps({'Haus': [], 'Baum': []}), encoding='utf-8')
+    assert set(DictionaryCache.load_dictionary(dictionary_path)) == {'Haus', 'Baum'}
+    assert set(first) == {'Haus'}
+
+
+def test_cached_dictionary_is_read_only(dictionary_path):
+    dictionary = DictionaryCache.load_dictionary(dictionary_path)
+    with pytest.raises(TypeError):
+        dictionary['Baum'] = []
+    with pytest.raises(TypeError):
+        dictionary.update({'Baum': []})
+    with pytest.raises(TypeError):
+        dictionary.__init__({'Baum': []})
+    with pytest.raises(AttributeError):
+        dictionary['Haus'].append({})
+    thawed = DictionaryCache.thaw(dictionary)
+    thawed['Baum'] = []
+    assert 'Baum' not in DictionaryCache.load_dictionary(dictionary_path)
+
+
+def test_json_and_snapshot_keep_separate_side_files(tmp_path):
+    entry = {'Definition': 'ein Tier', 'Anwendung': '', 'Beispiele': [], 'Formen': ''}
+    json_path = tmp_path / 'dictionary.json'
+    DictionaryCache.dump_json(json_path, {'Haus': [entry]})
+    snapshot_path = BinarySnapshot.json_to_snapshot(json_path)
+    DictionaryCache.append_journal(json_path, {'Baum': [entry]})
+    DictionaryCache.append_journal(snapshot_path, {'Hund': [entry]})
+    DictionaryCache.compact(snapshot_path)
+    assert set(DictionaryCache.load_dictionary(json_path)) == {'Haus', 'Baum'}
+    assert set(DictionaryCache.load_dictionary(snapshot_path)) == {'Haus', 'Hund'}
+    stores = [DictionaryStore(json_path), DictionaryStore(snapshot_path)]
+    assert stores[0].store_path != stores[1].store_path
+    for store in stores:
+        store.close()
+    DictionaryCache.invalidate()
+
+
+def test_a_journal_with_the_former_name_is_renamed(tmp_path):
+    json_path = tmp_path / 'dictionary.json'
+    DictionaryCache.dump_json(json_path, {})
+    (tmp_path / 'dictionary.journal.jsonl').write_text(json.dumps({'op': 'set', 'headword': 'Haus', 'entries': []}) + '\n')
+    assert 'Haus' in DictionaryCache.load_dictionary(json_path)
+    assert (tmp_path / 'dictionary.json.journal.jsonl').exists()
+    DictionaryCache.invalidate()
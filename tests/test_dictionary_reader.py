@@ -0,0 +1,22 @@
+import json
+
+import DictionaryCache
+from DictionaryReader import GermanDictionaryReader
+
+
+def entry(definition):
+    return {'Definition': definition, 'Anwendung': '', 'Beispiele': [], 'Formen': ''}
+
+
+def test_the_store_is_opened_on_the_first_lookup(tmp_path):
+    path = tmp_path / 'dictionary.json'
+    path.write_text(json.dumps({'Haus': [entry('ein Gebäude')]}), encoding='utf-8')
+    DictionaryCache.invalidate()
+    with GermanDictionaryReader(path, ['Haus', 'Baum']) as reader:
+        assert not (tmp_path / 'dictionary.json.sqlite').exists()
+        assert [word_entry.headword for word_entry in reader.get_word_entry_list()] == ['Haus']
+        assert reader.lookup_result.missing == ['Baum']
+        DictionaryCache.append_journal(path, {'Baum': [entry('eine Pflanze')]})
+        assert reader.refresh()
+        assert [word_entry.headword for word_entry in reader.get_word_entry_list()] == ['Haus', 'Baum']
+    DictionaryCache.invalidate()
@@ -0,0 +1,62 @@
+import math
+import random
+
+from FullTextIndex import FullTextIndex
+
+
+def test_replaced_entries_lose_their_old_postings(tmp_path):
+    index = FullTextIndex(tmp_path / 'index.json')
+    index.add_entries('phrases', {'auf Achse': [{'Definition': 'unterwegs sein', 'Beispiele': ['Er ist ständig auf Achse.']}],
+                                  'Haus': [{'Definition': 'ein Gebäude', 'Beispiele': []}]})
+    index.add_entries('phrases', {'auf Achse': [{'Definition': 'viel reisen', 'Beispiele': []}]}, replace=True)
+    assert index.search('unterwegs') == []
+    assert [(hit.headword, hit.position) for hit in index.search('reisen')] == [('auf Achse', 0)]
+    index.save()
+    saved = FullTextIndex(tmp_path / 'index.json')
+    assert 'unterwegs' not in saved.postings
+    assert [hit.headword for hit in saved.search('Gebäude')] == ['Haus']
+
+
+def test_appended_entries_are_indexed_once(tmp_path):
+    index = FullTextIndex(tmp_path / 'index.json')
+    entries = [{'Definition': 'ein Gebäude', 'Beispiele': []}]
+    index.add_entries('words', {'Haus': entries})
+    index.add_entries('words', {'Haus': entries + [{'Definition': 'eine Familie', 'Beispiele': []}]})
+    assert len(index.documents) == 2
+    assert len(index.search('Gebäude')) == 1
+
+
+def test_scores_count_only_live_documents(tmp_path):
+    index = FullTextIndex(tmp_path / 'index.json')
+    entries = {'Haus': [{'Definition': 'ein Gebäude', 'Beispiele': []}],
+               'Familie': [{'Definition': 'Familie Familie Familie', 'Beispiele': []}]}
+    index.add_entries('words', entries)
+    index.add_entries('words', {f'Wort {i}': [{'Definition': 'Familie', 'Beispiele': []}] for i in range(8)})
+    assert [hit.headword for hit in index.search('Gebäude Familie', limit=2)] == ['Haus', 'Familie']
+    for i in range(8):
+        index.remove_headword('words', f'Wort {i}')
+    fresh = FullTextIndex(tmp_path / 'fresh.json')
+    fresh.add_entries('words', entries)
+    expected = [(hit.headword, hit.score) for hit in fresh.search('Gebäude Familie')]
+    assert expected[0][0] == 'Familie'
+    assert [(hit.headword, hit.score) for hit in index.search('Gebäude Familie')] == expected
+    index.save()
+    assert [(hit.headword, hit.score) for hit in FullTextIndex(tmp_path / 'index.json').search('Gebäude Familie')] == expected
+
+
+def test_early_stopping_ranks_like_a_full_scan(tmp_path):
+    rng = random.Random(0)
+    vocabulary = ['wenn', 'man', 'Haus', 'Baum', 'gehen']
+    entries = {f'Wort {i}': [{'Definition': ' '.join(rng.choices(vocabulary, k=rng.randint(1, 4))),
+                              'Beispiele': [' '.join(rng.choices(vocabulary, k=3))]}] for i in range(300)}
+    index = FullTextIndex(tmp_path / 'index.json')
+    index.add_entries('words', entries)
+    for query in ['wenn', 'wenn man', 'Haus Baum gehen']:
+        scores = dict()
+        for token in set(query.lower().split()):
+            live = {document for document, _, _ in index.postings[token]}
+            idf = math.log(1 + len(entries) / len(live))
+            for document, field, count in index.postings[token]:
+                scores[document] = scores.get(document, 0.0) + idf * index.field_weights[field] * count
+        ranked = sorted(scores, key=lambda document: (-round(scores[document], 9), document))[:20]
+        assert [hit.headword for hit in index.search(query)] == [index.documents[document][1] for document in ranked]
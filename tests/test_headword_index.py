@@ -0,0 +1,20 @@
+import json
+import sys
+import types
+
+import DictionaryCache
+from HeadwordIndex import HeadwordIndex
+
+
+def test_missing_model_falls_back_to_the_headwords(tmp_path, monkeypatch, capsys):
+    def load(name, **kwargs):
+        raise OSError(f"[E050] Can't find model '{name}'.")
+
+    monkeypatch.setitem(sys.modules, 'spacy', types.SimpleNamespace(load=load))
+    path = tmp_path / 'dictionary.json'
+    path.write_text(json.dumps({'Stadt': [{'Definition': 'ein Ort', 'Beispiele': ['Die Städte wachsen.']}]}), encoding='utf-8')
+    DictionaryCache.invalidate()
+    index = HeadwordIndex(path)
+    assert index.resolve_many(['STADT', 'Städte']) == {'STADT': 'Stadt'}
+    assert 'python -m spacy download' in capsys.readouterr().out
+    DictionaryCache.invalidate()
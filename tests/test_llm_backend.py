@@ -0,0 +1,60 @@
+import time
+
+import pytest
+
+from LLMBackend import HTTPBackend, LLMError
+from LLMStandIn import LLMStandIn
+
+
+def test_complete_many_keeps_the_order_of_the_prompts():
+    with LLMStandIn(responder=str.upper, latency=0.05) as server:
+        backend = HTTPBackend(server.url, model='stand-in', concurrency=4)
+        prompts = [f'prompt {i}' for i in range(8)]
+        assert backend.complete_many(prompts) == [prompt.upper() for prompt in prompts]
+
+
+def test_failed_requests_are_retried():
+    with LLMStandIn(failures=2) as server:
+        backend = HTTPBackend(server.url, model='stand-in', retries=2, backoff=0.01)
+        assert backend.complete('hallo') == 'hallo'
+        assert server.requests == 3
+
+
+def test_timeout_ends_the_request():
+    with LLMStandIn(latency=1.0) as server:
+        backend = HTTPBackend(server.url, model='stand-in', retries=0, timeout=0.1)
+        start = time.perf_counter()
+        with pytest.raises(LLMError):
+            backend.complete('hallo')
+        # `complete` returns only after its worker thread has finished, so the request itself has timed out.
+        assert time.perf_counter() - start < 0.8
+
+
+def test_stream_yields_the_answer_in_chunks():
+    with LLMStandIn(chunk_size=4) as server:
+        backend = HTTPBackend(server.url, model='stand-in')
+        chunks = list(backend.stream('Das ist eine Antwort.'))
+        assert len(chunks) > 1
+        assert ''.join(chunks) == 'Das ist eine Antwort.'
+
+
+def test_a_client_error_closes_the_response(monkeypatch):
+    class Response:
+        status_code = 400
+        text = 'bad request'
+        closed = False
+
+        def close(self):
+            self.closed = True
+
+        def __enter__(self):
+            return self
+
+        def __exit__(self, *exc_info):
+            self.close()
+
+    response = Response()
+    monkeypatch.setattr('LLMBackend.requests.post', lambda *args, **kwargs: response)
+    with pytest.raises(LLMError, match='HTTP 400'):
+        HTTPBackend('http://localhost:1', model='stand-in', retries=0).complete('hallo')
+    assert response.closed
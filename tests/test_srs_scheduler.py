@@ -0,0 +1,29 @@
+import json
+
+import numpy as np
+
+from toolbox import Configurator, SRSScheduler
+
+
+def test_save_and_load_without_the_npz_suffix(tmp_path):
+    path = tmp_path / 'scheduler.state'
+    scheduler = SRSScheduler(path)
+    scheduler.review(['Haus', 'Baum'], [3, 1], day=738000)
+    scheduler.save()
+    assert not (tmp_path / 'scheduler.state.npz').exists()
+    loaded = SRSScheduler(path)
+    assert loaded.words == ['Haus', 'Baum']
+    assert np.array_equal(loaded.due_days(), scheduler.due_days())
+    assert loaded.get_words_in_n_days(30, day=738000) == scheduler.get_words_in_n_days(30, day=738000)
+
+
+def test_studied_words_become_due_for_review(tmp_path):
+    path = tmp_path / 'config.json'
+    path.write_text(json.dumps({'all': ['Haus', 'Baum'], 'new': ['Haus', 'Baum'], 'review': [], 'last change': []}))
+    scheduler = SRSScheduler(tmp_path / 'srs.npz')
+    configurator = Configurator(path, scheduler=scheduler)
+    configurator.study_n_words(1)
+    assert configurator.get_words_to_review(0) == []
+    # A word studied today is first due after its initial stability of a few days.
+    assert configurator.get_words_to_review(30) == ['Haus']
+    assert SRSScheduler(tmp_path / 'srs.npz').words == ['Haus']
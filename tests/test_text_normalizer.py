@@ -0,0 +1,18 @@
+from TextNormalizer import TextNormalizer
+
+
+def test_pounds_keep_the_following_space():
+    assert TextNormalizer().normalize('5 £ pro Stück') == r'5 \pounds{} pro Stück'
+
+
+def test_specials_after_a_line_break_are_escaped():
+    normalizer = TextNormalizer()
+    assert normalizer.normalize(r'50\% off') == r'50\% off'
+    assert normalizer.normalize('Zeile\\\\% Rest') == 'Zeile\\\\\\% Rest'
+    assert normalizer.normalize('Zeile\\\\\\% Rest') == 'Zeile\\\\\\% Rest'
+
+
+def test_batch_matches_single_strings():
+    normalizer = TextNormalizer()
+    texts = ['„Das kostet 5 £“ – sagte er.', "'Hallo' & #1", r'a\\_b', r'schon\_escaped']
+    assert normalizer.normalize_many(texts) == [normalizer.normalize(text) for text in texts]